@@ -0,0 +1,190 @@
+"""
+Memory-mapped Arrow IPC datasets shared between web workers.
+
+Once an upload is processed its transcript rows and per-user results are
+written as uncompressed Arrow IPC files under a dataset id. A gunicorn worker
+answering a later request about that upload maps the files instead of
+loading its own pandas copy: the pages are held once in the OS page cache
+and shared by every process that maps them. Queries filter the mapped tables
+with pyarrow.compute, so only the rows asked for are ever copied out.
+
+Datasets are written to a temporary directory and renamed into place, so a
+worker never maps a half-written file. Needs the optional pyarrow package.
+"""
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+
+DATASET_ID = re.compile(r'^[0-9a-f]{32}$')
+
+TRANSCRIPTS = 'transcripts'
+RESULTS = 'results'
+
+TEMP_PREFIX = '.tmp-'
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def valid_dataset_id(dataset_id):
+    return bool(dataset_id) and DATASET_ID.match(dataset_id) is not None
+
+
+def to_arrow(df, as_text=None):
+    """Arrow table of a DataFrame; object columns (and the as_text columns) are stored as text"""
+    import pyarrow as pa
+
+    text_columns = set(as_text or ()) | set(df.columns[df.dtypes == object])
+    df = df.astype({column: 'string' for column in df.columns if column in text_columns})
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+class DatasetWriter:
+    """Arrow IPC files of one dataset, written batch by batch until committed"""
+
+    def __init__(self, store, dataset_id):
+        self.store = store
+        self.dataset_id = dataset_id
+        self.directory = os.path.join(store.directory, TEMP_PREFIX + dataset_id)
+        os.makedirs(self.directory)
+        self._writers = {}  # table name -> (file, RecordBatchFileWriter, schema)
+
+    def add(self, name, df, as_text=None):
+        """Append a DataFrame to a table; later batches are cast to the first one's schema"""
+        import pyarrow as pa
+
+        table = to_arrow(df, as_text)
+        if name not in self._writers:
+            sink = pa.OSFile(os.path.join(self.directory, f'{name}.arrow'), 'wb')
+            self._writers[name] = (sink, pa.ipc.new_file(sink, table.schema), table.schema)
+        sink, writer, schema = self._writers[name]
+        writer.write_table(table.select(schema.names).cast(schema))
+
+    def tap(self, name, chunks, positions, columns):
+        """Append the rows of every chunk held by the given positions while passing the chunk on"""
+        positions = list(positions)
+        for chunk in chunks:
+            self.add(name, chunk.loc[chunk['Position'].isin(positions), columns], as_text=columns)
+            yield chunk
+
+    def _close(self):
+        for sink, writer, schema in self._writers.values():
+            writer.close()
+            sink.close()
+        self._writers = {}
+
+    def commit(self, metadata=None):
+        """Finish the files and publish the dataset; returns its id"""
+        self._close()
+        with open(os.path.join(self.directory, 'metadata.json'), 'w', encoding='utf-8') as handle:
+            json.dump(dict(metadata or {}, created=time.time()), handle, default=str)
+        os.replace(self.directory, self.store.dataset_path(self.dataset_id))
+        return self.dataset_id
+
+    def abort(self):
+        self._close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ArrowStore:
+    """Directory of datasets, each a folder of Arrow IPC files and a metadata.json"""
+
+    def __init__(self, directory, max_age_seconds=24 * 3600, max_mapped=16):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        self.max_mapped = max_mapped
+        # (dataset id, table name) -> (file identity, pyarrow Table), least recently used first
+        self._mapped = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def dataset_path(self, dataset_id):
+        if not valid_dataset_id(dataset_id):
+            raise ValueError("Invalid dataset id")
+        return os.path.join(self.directory, dataset_id)
+
+    def writer(self):
+        """Start a new dataset, dropping the expired ones first"""
+        self.prune()
+        return DatasetWriter(self, uuid.uuid4().hex)
+
+    def exists(self, dataset_id):
+        return valid_dataset_id(dataset_id) and os.path.isdir(self.dataset_path(dataset_id))
+
+    def metadata(self, dataset_id):
+        with open(os.path.join(self.dataset_path(dataset_id), 'metadata.json'), encoding='utf-8') as handle:
+            return json.load(handle)
+
+    def table(self, dataset_id, name):
+        """A dataset table mapped into memory; the max_mapped most recently used stay mapped
+
+        A cached mapping is only reused while its file is still the one on disk,
+        since another worker may have pruned or replaced the dataset.
+        Raises FileNotFoundError for unknown datasets or tables.
+        """
+        import pyarrow as pa
+
+        key = (dataset_id, name)
+        path = os.path.join(self.dataset_path(dataset_id), f'{name}.arrow')
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._mapped.pop(key, None)
+            raise
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        cached = self._mapped.get(key)
+        if cached is not None and cached[0] == identity:
+            self._mapped.move_to_end(key)
+            return cached[1]
+        source = pa.memory_map(path, 'r')
+        # Reading from a memory map references the mapped pages instead of copying them
+        table = pa.ipc.open_file(source).read_all()
+        self._mapped[key] = (identity, table)
+        self._mapped.move_to_end(key)
+        while len(self._mapped) > self.max_mapped:
+            self._mapped.popitem(last=False)
+        return table
+
+    def prune(self):
+        """Remove datasets (and abandoned temporary ones) older than max_age_seconds"""
+        cutoff = time.time() - self.max_age_seconds
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                expired = os.path.getmtime(path) < cutoff
+            except OSError:
+                continue
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+                dataset_id = name[len(TEMP_PREFIX):] if name.startswith(TEMP_PREFIX) else name
+                for key in [key for key in self._mapped if key[0] == dataset_id]:
+                    del self._mapped[key]
+
+
+def filter_rows(table, filters):
+    """Rows of a mapped table whose columns equal the given values, compared as text
+
+    A list or tuple value keeps the rows equal to any of its items.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    mask = None
+    for column, value in filters.items():
+        if value is None:
+            continue
+        values = pc.cast(table[column], pa.string())
+        if isinstance(value, (list, tuple)):
+            condition = pc.is_in(values, value_set=pa.array([str(item) for item in value], pa.string()))
+        else:
+            condition = pc.equal(values, str(value))
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return table if mask is None else table.filter(mask)
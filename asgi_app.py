@@ -0,0 +1,282 @@
+"""
+ASGI variant of the web app for many slow clients.
+
+Serves the same routes as flask_app.py with Starlette. Uploads and downloads
+are handled asynchronously, so a slow connection only holds a coroutine,
+while report processing runs in a process pool and keeps every core busy.
+The report code itself is shared with flask_app.
+
+Run with (see requirements_asgi.txt):
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import gzip
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import (
+    FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse,
+)
+from starlette.routing import Route
+from werkzeug.http import parse_accept_header
+
+import flask_app
+from completion_windows import parse_points
+from export_reader import export_suffix
+from progress_events import broker, valid_job_id
+from report_formats import check_output_format, mimetype_for
+
+# Processes used for report processing; defaults to the CPU count
+PROCESSING_WORKERS = int(os.environ.get('PROCESSING_WORKERS', '0')) or (os.cpu_count() or 1)
+
+UPLOAD_DIR = 'uploads'
+
+# Copy uploads to disk in pieces of this size
+COPY_BLOCK = 1024 * 1024
+
+_pool = None
+
+
+def _init_pool_worker():
+    # The pool already keeps every core busy; one process per report, no nested pools
+    os.environ['AGGREGATION_WORKERS'] = '1'
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global _pool
+    # spawn, not fork: the event loop process has threads of its own
+    _pool = ProcessPoolExecutor(max_workers=PROCESSING_WORKERS,
+                                mp_context=multiprocessing.get_context('spawn'), initializer=_init_pool_worker)
+    try:
+        yield
+    finally:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """Run a CPU-heavy function in the process pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, partial(func, *args, **kwargs))
+
+
+async def save_upload(upload, prefix):
+    """Copy an uploaded file to a unique temporary path in the uploads directory, keeping its type"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd, filepath = tempfile.mkstemp(prefix=prefix, suffix=export_suffix(upload.filename), dir=UPLOAD_DIR)
+    with os.fdopen(fd, 'wb') as handle:
+        await run_in_threadpool(shutil.copyfileobj, upload.file, handle, COPY_BLOCK)
+    return filepath
+
+
+def remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def json_response(request, content, status_code=200):
+    """JSONResponse, gzip or deflate encoded when large enough and the client accepts it"""
+    response = JSONResponse(content, status_code=status_code)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if len(response.body) < flask_app.COMPRESS_MIN_BYTES:
+        return response
+    encoding = parse_accept_header(request.headers.get('accept-encoding')).best_match(['gzip', 'deflate'])
+    if encoding is None:
+        return response
+    if encoding == 'gzip':
+        body = gzip.compress(response.body, compresslevel=6)
+    else:
+        body = zlib.compress(response.body, 6)  # HTTP "deflate" is the zlib format
+    return Response(body, status_code=status_code, media_type='application/json',
+                    headers={'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'})
+
+
+async def index(request):
+    return HTMLResponse(flask_app.MAIN_HTML)
+
+
+async def health(request):
+    return JSONResponse({
+        'status': 'healthy',
+        'message': 'Stellantis Training Report Processor is running',
+        'timestamp': datetime.now().isoformat(),
+        'port': os.environ.get('PORT', '5000'),
+        'server': 'asgi',
+    })
+
+
+async def test(request):
+    return PlainTextResponse("Stellantis Training Report Processor is working! 🚀")
+
+
+async def upload_file(request):
+    form = await request.form()
+    job_id = form.get('job_id') or None
+    if job_id is not None and not valid_job_id(job_id):
+        return JSONResponse({'error': 'job_id must be 8-64 letters, digits, - or _'}, status_code=400)
+    try:
+        uploads = form.getlist('file')
+        if not uploads or any(isinstance(upload, str) for upload in uploads):
+            return JSONResponse({'error': 'No file provided'}, status_code=400)
+        if any(upload.filename == '' for upload in uploads):
+            return JSONResponse({'error': 'No file selected'}, status_code=400)
+        try:
+            for upload in uploads:
+                export_suffix(upload.filename)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        job_role = form.get('job_role', 'All')
+        streaming = flask_app.parse_streaming_flag(form.get('streaming'))
+        try:
+            output_format = check_output_format(form.get('output_format'))
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+        snapshot_date = form.get('snapshot_date') or None
+        if snapshot_date:
+            try:
+                snapshot_date = datetime.strptime(snapshot_date, '%Y-%m-%d').date()
+            except ValueError:
+                return JSONResponse({'error': 'snapshot_date must be YYYY-MM-DD'}, status_code=400)
+
+        try:
+            completion_points = parse_points(form.get('as_of'), form.get('window_days'), form.get('windows'))
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        # Several overlapping exports are merged into one report
+        filepaths = [await save_upload(upload, 'temp_upload_') for upload in uploads]
+        try:
+            if completion_points:
+                try:
+                    await run_in_threadpool(flask_app.check_date_columns, filepaths)
+                except ValueError as e:
+                    return JSONResponse({'error': str(e)}, status_code=400)
+            # The reporter appends to the job's progress file, so it works from the worker process
+            result = await run_in_pool(
+                flask_app.process_training_report, filepaths if len(filepaths) > 1 else filepaths[0], job_role,
+                progress=broker.reporter(job_id) if job_id else None, streaming=streaming,
+                source_name=', '.join(upload.filename for upload in uploads), snapshot_date=snapshot_date,
+                output_format=output_format, completion_points=completion_points,
+                split_dealers=flask_app.parse_streaming_flag(form.get('split_dealers')) is True
+            )
+        finally:
+            for filepath in filepaths:
+                await run_in_threadpool(remove_file, filepath)
+            await form.close()
+
+        if job_id:
+            broker.publish(job_id, 'done', percent=100, filename=result['filename'])
+        return json_response(request, result)
+
+    except Exception as e:
+        if job_id:
+            broker.publish(job_id, 'error', error=str(e))
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def bundle_reports(request):
+    """Zip of one report per job role or per dealer, built in a worker process"""
+    form = await request.form()
+    upload = form.get('file')
+    if upload is None or isinstance(upload, str) or upload.filename == '':
+        return JSONResponse({'error': 'No file provided'}, status_code=400)
+    group_by = form.get('by', 'job_role')
+    if group_by not in flask_app.BUNDLE_GROUPS:
+        return JSONResponse({'error': f"by must be one of: {', '.join(flask_app.BUNDLE_GROUPS)}"},
+                            status_code=400)
+    try:
+        export_suffix(upload.filename)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    filepath = await save_upload(upload, 'temp_bundle_')
+    fd, zip_path = tempfile.mkstemp(prefix='temp_bundle_', suffix='.zip', dir=UPLOAD_DIR)
+    os.close(fd)
+    try:
+        await run_in_pool(flask_app.write_bundle, filepath, form.get('job_role', 'All'), group_by, zip_path)
+    except Exception as e:
+        await run_in_threadpool(remove_file, zip_path)
+        return JSONResponse({'error': str(e)}, status_code=500)
+    finally:
+        await run_in_threadpool(remove_file, filepath)
+        await form.close()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return FileResponse(zip_path, media_type='application/zip',
+                        filename=f'Stellantis_Reports_by_{group_by}_{timestamp}.zip',
+                        background=BackgroundTask(remove_file, zip_path))
+
+
+async def progress_stream(request):
+    job_id = request.path_params['job_id']
+    if not valid_job_id(job_id):
+        return JSONResponse({'error': 'Invalid job id'}, status_code=400)
+    last_event_id = request.headers.get('last-event-id', '')
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else None
+    # An async generator: a waiting listener holds a coroutine, not a threadpool thread
+    return StreamingResponse(broker.astream(job_id, last_event_id), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def progress_events(request):
+    job_id = request.path_params['job_id']
+    if not valid_job_id(job_id):
+        return JSONResponse({'error': 'Invalid job id'}, status_code=400)
+    after = request.query_params.get('after', '')
+    return JSONResponse({'events': broker.events(job_id, int(after) if after.isdigit() else None)})
+
+
+async def trend(request):
+    try:
+        rows = await run_in_threadpool(
+            flask_app.get_snapshot_store().trend,
+            user_id=request.query_params.get('user_id'),
+            dealer_name=request.query_params.get('dealer'),
+            job_role=request.query_params.get('job_role'),
+            level=request.query_params.get('level'),
+            start=request.query_params.get('start'),
+            end=request.query_params.get('end')
+        )
+        return json_response(request, {'trend': rows})
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def download_file(request):
+    filename = request.path_params['filename']
+    filepath = os.path.join(UPLOAD_DIR, filename)
+    if os.path.basename(filename) != filename or not os.path.isfile(filepath):
+        return PlainTextResponse("File not found", status_code=404)
+    return FileResponse(filepath, filename=filename, media_type=mimetype_for(filename))
+
+
+routes = [
+    Route('/', index),
+    Route('/health', health),
+    Route('/test', test),
+    Route('/upload', upload_file, methods=['POST']),
+    Route('/bundle', bundle_reports, methods=['POST']),
+    Route('/progress/{job_id}', progress_stream),
+    Route('/progress/{job_id}/events', progress_events),
+    Route('/trend', trend),
+    Route('/download/{filename}', download_file),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 8000)))
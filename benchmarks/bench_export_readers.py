@@ -0,0 +1,50 @@
+"""
+Benchmark the .xlsx reader backends against pd.read_excel on a generated export.
+
+Usage:
+    python -m benchmarks.bench_export_readers [--users 5000] [--repeat 1]
+"""
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks.bench_title_matching import best_of
+from benchmarks.fixtures import write_export
+from export_reader import HEADER_ROW, available_readers, read_export
+
+
+def read_excel_export(path):
+    """The pd.read_excel load used before the reader backends"""
+    df = pd.read_excel(path, header=None).iloc[HEADER_ROW:].reset_index(drop=True)
+    df.columns = df.iloc[0]
+    return df.iloc[1:].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--rows-per-user', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_export(os.path.join(directory, 'export.xlsx'), args.users, args.rows_per_user)
+        baseline_time, expected = best_of(args.repeat, read_excel_export, path)
+        expected.columns = list(expected.columns)
+        timings = {}
+        for reader in available_readers():
+            timings[reader], actual = best_of(args.repeat, read_export, path, HEADER_ROW, reader)
+            if not expected.astype(object).equals(actual):
+                raise SystemExit(f'The {reader} reader gives a different export than pd.read_excel')
+        size = os.path.getsize(path)
+
+    print(f"Rows: {len(expected)} ({size / 1e6:.1f} MB)")
+    print(f"pd.read_excel: {baseline_time:.2f} s")
+    for reader, elapsed in timings.items():
+        print(f"{reader + ':':<13} {elapsed:.2f} s ({baseline_time / elapsed:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
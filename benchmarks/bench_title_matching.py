@@ -0,0 +1,72 @@
+"""
+Benchmark the title matcher against the original re.search loop.
+
+Usage:
+    python -m benchmarks.bench_title_matching [--titles 5000] [--repeat 3]
+"""
+import argparse
+import re
+import time
+
+from benchmarks.fixtures import make_titles
+from flask_app import CONFIG
+from levels import level_patterns
+from title_matcher import TitleMatcher
+
+
+def regex_loop(titles, patterns):
+    """The classification loop used before the matching engine"""
+    matched = []
+    for title in titles:
+        title_str = str(title).upper()
+        for pattern in patterns:
+            if re.search(pattern, title_str):
+                matched.append(title)
+                break
+    return matched
+
+
+def best_of(repeat, func, *args):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--titles', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--long-share', type=float, default=0.2)
+    args = parser.parse_args()
+
+    titles = make_titles(args.titles, long_share=args.long_share)
+    pattern_sets = level_patterns(CONFIG)
+
+    def run_regex():
+        return {label: regex_loop(titles, patterns) for label, patterns in pattern_sets.items()}
+
+    def run_matcher():
+        # Compilation is included so the comparison is fair for one-off runs
+        return TitleMatcher(pattern_sets).match_titles(titles)
+
+    regex_time, expected = best_of(args.repeat, run_regex)
+    matcher_time, actual = best_of(args.repeat, run_matcher)
+
+    if expected != actual:
+        raise SystemExit('Matcher results differ from the re.search loop')
+
+    print(f"Titles: {len(titles)} ({args.long_share:.0%} long)")
+    for label in pattern_sets:
+        print(f"  {label}: {len(actual[label])} matches")
+    print(f"re.search loop: {regex_time * 1000:.1f} ms")
+    print(f"TitleMatcher:   {matcher_time * 1000:.1f} ms")
+    print(f"Speedup:        {regex_time / matcher_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark writing a report workbook with openpyxl and with parallel_workbook.
+
+Usage:
+    python -m benchmarks.bench_workbook_write [--users 20000] [--workers 4] [--repeat 1]
+"""
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks.bench_title_matching import best_of
+from benchmarks.fixtures import HEADER, make_rows
+from parallel_workbook import write_workbook
+
+
+def openpyxl_workbook(path, sheets):
+    """The pd.ExcelWriter loop used before parallel_workbook"""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--rows-per-user', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    df = pd.DataFrame(list(make_rows(args.users, args.rows_per_user)), columns=HEADER)
+    # Sheets shaped like the report's: two level details, all details and a per-user table
+    half = len(df) // 2
+    sheets = {
+        'Level_1_Training_Details': df.iloc[:half],
+        'Level_2_Training_Details': df.iloc[half:],
+        'All_Training_Details': df,
+        'Users': df.drop_duplicates('User ID'),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        expected_path = os.path.join(directory, 'openpyxl.xlsx')
+        actual_path = os.path.join(directory, 'parallel.xlsx')
+        openpyxl_time, _ = best_of(args.repeat, openpyxl_workbook, expected_path, sheets)
+        parallel_time, _ = best_of(args.repeat, write_workbook, actual_path, sheets, args.workers)
+
+        expected = pd.read_excel(expected_path, sheet_name=None)
+        actual = pd.read_excel(actual_path, sheet_name=None)
+        if list(expected) != list(actual) or any(not expected[name].equals(actual[name]) for name in expected):
+            raise SystemExit('parallel_workbook output differs from openpyxl')
+        sizes = os.path.getsize(expected_path), os.path.getsize(actual_path)
+
+    print(f"Rows: {len(df)} in {len(sheets)} sheets, {args.workers} workers")
+    print(f"openpyxl:          {openpyxl_time:.2f} s ({sizes[0] / 1e6:.1f} MB)")
+    print(f"parallel_workbook: {parallel_time:.2f} s ({sizes[1] / 1e6:.1f} MB)")
+    print(f"Speedup:           {openpyxl_time / parallel_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
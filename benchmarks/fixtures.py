@@ -0,0 +1,90 @@
+"""
+Synthetic Enterprise Training Report fixtures for benchmarks.
+
+The generated data mimics the real export: titles follow the Level 1/Level 2
+naming conventions (X01EN, CET_LEVEL 1, TRAINING PATH ... LEVEL 2) mixed with
+unrelated trainings, and a share of titles is very long to exercise the
+``.*`` patterns.
+"""
+import random
+
+BRANDS = ['PEUGEOT', 'CITROEN', 'FIAT', 'JEEP', 'ALFA ROMEO', 'OPEL', 'DS']
+
+TITLE_TEMPLATES = [
+    '{brand} INDUCTION LEVEL 1 - X01EN',
+    '{brand} CET_LEVEL 1 PRODUCT KNOWLEDGE',
+    '{brand} TRAINING PATH SALES ADVISOR LEVEL 1',
+    '{brand} CURRICULUM LEVEL 1 AFTERSALES',
+    '{brand} FOUNDATION MODULE LEVEL 1',
+    '{brand} ADVANCED DIAGNOSTICS LEVEL 2 - X02EN',
+    '{brand} TRAINING PATH SERVICE ADVISOR LEVEL 2',
+    '{brand} PROGRAM EXPERT LEVEL 2',
+    '{brand} ELECTRIFICATION WEBINAR {n}',
+    '{brand} CUSTOMER EXPERIENCE E-LEARNING {n}',
+    'SAFETY AND COMPLIANCE MODULE {n}',
+    'GDPR AWARENESS {n}',
+]
+
+LONG_SUFFIX = (
+    ' - COMPLETE THIS MODULE BEFORE ATTENDING THE CLASSROOM SESSION, INCLUDING '
+    'THE PRE-READING MATERIAL, THE PRODUCT WALKAROUND VIDEO AND THE FINAL QUIZ'
+)
+
+POSITIONS = [
+    'SAL-2-New Vehicles Sales Advisor',
+    'SAL-3-New Vehicles Sales Manager',
+    'SER-12-Technician',
+    'SER-1-Aftersales Manager',
+    'SER-2-Service Advisor',
+    'ADM-1-Administration',
+]
+
+STATUSES = ['Completed', 'Approved', 'Registered', 'In Progress', 'Not Started']
+
+HEADER = ['User ID', 'User Full Name', 'Training Title', 'Transcript Status', 'Division', 'Position']
+
+
+def make_titles(count, seed=0, long_share=0.2):
+    """Return a list of unique synthetic training titles"""
+    rng = random.Random(seed)
+    titles = []
+    seen = set()
+    while len(titles) < count:
+        template = rng.choice(TITLE_TEMPLATES)
+        title = template.format(brand=rng.choice(BRANDS), n=rng.randint(1, 9999))
+        if rng.random() < long_share:
+            title += LONG_SUFFIX * rng.randint(1, 4)
+        if title not in seen:
+            seen.add(title)
+            titles.append(title)
+    return titles
+
+
+def make_rows(n_users, rows_per_user=20, n_titles=400, n_dealers=50, seed=0):
+    """Yield transcript rows (lists in HEADER order) for n_users users"""
+    rng = random.Random(seed)
+    titles = make_titles(n_titles, seed=seed)
+    dealers = [f'DEALER {i:04d}' for i in range(n_dealers)]
+    for user in range(n_users):
+        user_id = f'U{user:07d}'
+        name = f'LAST{user}, FIRST{user}'
+        position = rng.choice(POSITIONS)
+        dealer = rng.choice(dealers)
+        for title in rng.sample(titles, min(rows_per_user, len(titles))):
+            yield [user_id, name, title, rng.choice(STATUSES), dealer, position]
+
+
+def write_export(path, n_users, rows_per_user=20, seed=0):
+    """Write an .xlsx export with the 8 preamble rows of the real report"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Report')
+    sheet.append(['Enterprise Training Report'])
+    for i in range(7):
+        sheet.append([f'Report parameter {i + 1}'])
+    sheet.append(HEADER)
+    for row in make_rows(n_users, rows_per_user, seed=seed):
+        sheet.append(row)
+    workbook.save(path)
+    return path
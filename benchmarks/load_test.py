@@ -0,0 +1,298 @@
+"""
+Load-test the web service with synthetic exports.
+
+Starts gunicorn (or uses --url), then for every export size and concurrency
+level uploads the export --requests times through /upload, downloads each
+generated report through /download and reports throughput, latency
+percentiles, error rates and the peak RSS of the server processes.
+
+The started server runs with RESULT_CACHE=0, since every request uploads the
+same export; run a server given with --url the same way to measure processing.
+
+Usage:
+    python -m benchmarks.load_test [--sizes 200,2000] [--concurrency 1,4,8] [--requests 16]
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 8
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixtures import write_export
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, threads, data_dir):
+    """Start gunicorn on port and wait until /health answers"""
+    command = [
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers), '--worker-class', 'gthread', '--threads', str(threads),
+        '--timeout', '600', 'flask_app:app',
+    ]
+    # Every request uploads the same export, so the result cache would answer all but the first
+    env = dict(os.environ, RESULT_CACHE='0',
+               SNAPSHOT_DB_PATH=os.path.join(data_dir, 'report_history.db'),
+               ARROW_DATASET_DIR=os.path.join(data_dir, 'datasets'),
+               RESULT_CACHE_DIR=os.path.join(data_dir, 'result_cache'),
+               PROGRESS_DIR=os.path.join(data_dir, 'progress'))
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit('gunicorn exited during start-up')
+        try:
+            with urllib.request.urlopen(url + '/health', timeout=1):
+                return server, url
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise SystemExit('gunicorn did not become healthy within 30 seconds')
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def _proc_rss(pid):
+    """Resident set size of one process in bytes, from /proc"""
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _proc_children(pid):
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as handle:
+            children.extend(int(child) for child in handle.read().split())
+    return children
+
+
+def tree_rss(pid):
+    """Total RSS in bytes of pid and all its descendants, or None if unavailable"""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    try:
+        if psutil is not None:
+            process = psutil.Process(pid)
+            return sum(p.memory_info().rss for p in [process] + process.children(recursive=True))
+        total, pending = 0, [pid]
+        while pending:
+            current = pending.pop()
+            total += _proc_rss(current)
+            pending.extend(_proc_children(current))
+        return total
+    except (OSError, ValueError):
+        return None
+    except Exception:  # psutil.Error when a worker exits between samples
+        return None
+
+
+class RssSampler(threading.Thread):
+    """Track the peak RSS of a process tree while a run is in progress"""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = tree_rss(self.pid)
+            if rss is not None:
+                self.peak = rss if self.peak is None else max(self.peak, rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def multipart_body(fields, file_field, file_path):
+    """Encode form fields and one file as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    with open(file_path, 'rb') as handle:
+        content = handle.read()
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+        f'filename="{os.path.basename(file_path)}"\r\n'
+        'Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n'.encode()
+    )
+    parts.append(content)
+    parts.append(f'\r\n--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def one_request(url, body, content_type, download, timeout):
+    """Upload once (and download the result); returns (upload_s, download_s, error)"""
+    start = time.perf_counter()
+    try:
+        request = urllib.request.Request(url + '/upload', data=body, headers={'Content-Type': content_type})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            result = json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        return time.perf_counter() - start, None, type(e).__name__
+    upload_time = time.perf_counter() - start
+
+    if not download:
+        return upload_time, None, None
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(f"{url}/download/{result['filename']}", timeout=timeout) as response:
+            while response.read(1024 * 1024):
+                pass
+    except (urllib.error.URLError, OSError, KeyError) as e:
+        return upload_time, time.perf_counter() - start, type(e).__name__
+    return upload_time, time.perf_counter() - start, None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_level(url, export_path, concurrency, requests, download, timeout, server_pid):
+    body, content_type = multipart_body({'job_role': 'All'}, 'file', export_path)
+    sampler = RssSampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda _: one_request(url, body, content_type, download, timeout), range(requests)
+        ))
+    elapsed = time.perf_counter() - start
+    peak_rss = sampler.stop() if sampler else None
+
+    errors = [error for _, _, error in results if error]
+    uploads = [upload for upload, _, error in results if not error]
+    downloads = [down for _, down, error in results if not error and down is not None]
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': len(errors),
+        'error_rate': len(errors) / requests,
+        'error_kinds': sorted(set(errors)),
+        'throughput_rps': (requests - len(errors)) / elapsed,
+        'upload_p50_s': percentile(uploads, 50),
+        'upload_p95_s': percentile(uploads, 95),
+        'upload_p99_s': percentile(uploads, 99),
+        'download_p50_s': percentile(downloads, 50),
+        'download_p95_s': percentile(downloads, 95),
+        'download_p99_s': percentile(downloads, 99),
+        'peak_rss_mb': None if peak_rss is None else peak_rss / (1024 * 1024),
+    }
+
+
+def format_seconds(value):
+    return '-' if value is None else f'{value * 1000:.0f}'
+
+
+def print_table(rows):
+    print(f"{'users':>7} {'rows':>8} {'conc':>4} {'req/s':>7} {'err%':>5} "
+          f"{'up p50':>7} {'p95':>7} {'p99':>7} {'dl p50':>7} {'p99':>7} {'RSS MB':>7}")
+    for row in rows:
+        rss = '-' if row['peak_rss_mb'] is None else f"{row['peak_rss_mb']:.0f}"
+        print(f"{row['users']:>7} {row['rows']:>8} {row['concurrency']:>4} {row['throughput_rps']:>7.2f} "
+              f"{row['error_rate'] * 100:>5.1f} {format_seconds(row['upload_p50_s']):>7} "
+              f"{format_seconds(row['upload_p95_s']):>7} {format_seconds(row['upload_p99_s']):>7} "
+              f"{format_seconds(row['download_p50_s']):>7} {format_seconds(row['download_p99_s']):>7} {rss:>7}")
+    print("Latencies in ms; RSS is the peak of all server processes together.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='200,2000', help="Comma-separated user counts per export")
+    parser.add_argument('--rows-per-user', type=int, default=20)
+    parser.add_argument('--concurrency', default='1,4,8', help="Comma-separated concurrent clients")
+    parser.add_argument('--requests', type=int, default=16, help="Uploads per size and concurrency level")
+    parser.add_argument('--workers', type=int, default=1, help="gunicorn worker processes")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument('--url', help="Test a running server instead of starting gunicorn")
+    parser.add_argument('--no-download', action='store_true', help="Only exercise /upload")
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    levels = [int(level) for level in args.concurrency.split(',')]
+    work_dir = tempfile.mkdtemp(prefix='load_test_')
+    uploads_dir = os.path.join(ROOT, 'uploads')
+    existing_uploads = set(os.listdir(uploads_dir)) if os.path.isdir(uploads_dir) else set()
+    server = None
+    try:
+        if args.url:
+            url, server_pid = args.url.rstrip('/'), None
+        else:
+            server, url = start_server(free_port(), args.workers, args.threads, work_dir)
+            server_pid = server.pid
+            print(f"gunicorn: {args.workers} worker(s) x {args.threads} threads at {url}")
+
+        rows = []
+        for users in sizes:
+            export_path = os.path.join(work_dir, f'export_{users}.xlsx')
+            write_export(export_path, users, rows_per_user=args.rows_per_user)
+            size_mb = os.path.getsize(export_path) / (1024 * 1024)
+            print(f"Export: {users} users, {users * args.rows_per_user} rows, {size_mb:.1f} MB")
+            for concurrency in levels:
+                result = run_level(url, export_path, concurrency, args.requests,
+                                   not args.no_download, args.timeout, server_pid)
+                result.update(users=users, rows=users * args.rows_per_user, export_mb=size_mb)
+                rows.append(result)
+                if result['errors']:
+                    print(f"  concurrency {concurrency}: {result['errors']} errors {result['error_kinds']}")
+        print_table(rows)
+        if args.json:
+            with open(args.json, 'w') as handle:
+                json.dump(rows, handle, indent=2)
+    finally:
+        if server is not None:
+            stop_server(server)
+            # Remove the reports generated by this run
+            if os.path.isdir(uploads_dir):
+                for name in set(os.listdir(uploads_dir)) - existing_uploads:
+                    os.remove(os.path.join(uploads_dir, name))
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
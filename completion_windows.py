@@ -0,0 +1,249 @@
+"""
+Completion as of past dates and over rolling windows.
+
+The export's assignment and completion dates are kept per transcript row as
+day numbers. Once the titles are classified, every row becomes an
+'assigned' event and, if completed, a 'completed' event for its user and
+level, and the events are sorted by day. Counting them up to the requested
+dates is then a single sweep: the sorted dates cut the event list with a
+binary search and each slice is added to the running per-user counters,
+whose figures are taken at every cut before the sweep moves on. A window's
+completions are counted from the events between its two cuts.
+
+Undated rows count from the start, so as of a date after the last one in
+the export the figures equal the full report. A completed row without a
+completion date counts as completed when it was assigned.
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from levels import level_name
+from streaming_aggregation import COMPLETED_STATUSES
+
+# Export columns holding the assignment and completion date, first found is used
+ASSIGNED_DATE_COLUMNS = ['Transcript Assigned Date', 'Assigned Date', 'Transcript Registered Date',
+                         'Registration Date']
+COMPLETED_DATE_COLUMNS = ['Transcript Completed Date', 'Completed Date', 'Completion Date']
+
+# At most this many dates per request (as-of dates plus window starts)
+MAX_POINTS = 120
+
+NO_DAY = np.iinfo(np.int64).min  # undated: before every date
+NEVER = np.iinfo(np.int64).max  # not completed
+
+
+def find_date_columns(columns):
+    """(assigned column, completed column) among an export's columns; either may be None"""
+    columns = [str(column) for column in columns]
+    assigned = next((name for name in ASSIGNED_DATE_COLUMNS if name in columns), None)
+    completed = next((name for name in COMPLETED_DATE_COLUMNS if name in columns), None)
+    return assigned, completed
+
+
+def to_days(values):
+    """Day numbers (days since 1970-01-01) of date-like values; unparseable ones are NO_DAY"""
+    import pandas as pd
+
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', format='mixed')
+    days = parsed.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    result = days.astype(np.int64)
+    result[np.isnat(days)] = NO_DAY
+    return result
+
+
+def day_number(value):
+    return (value - date(1970, 1, 1)).days
+
+
+def parse_points(as_of=None, window_days=None, windows=None):
+    """Turn the API parameters into (window start, as-of date) points
+
+    as_of is a comma-separated list of YYYY-MM-DD dates. With window_days
+    every date also gets the window of that many days ending on it, and
+    windows=N adds the N-1 windows before the last date, back to back.
+    A point without a window has start None. Raises ValueError.
+    """
+    dates = []
+    for text in (as_of or '').split(','):
+        text = text.strip()
+        if text:
+            try:
+                dates.append(datetime.strptime(text, '%Y-%m-%d').date())
+            except ValueError:
+                raise ValueError('as_of must be a comma-separated list of YYYY-MM-DD dates')
+    window = None
+    if window_days:
+        if not str(window_days).strip().isdigit() or int(window_days) < 1:
+            raise ValueError('window_days must be a positive number of days')
+        window = int(window_days)
+    count = 1
+    if windows:
+        if window is None:
+            raise ValueError('windows needs window_days')
+        if not str(windows).strip().isdigit() or int(windows) < 1:
+            raise ValueError('windows must be a positive number')
+        count = int(windows)
+    if not dates:
+        if window is not None:
+            raise ValueError('window_days needs an as_of date')
+        return []
+
+    ends = set(dates)
+    last = max(dates)
+    ends.update(last - timedelta(days=window * i) for i in range(1, count))
+    points = [(end - timedelta(days=window) if window else None, end) for end in sorted(ends)]
+    if len(points) > MAX_POINTS:
+        raise ValueError(f'At most {MAX_POINTS} dates can be requested at once')
+    return points
+
+
+class DateIndex:
+    """Transcript dates per user and title, fed one chunk at a time"""
+
+    def __init__(self, assigned_column, completed_column):
+        self.assigned_column = assigned_column
+        self.completed_column = completed_column
+        self.users = {}  # (user id, full name) -> code
+        self.titles = {}  # title -> code
+        self._parts = []  # (user codes, title codes, assigned days, completed days)
+
+    def add_chunk(self, chunk):
+        """Record the rows of a chunk already filtered to the report's job roles"""
+        chunk = chunk.dropna(subset=['User ID', 'User Full Name'])
+        if len(chunk) == 0:
+            return
+        users = [self.users.setdefault(key, len(self.users))
+                 for key in zip(chunk['User ID'], chunk['User Full Name'])]
+        titles = [self.titles.setdefault(title, len(self.titles)) for title in chunk['Training Title']]
+
+        if self.assigned_column:
+            assigned = to_days(chunk[self.assigned_column])
+        else:
+            assigned = np.full(len(chunk), NO_DAY, dtype=np.int64)
+        completed = chunk['Transcript Status'].isin(COMPLETED_STATUSES).to_numpy()
+        if self.completed_column:
+            completed_days = to_days(chunk[self.completed_column])
+            completed_days = np.where(completed_days == NO_DAY, assigned, completed_days)
+        else:
+            completed_days = assigned.copy()
+        completed_days[~completed] = NEVER
+        # Nothing is completed before it is assigned
+        assigned = np.minimum(assigned, completed_days)
+        self._parts.append((np.asarray(users, dtype=np.int64), np.asarray(titles, dtype=np.int64),
+                            assigned, completed_days))
+
+    def tap(self, chunks, job_roles):
+        """Record every chunk of an iterator while passing it on unchanged"""
+        job_roles = list(job_roles)
+        for chunk in chunks:
+            self.add_chunk(chunk[chunk['Position'].isin(job_roles)])
+            yield chunk
+
+    def _arrays(self):
+        if not self._parts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty
+        return tuple(np.concatenate(column) for column in zip(*self._parts))
+
+    def _events(self, level_titles):
+        """Assigned and completed events of the rows in the levels, sorted by day
+
+        Returns (event days, counter slots, number of slots); a user's slot
+        (user * levels + level) * 2 counts assignments and the next one
+        completions.
+        """
+        labels = list(level_titles)
+        title_levels = np.full(len(self.titles), -1, dtype=np.int64)
+        for level, label in enumerate(labels):
+            for title in level_titles[label]:
+                code = self.titles.get(title)
+                if code is not None:
+                    title_levels[code] = level
+
+        users, titles, assigned, completed = self._arrays()
+        levels = title_levels[titles]
+        in_level = levels >= 0
+        slots = (users * len(labels) + levels) * 2
+        event_days = np.concatenate([assigned[in_level], completed[in_level]])
+        event_slots = np.concatenate([slots[in_level], slots[in_level] + 1])
+        done = event_days != NEVER
+        event_days, event_slots = event_days[done], event_slots[done]
+        order = np.argsort(event_days, kind='stable')
+        return event_days[order], event_slots[order], len(self.users) * len(labels) * 2
+
+    def sweep(self, points, level_titles):
+        """Per-level counts of every user for (window start day, as-of day) points
+
+        Yields (position, counts, in_window) one point at a time, in as-of
+        order: counts shaped (users, levels, 2) holds the (assigned,
+        completed) counts as of the day and in_window shaped (users, levels)
+        the completions after the start day, or None without a start. counts
+        is the running counter and changes on the next step, so only one
+        point's counts are held at a time.
+        """
+        event_days, event_slots, size = self._events(level_titles)
+        shape = (len(self.users), len(level_titles), 2)
+        running = np.zeros(size, dtype=np.int64)
+        start = 0
+        for position in sorted(range(len(points)), key=lambda i: points[i][1]):
+            window_start, day = points[position]
+            cut = np.searchsorted(event_days, day, side='right')
+            if cut > start:
+                running += np.bincount(event_slots[start:cut], minlength=size)
+                start = cut
+            in_window = None
+            if window_start is not None:
+                first = np.searchsorted(event_days, window_start, side='right')
+                in_window = np.bincount(event_slots[first:cut], minlength=size).reshape(shape)[:, :, 1]
+            yield position, running.reshape(shape), in_window
+
+
+def completion_over_time(index, level_titles, points):
+    """Per-user completion table and per-date summary for (window start, as-of date) points
+
+    The table has one row per user, sorted like completion_data, with each
+    level's completion % as of every date and the trainings completed in
+    each window. The summary averages the per-user percentages over all
+    users, as the report's own averages do.
+    """
+    import pandas as pd
+
+    labels = list(level_titles)
+    days = [(day_number(start) if start is not None else None, day_number(end)) for start, end in points]
+
+    keys = list(index.users)
+    try:
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+    except TypeError:
+        order = list(range(len(keys)))
+    columns = [{} for _ in points]
+    summary = [None] * len(points)
+    for position, counts, in_window in index.sweep(days, level_titles):
+        start, end = points[position]
+        at_end = counts[order]
+        entry = {'as_of': end.isoformat(), 'window_start': start.isoformat() if start else None, 'levels': {}}
+        for level, label in enumerate(labels):
+            name = level_name(label)
+            assigned, completed = at_end[:, level, 0], at_end[:, level, 1]
+            percent = np.where(assigned > 0, np.round(completed / np.maximum(assigned, 1) * 100, 2), 0.0)
+            columns[position][f'{name} Completion % as of {end}'] = percent
+            level_summary = {
+                'avg_completion': round(float(percent.mean()), 2) if len(percent) else 0,
+                'assigned': int(assigned.sum()),
+                'completed': int(completed.sum()),
+            }
+            if in_window is not None:
+                completed_in_window = in_window[order, level]
+                columns[position][f'Completed {name} Trainings {start} to {end}'] = completed_in_window
+                level_summary['completed_in_window'] = int(completed_in_window.sum())
+            entry['levels'][label] = level_summary
+        summary[position] = entry
+
+    table = {
+        'User ID': [keys[i][0] for i in order],
+        'User Full Name': [keys[i][1] for i in order],
+    }
+    for point_columns in columns:
+        table.update(point_columns)
+    return pd.DataFrame(table), summary
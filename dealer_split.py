@@ -0,0 +1,106 @@
+"""
+Per-dealer report workbooks from one shared aggregation.
+
+The export is read, classified and aggregated once; the per-user completion
+rows are then grouped by dealer (or job role) and every group is written to
+its own workbook. Writing workbooks is the slow part with hundreds of
+dealers, so groups are spread over worker processes that each receive only
+their dealers' rows; the training titles are sent once per worker.
+"""
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from parallel_aggregation import default_workers
+
+# Fewer groups than this are written in-process
+PARALLEL_MIN_GROUPS = 8
+
+_level_titles = None  # level label -> titles, in worker processes
+
+
+def group_completion_rows(completion_data, key='Dealer Name'):
+    """completion_data rows grouped by a column, in sorted group order"""
+    groups = {}
+    for row in completion_data:
+        groups.setdefault(row.get(key) or 'Unknown', []).append(row)
+    return dict(sorted(groups.items(), key=lambda item: str(item[0])))
+
+
+def group_filename(prefix, name):
+    safe = re.sub(r'[^A-Za-z0-9._-]+', '_', str(name)).strip('._') or 'Unknown'
+    return f'{prefix}_{safe}.xlsx'
+
+
+def write_group_workbook(path, rows, level_titles):
+    """Write one group's report workbook"""
+    from report_pipeline import create_stellantis_report, save_report
+
+    save_report(path, create_stellantis_report(rows), rows, None, level_titles)
+    return path
+
+
+def _init_worker(level_titles):
+    global _level_titles
+    _level_titles = level_titles
+
+
+def _write_in_worker(path, rows):
+    return write_group_workbook(path, rows, _level_titles)
+
+
+def write_group_workbooks(groups, level_titles, out_dir, prefix='STELLANTIS_Report', workers=None):
+    """Write a workbook per group into out_dir and return the paths by group name"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths, used = {}, set()
+    for name in groups:
+        filename = group_filename(prefix, name)
+        stem, counter = filename[:-len('.xlsx')], 2
+        while filename in used:
+            filename = f'{stem}_{counter}.xlsx'
+            counter += 1
+        used.add(filename)
+        paths[name] = os.path.join(out_dir, filename)
+
+    workers = default_workers() if workers is None else max(1, workers)
+    workers = min(workers, len(groups))
+    if workers <= 1 or len(groups) < PARALLEL_MIN_GROUPS:
+        for name, rows in groups.items():
+            write_group_workbook(paths[name], rows, level_titles)
+        return paths
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(level_titles,)) as pool:
+        futures = [pool.submit(_write_in_worker, paths[name], rows) for name, rows in groups.items()]
+        for future in futures:
+            future.result()
+    return paths
+
+
+def zip_files(paths, zip_path):
+    """Package files into a zip; workbooks are already compressed, so they are stored"""
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for path in paths:
+            archive.write(path, arcname=os.path.basename(path))
+    return zip_path
+
+
+def split_report(completion_data, level_titles, zip_path, key='Dealer Name',
+                 prefix='STELLANTIS_Report', workers=None):
+    """Write one workbook per dealer (or other key) and package them as zip_path
+
+    Returns the number of workbooks written. The workbooks are written to a
+    scratch directory next to zip_path, which is removed afterwards.
+    """
+    import shutil
+    import tempfile
+
+    groups = group_completion_rows(completion_data, key)
+    scratch = tempfile.mkdtemp(prefix='split_', dir=os.path.dirname(os.path.abspath(zip_path)))
+    try:
+        paths = write_group_workbooks(groups, level_titles, scratch, prefix, workers)
+        zip_files(paths.values(), zip_path)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return len(groups)
@@ -0,0 +1,200 @@
+"""
+Differences between two exports of the same training population.
+
+    python export_diff.py last_week.xlsx this_week.xlsx -o diff.xlsx
+
+Both exports are filtered to the target job roles and their titles are
+classified together, so a title counts towards the same level on both sides.
+Per user, the level completion of both exports is compared; per (User ID,
+Training Title) the transcript rows are joined on a 64-bit key hash, which
+finds the newly assigned, newly completed, no longer completed and removed
+trainings with a few vectorized merges, even for a million rows per side.
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from export_merge import row_keys
+from export_reader import REPORT_COLUMNS, iter_export_chunks
+from levels import classify_titles, level_name
+from parallel_aggregation import calculate_completion_percentages_parallel
+from streaming_aggregation import COMPLETED_STATUSES
+
+NEWLY_ASSIGNED = 'Newly Assigned'
+NEWLY_COMPLETED = 'Newly Completed'
+NO_LONGER_COMPLETED = 'No Longer Completed'
+REMOVED = 'Removed'
+
+SUMMARY_SHEET = 'Diff_Summary'
+USERS_SHEET = 'User_Changes'
+TRAININGS_SHEET = 'Training_Changes'
+
+
+def read_transcripts(filepath, chunksize=50000):
+    """The REPORT_COLUMNS of an export as one DataFrame"""
+    chunks = list(iter_export_chunks(filepath, chunksize=chunksize, columns=REPORT_COLUMNS))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=REPORT_COLUMNS)
+
+
+def keyed_rows(df):
+    """One row per (User ID, Training Title) with its key hash and completed flag
+
+    Duplicate keys keep a completed row if there is one.
+    """
+    rows = pd.DataFrame({
+        'key': row_keys(df),
+        'User ID': df['User ID'].to_numpy(),
+        'User Full Name': df['User Full Name'].to_numpy(),
+        'Training Title': df['Training Title'].to_numpy(),
+        'Transcript Status': df['Transcript Status'].to_numpy(),
+        'completed': df['Transcript Status'].isin(COMPLETED_STATUSES).to_numpy(),
+    })
+    rows = rows.sort_values('completed', ascending=False, kind='stable')
+    return rows.drop_duplicates('key')
+
+
+def training_changes(before, after, title_levels):
+    """Transcript rows that were added, removed or changed completion between the exports"""
+    joined = keyed_rows(before).merge(keyed_rows(after), on='key', how='outer', suffixes=(' Before', ' After'),
+                                      indicator=True)
+    side = joined['_merge'].to_numpy()
+    done_before = joined['completed Before'].fillna(False).to_numpy(dtype=bool)
+    done_after = joined['completed After'].fillna(False).to_numpy(dtype=bool)
+    both = side == 'both'
+    change = np.select(
+        [side == 'right_only', side == 'left_only', both & done_after & ~done_before, both & done_before & ~done_after],
+        [NEWLY_ASSIGNED, REMOVED, NEWLY_COMPLETED, NO_LONGER_COMPLETED],
+        default=''
+    )
+    joined = joined[change != '']
+    change = change[change != '']
+    changes = pd.DataFrame({'Change': change})
+    for column in ('User ID', 'User Full Name', 'Training Title'):
+        # Rows only in the earlier export take their values from it
+        changes[column] = joined[f'{column} After'].fillna(joined[f'{column} Before']).to_numpy()
+    changes['Level'] = changes['Training Title'].map(title_levels).fillna('')
+    changes['Status Before'] = joined['Transcript Status Before'].to_numpy()
+    changes['Status After'] = joined['Transcript Status After'].to_numpy()
+    changes = changes[['User ID', 'User Full Name', 'Training Title', 'Level', 'Change', 'Status Before',
+                       'Status After']]
+    return changes.sort_values(['Change', 'User ID', 'Training Title'], key=lambda s: s.astype(str),
+                               kind='stable').reset_index(drop=True)
+
+
+def user_changes(before, after, level_titles):
+    """Per-user level completion in both exports and the change, with the users' counts of changes"""
+    names = [level_name(label) for label in level_titles]
+    percent_columns = [f'{name} Completion %' for name in names] + ['Overall Completion %']
+    sides = {}
+    for side, df in (('Before', before), ('After', after)):
+        rows = pd.DataFrame(calculate_completion_percentages_parallel(df, level_titles))
+        if len(rows) == 0:
+            rows = pd.DataFrame(columns=['User ID', 'First Name', 'Last Name', 'Job Role', 'Dealer Name']
+                                + percent_columns)
+        rows = rows.assign(key=rows['User ID'].astype(str)).drop_duplicates('key')
+        sides[side] = rows
+
+    info = ['First Name', 'Last Name', 'Job Role', 'Dealer Name']
+    joined = sides['Before'][['key', 'User ID'] + info + percent_columns].merge(
+        sides['After'][['key', 'User ID'] + info + percent_columns],
+        on='key', how='outer', suffixes=(' Before', ' After'), indicator=True
+    )
+    users = pd.DataFrame({'User ID': joined['User ID After'].fillna(joined['User ID Before'])})
+    for column in info:
+        users[column] = joined[f'{column} After'].fillna(joined[f'{column} Before'])
+    for column in percent_columns:
+        label = column[:-len(' %')]
+        users[f'{label} % Before'] = joined[f'{column} Before']
+        users[f'{label} % After'] = joined[f'{column} After']
+        users[f'{label} % Change'] = (joined[f'{column} After'] - joined[f'{column} Before']).round(2)
+
+    change = users['Overall Completion % Change'].to_numpy(dtype=float)
+    side = joined['_merge'].to_numpy()
+    users['Status'] = np.select(
+        [side == 'right_only', side == 'left_only', change > 0, change < 0],
+        ['New', 'Removed', 'Progressed', 'Regressed'],
+        default='Unchanged'
+    )
+    return users.sort_values('User ID', key=lambda s: s.astype(str), kind='stable').reset_index(drop=True)
+
+
+def diff_exports(before, after, patterns_by_level, job_roles):
+    """Compare two transcript DataFrames; returns the diff tables by sheet name and a summary dict"""
+    job_roles = list(job_roles)
+    before = before[before['Position'].isin(job_roles)]
+    after = after[after['Position'].isin(job_roles)]
+    titles = pd.concat([before['Training Title'], after['Training Title']]).unique()
+    level_titles = classify_titles(titles, patterns_by_level)
+    title_levels = {title: level_name(label) for label, level in level_titles.items() for title in level}
+
+    trainings = training_changes(before, after, title_levels)
+    users = user_changes(before, after, level_titles)
+
+    # Count each user's training changes of every kind
+    counts = trainings.groupby([trainings['User ID'].astype(str), 'Change']).size().unstack(fill_value=0)
+    for change in (NEWLY_ASSIGNED, NEWLY_COMPLETED, NO_LONGER_COMPLETED, REMOVED):
+        column = counts[change] if change in counts.columns else pd.Series(dtype=np.int64)
+        users[f'{change} Trainings'] = users['User ID'].astype(str).map(column).fillna(0).astype(np.int64)
+
+    summary = {
+        'rows_before': len(before),
+        'rows_after': len(after),
+        'users': {status: int(count) for status, count in users['Status'].value_counts().items()},
+        'trainings': {change: int(count) for change, count in trainings['Change'].value_counts().items()},
+        'levels': {},
+    }
+    for label in level_titles:
+        name = level_name(label)
+        summary['levels'][label] = {
+            'avg_completion_before': round(float(users[f'{name} Completion % Before'].mean()), 2)
+            if users[f'{name} Completion % Before'].notna().any() else 0,
+            'avg_completion_after': round(float(users[f'{name} Completion % After'].mean()), 2)
+            if users[f'{name} Completion % After'].notna().any() else 0,
+        }
+    summary_table = pd.DataFrame(
+        [('Rows before', summary['rows_before']), ('Rows after', summary['rows_after'])]
+        + [(f'Users {status}', count) for status, count in summary['users'].items()]
+        + [(f'Trainings {change}', count) for change, count in summary['trainings'].items()]
+        + [(f"{level_name(label)} average completion % {when}", values[f'avg_completion_{when}'])
+           for label, values in summary['levels'].items() for when in ('before', 'after')],
+        columns=['Measure', 'Value']
+    )
+    tables = {SUMMARY_SHEET: summary_table, USERS_SHEET: users, TRAININGS_SHEET: trainings}
+    return tables, summary
+
+
+def write_diff_workbook(tables, output_path):
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        for sheet_name, df in tables.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return output_path
+
+
+def main(argv=None):
+    from flask_app import CONFIG
+    from levels import level_patterns
+
+    parser = argparse.ArgumentParser(description="Compare two Enterprise Training Report exports")
+    parser.add_argument('before', help="Earlier export (.xlsx or .csv)")
+    parser.add_argument('after', help="Later export (.xlsx or .csv)")
+    parser.add_argument('-o', '--output', default='export_diff.xlsx', help="Diff workbook")
+    parser.add_argument('-r', '--job-role', default='All', help="One of the target job roles, or All (default)")
+    args = parser.parse_args(argv)
+
+    target_roles = CONFIG['target_job_roles']
+    job_roles = [args.job_role] if args.job_role in target_roles else target_roles
+    try:
+        tables, summary = diff_exports(read_transcripts(args.before), read_transcripts(args.after),
+                                       level_patterns(CONFIG), job_roles)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(write_diff_workbook(tables, args.output))
+    print(f"Users: {summary['users']}; trainings: {summary['trainings']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
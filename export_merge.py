@@ -0,0 +1,138 @@
+"""
+Merge overlapping exports into one deduplicated set of transcript rows.
+
+Regional exports can contain the same user and training more than once. The
+merge keys every row by a 64-bit hash of (User ID, Training Title) and keeps
+one row per key: the one with the best status (Completed/Approved first),
+and the earliest one among equals. It works in two streaming passes so only
+a few bytes per row are held in memory:
+
+1. read every export in chunks, recording each row's key hash and status rank;
+   sorting those arrays by (key, rank, position) picks the winner of each key
+2. read the exports again and yield only the winning rows, chunk by chunk
+"""
+import numpy as np
+
+from export_reader import REPORT_COLUMNS, export_columns, iter_export_chunks
+from streaming_aggregation import COMPLETED_STATUSES
+
+# Higher is better; statuses not listed rank below all of these
+STATUS_RANK = {status: 3 for status in COMPLETED_STATUSES}
+STATUS_RANK.update({'In Progress': 2, 'Registered': 1, 'Not Started': 0})
+UNKNOWN_STATUS_RANK = -1
+
+KEY_COLUMNS = ['User ID', 'Training Title']
+
+
+def row_keys(chunk):
+    """64-bit hash of (User ID, Training Title) per row
+
+    Both values are compared as text, so a User ID read as a number in one
+    export and as text in another still matches.
+    """
+    import pandas as pd
+
+    keys = chunk[KEY_COLUMNS].astype(str)
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy(dtype=np.uint64)
+
+
+def status_ranks(chunk):
+    return (chunk['Transcript Status'].map(STATUS_RANK).fillna(UNKNOWN_STATUS_RANK)
+            .to_numpy(dtype=np.int8))
+
+
+def select_winners(keys, ranks):
+    """Boolean mask of the rows kept: the best-ranked, then earliest, row of each key"""
+    if len(keys) == 0:
+        return np.zeros(0, dtype=bool)
+    positions = np.arange(len(keys), dtype=np.int64)
+    # np.lexsort sorts by the last array first
+    order = np.lexsort((positions, -ranks.astype(np.int16), keys))
+    sorted_keys = keys[order]
+    first = np.empty(len(keys), dtype=bool)
+    first[0] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=first[1:])
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[order[first]] = True
+    return keep
+
+
+class ExportMerge:
+    """Deduplicating merge of several exports, read in two passes
+
+    Columns other than REPORT_COLUMNS that an export lacks are left empty
+    for its rows.
+    """
+
+    def __init__(self, paths, chunksize=50000, columns=None):
+        self.paths = list(paths)
+        self.chunksize = chunksize
+        self.columns = list(columns or REPORT_COLUMNS)
+        self.rows_read = 0
+        self.rows_kept = 0
+        self._keep = None
+        self._present = {}  # path -> the columns it has
+
+    def _chunks(self):
+        for path in self.paths:
+            present = self._present.get(path)
+            if present is None:
+                header = set(export_columns(path))
+                present = self._present[path] = [column for column in self.columns
+                                                 if column in header or column in REPORT_COLUMNS]
+            for chunk in iter_export_chunks(path, chunksize=self.chunksize, columns=present):
+                yield chunk if len(present) == len(self.columns) else chunk.reindex(columns=self.columns)
+
+    def plan(self):
+        """First pass: decide which rows survive the merge"""
+        keys, ranks = [], []
+        for chunk in self._chunks():
+            keys.append(row_keys(chunk))
+            ranks.append(status_ranks(chunk))
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.uint64)
+        ranks = np.concatenate(ranks) if ranks else np.zeros(0, dtype=np.int8)
+        self._keep = select_winners(keys, ranks)
+        self.rows_read = len(self._keep)
+        self.rows_kept = int(self._keep.sum())
+        return self
+
+    def __iter__(self):
+        """Second pass: yield the surviving rows as DataFrame chunks, in export order"""
+        if self._keep is None:
+            self.plan()
+        offset = 0
+        for chunk in self._chunks():
+            mask = self._keep[offset:offset + len(chunk)]
+            offset += len(chunk)
+            if mask.all():
+                yield chunk.reset_index(drop=True)
+            elif mask.any():
+                yield chunk[mask].reset_index(drop=True)
+
+    @property
+    def duplicates_removed(self):
+        return self.rows_read - self.rows_kept
+
+    def stats(self):
+        return {
+            'files': len(self.paths),
+            'rows_read': self.rows_read,
+            'rows_kept': self.rows_kept,
+            'duplicates_removed': self.duplicates_removed,
+        }
+
+
+def merge_exports_frame(paths, chunksize=50000):
+    """The merged, deduplicated rows of several exports as one DataFrame, and the merge stats
+
+    The frame has every column of the first export, as a single export
+    loaded by read_export would.
+    """
+    import pandas as pd
+
+    paths = list(paths)
+    columns = list(dict.fromkeys(column for column in export_columns(paths[0]) if column is not None))
+    merge = ExportMerge(paths, chunksize=chunksize, columns=columns)
+    chunks = list(merge)
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+    return df, merge.stats()
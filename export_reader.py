@@ -0,0 +1,451 @@
+"""
+Incremental readers for Enterprise Training Report exports.
+
+The export starts with 8 rows of report information followed by the column
+header row. These readers skip the preamble and yield the data as DataFrame
+chunks, so large exports never have to be loaded in one piece.
+
+.xlsx rows come from one of three interchangeable backends, which yield the
+same cell values:
+
+- 'calamine': the Rust-backed python-calamine package (optional); the fastest,
+  but it holds the whole sheet in memory
+- 'xml': the worksheet XML parsed as a stream with ElementTree, converting
+  cells the way openpyxl does
+- 'openpyxl': openpyxl's read-only mode
+
+XLSX_READER picks one; 'auto' uses calamine for exports up to
+CALAMINE_MAX_MB when it is installed, and the XML parser otherwise.
+"""
+import itertools
+import os
+import zipfile
+from xml.etree import ElementTree
+
+# Rows of report information above the column headers
+HEADER_ROW = 8
+
+# Columns needed to compute completion percentages
+REPORT_COLUMNS = ['User ID', 'User Full Name', 'Training Title', 'Transcript Status', 'Division', 'Position']
+
+# File types an export is read from, chosen by extension
+EXPORT_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+# Reader backend for .xlsx exports: auto, calamine, xml or openpyxl
+XLSX_READERS = ('calamine', 'xml', 'openpyxl')
+XLSX_READER = os.environ.get('XLSX_READER', 'auto')
+
+# calamine loads the whole sheet, so larger exports are streamed by the XML parser
+CALAMINE_MAX_MB = float(os.environ.get('CALAMINE_MAX_MB', '200'))
+
+# Cell texts pd.read_excel reads as missing values; read_export does the same
+NA_TEXTS = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>',
+            'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def calamine_available():
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_readers():
+    """The .xlsx reader backends that can be used here"""
+    return [name for name in XLSX_READERS if name != 'calamine' or calamine_available()]
+
+
+def export_suffix(filename):
+    """Extension to save an uploaded export with, so it is read as what it is; ValueError for other files"""
+    suffix = os.path.splitext(filename or '')[1].lower()
+    if not suffix:
+        return '.xlsx'
+    if suffix not in EXPORT_EXTENSIONS:
+        raise ValueError(f"Unsupported file type {suffix}; upload an {', '.join(EXPORT_EXTENSIONS)} export")
+    return suffix
+
+
+def choose_reader(filepath, reader=None):
+    """The backend to read an .xlsx export with; reader (or XLSX_READER) may force one"""
+    reader = reader or XLSX_READER
+    if os.path.splitext(filepath)[1].lower() == '.xls':
+        # Only calamine reads the old binary format; the other backends need a zip package
+        if reader in ('auto', 'calamine') and calamine_available():
+            return 'calamine'
+        raise ValueError("Reading .xls exports needs the python-calamine package; "
+                         "save the export as .xlsx or install python-calamine")
+    if reader == 'auto':
+        small = os.path.getsize(filepath) <= CALAMINE_MAX_MB * 1024 * 1024
+        return 'calamine' if small and calamine_available() else 'xml'
+    if reader not in XLSX_READERS:
+        raise ValueError(f"Unknown reader {reader!r}; use auto or one of {', '.join(XLSX_READERS)}")
+    if reader == 'calamine' and not calamine_available():
+        raise ValueError("The calamine reader needs the python-calamine package")
+    return reader
+
+
+def _openpyxl_rows(filepath):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # The stored dimension can be stale; without it every row is read
+        sheet.reset_dimensions()
+        for row in sheet.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def _calamine_rows(filepath):
+    import datetime
+
+    from python_calamine import CalamineWorkbook
+
+    sheet = CalamineWorkbook.from_path(filepath).get_sheet_by_index(0)
+    for row in sheet.to_python(skip_empty_area=False):
+        values = []
+        for value in row:
+            # calamine reads empty cells as '', every number as a float and
+            # date-only cells as dates; openpyxl gives None, ints and datetimes
+            if value == '':
+                value = None
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            elif type(value) is datetime.date:
+                value = datetime.datetime(value.year, value.month, value.day)
+            values.append(value)
+        yield tuple(values)
+
+
+def _package_part(names, base, target):
+    """Zip member name of a relationship target"""
+    if target.startswith('/'):
+        return target[1:]
+    parts = base.split('/')[:-1]
+    for part in target.split('/'):
+        if part == '..':
+            parts.pop()
+        elif part and part != '.':
+            parts.append(part)
+    name = '/'.join(parts)
+    return name if name in names else target
+
+
+def _relationships(archive, part):
+    """Relationship id -> (type, zip member name) of a package part"""
+    directory, name = part.rsplit('/', 1) if '/' in part else ('', part)
+    rels_name = f'{directory}/_rels/{name}.rels' if directory else f'_rels/{name}.rels'
+    root = ElementTree.fromstring(archive.read(rels_name))
+    names = set(archive.namelist())
+    return {rel.get('Id'): (rel.get('Type', '').rsplit('/', 1)[-1], _package_part(names, part, rel.get('Target')))
+            for rel in root.iter(f'{{{PACKAGE_RELATIONSHIPS_NS}}}Relationship')}
+
+
+def _text(element, ns):
+    """Plain text of a shared or inline string: its t element and those of its runs"""
+    text = element.findtext(f'{{{ns}}}t') or ''
+    runs = [run.findtext(f'{{{ns}}}t') or '' for run in element.iterfind(f'{{{ns}}}r')]
+    return text + ''.join(runs) if runs else text
+
+
+def _date_styles(archive, part, ns):
+    """Indexes of the cell styles that format numbers as dates, and of those as durations"""
+    from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+
+    if part is None:
+        return set(), set()
+    root = ElementTree.fromstring(archive.read(part))
+    formats = {int(fmt.get('numFmtId')): fmt.get('formatCode')
+               for fmt in root.iter(f'{{{ns}}}numFmt')}
+    date_styles, timedelta_styles = set(), set()
+    cell_xfs = root.find(f'{{{ns}}}cellXfs')
+    for index, xf in enumerate(() if cell_xfs is None else cell_xfs.iterfind(f'{{{ns}}}xf')):
+        format_id = int(xf.get('numFmtId', 0))
+        code = formats.get(format_id, BUILTIN_FORMATS.get(format_id))
+        if code is None:
+            continue
+        if is_date_format(code):
+            date_styles.add(index)
+        if is_timedelta_format(code):
+            timedelta_styles.add(index)
+    return date_styles, timedelta_styles
+
+
+def _first_sheet(archive):
+    """(workbook root, namespace, relationships, part) of the first worksheet in an .xlsx package"""
+    workbook_root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    ns = workbook_root.tag[1:].split('}')[0]
+    relationships = _relationships(archive, 'xl/workbook.xml')
+    for sheet in workbook_root.iter(f'{{{ns}}}sheet'):
+        kind, part = relationships[sheet.get(f'{{{RELATIONSHIPS_NS}}}id')]
+        if kind == 'worksheet':
+            return workbook_root, ns, relationships, part
+    raise ValueError("The workbook has no worksheet")
+
+
+def _xml_rows(filepath):
+    """Rows of the first worksheet, parsed from the package XML as a stream
+
+    Cells are converted the way openpyxl's read-only mode does. The sheet's
+    <dimension> only pads rows to its width: it can be stale, so rows beyond
+    it are still read.
+    """
+    from openpyxl.utils.cell import column_index_from_string, range_boundaries
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+    with zipfile.ZipFile(filepath) as archive:
+        workbook_root, ns, relationships, sheet_part = _first_sheet(archive)
+        properties = workbook_root.find(f'{{{ns}}}workbookPr')
+        date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+        epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+        parts = {kind: part for kind, part in relationships.values()}
+
+        shared_strings = []
+        if 'sharedStrings' in parts:
+            with archive.open(parts['sharedStrings']) as source:
+                for _, element in ElementTree.iterparse(source):
+                    if element.tag == f'{{{ns}}}si':
+                        shared_strings.append(_text(element, ns).replace('x005F_', ''))
+                        element.clear()
+        date_styles, timedelta_styles = _date_styles(archive, parts.get('styles'), ns)
+
+        row_tag, cell_tag, value_tag = f'{{{ns}}}row', f'{{{ns}}}c', f'{{{ns}}}v'
+        inline_tag, data_tag, dimension_tag = f'{{{ns}}}is', f'{{{ns}}}sheetData', f'{{{ns}}}dimension'
+        max_col = max_row = None
+        empty_row = ()
+        next_row = 1
+        row_number = 0
+        with archive.open(sheet_part) as source:
+            sheet_data = None
+            for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag == data_tag:
+                        sheet_data = element
+                    continue
+                if element.tag == dimension_tag:
+                    try:
+                        _, _, max_col, max_row = range_boundaries(element.get('ref'))
+                    except (TypeError, ValueError):
+                        max_col = max_row = None
+                    empty_row = (None,) * max_col if max_col else ()
+                    continue
+                if element.tag != row_tag:
+                    continue
+
+                number = element.get('r')
+                row_number = int(float(number)) if number else row_number + 1
+                cells = []
+                column = 0
+                for cell in element.iterfind(cell_tag):
+                    ref = cell.get('r')
+                    column = column_index_from_string(ref.rstrip('0123456789')) if ref else column + 1
+                    kind = cell.get('t', 'n')
+                    if kind == 'inlineStr':
+                        child = cell.find(inline_tag)
+                        value = None if child is None else _text(child, ns)
+                    else:
+                        value = cell.findtext(value_tag) or None
+                        if value is not None:
+                            if kind == 'n':
+                                value = float(value) if '.' in value or 'E' in value or 'e' in value else int(value)
+                                style = int(cell.get('s', 0))
+                                if style in date_styles:
+                                    try:
+                                        value = from_excel(value, epoch, timedelta=style in timedelta_styles)
+                                    except (OverflowError, ValueError):
+                                        value = '#VALUE!'
+                            elif kind == 's':
+                                value = shared_strings[int(value)]
+                            elif kind == 'b':
+                                value = bool(int(value))
+                            elif kind == 'd':
+                                value = from_ISO8601(value)
+                    cells.append((column, value))
+                element.clear()
+                if sheet_data is not None:
+                    sheet_data.remove(element)
+
+                # Rows missing from the XML are empty
+                while next_row < row_number:
+                    next_row += 1
+                    yield empty_row
+                next_row = row_number + 1
+                values = [None] * max([max_col or 0] + [column for column, _ in cells])
+                for column, value in cells:
+                    values[column - 1] = value
+                yield tuple(values)
+
+        if max_row is not None:
+            while next_row <= max_row:
+                next_row += 1
+                yield empty_row
+
+
+def iter_xlsx_rows(filepath, reader=None):
+    """Yield every row of the first worksheet as a tuple of cell values
+
+    reader names the backend (see choose_reader).
+    """
+    reader = choose_reader(filepath, reader)
+    if reader == 'calamine':
+        return _calamine_rows(filepath)
+    if reader == 'xml':
+        return _xml_rows(filepath)
+    return _openpyxl_rows(filepath)
+
+
+def export_row_count(filepath, header_row=HEADER_ROW):
+    """Number of data rows declared by the worksheet's <dimension>, or None if unknown
+
+    Only the start of the worksheet is read; a sheet without a <dimension>
+    is not counted, since that would mean parsing all of it.
+    """
+    if os.path.splitext(filepath)[1].lower() != '.xlsx':
+        return None
+    from openpyxl.utils.cell import range_boundaries
+
+    max_row = None
+    with zipfile.ZipFile(filepath) as archive:
+        _, ns, _, sheet_part = _first_sheet(archive)
+        with archive.open(sheet_part) as source:
+            for event, element in ElementTree.iterparse(source, events=('start',)):
+                if element.tag == f'{{{ns}}}dimension':
+                    try:
+                        max_row = range_boundaries(element.get('ref'))[3]
+                    except (TypeError, ValueError):
+                        pass
+                    break
+                if element.tag == f'{{{ns}}}sheetData':
+                    break
+    if not max_row:
+        return None
+    return max(0, max_row - header_row - 1)
+
+
+def _without_trailing_empty_rows(rows):
+    """Rows up to the last one with a value; backends differ in the empty rows they read after it"""
+    pending = []
+    for row in rows:
+        if any(value is not None for value in row):
+            yield from pending
+            pending = []
+            yield row
+        else:
+            pending.append(row)
+
+
+def _xlsx_header_and_rows(filepath, header_row, reader=None):
+    """The header row (without unnamed trailing columns) and an iterator over the data rows below it"""
+    rows = iter_xlsx_rows(filepath, reader)
+    for index, row in enumerate(rows):
+        if index == header_row:
+            header = list(row)
+            while header and header[-1] is None:
+                header.pop()
+            return header, _without_trailing_empty_rows(rows)
+    return None, rows
+
+
+def export_columns(filepath, header_row=HEADER_ROW, reader=None):
+    """Column names of the export's header row"""
+    if os.path.splitext(filepath)[1].lower() == '.csv':
+        import pandas as pd
+
+        return list(pd.read_csv(filepath, skiprows=header_row, header=0, nrows=0).columns)
+    header, rows = _xlsx_header_and_rows(filepath, header_row, reader)
+    rows.close()
+    return [] if header is None else header
+
+
+def iter_export_rows(filepath, columns, header_row=HEADER_ROW, chunksize=50000, reader=None):
+    """Yield the export's data rows as tuples of the given columns, in order"""
+    import pandas as pd
+
+    if os.path.splitext(filepath)[1].lower() == '.csv':
+        csv_chunks = pd.read_csv(filepath, skiprows=header_row, header=0, chunksize=chunksize,
+                                 usecols=columns, dtype=object)
+        for chunk in csv_chunks:
+            chunk = chunk[columns].astype(object).where(chunk[columns].notna(), None)
+            yield from chunk.itertuples(index=False, name=None)
+        return
+
+    header, rows = _xlsx_header_and_rows(filepath, header_row, reader)
+    if header is None:
+        return
+
+    missing = [col for col in columns if col not in header]
+    if missing:
+        raise KeyError(f"Missing columns in export: {', '.join(missing)}")
+    positions = [header.index(col) for col in columns]
+    for row in rows:
+        yield tuple(row[i] if i < len(row) else None for i in positions)
+
+
+def iter_export_chunks(filepath, chunksize=50000, columns=None, header_row=HEADER_ROW, reader=None, skip_rows=0):
+    """Yield the export's data rows as DataFrames of at most chunksize rows
+
+    If columns is given only those columns are kept, which keeps each chunk
+    small when the export has many columns we do not use. The first
+    skip_rows data rows are passed over before any DataFrame is built.
+    """
+    import pandas as pd
+
+    if os.path.splitext(filepath)[1].lower() == '.csv':
+        last_skipped = header_row + skip_rows
+        csv_chunks = pd.read_csv(filepath, skiprows=lambda i: i < header_row or header_row < i <= last_skipped,
+                                 header=0, chunksize=chunksize, usecols=columns, dtype=object)
+        for chunk in csv_chunks:
+            yield chunk
+        return
+
+    header, rows = _xlsx_header_and_rows(filepath, header_row, reader)
+    if header is None:
+        return
+
+    if columns is None:
+        positions = list(range(len(header)))
+    else:
+        missing = [col for col in columns if col not in header]
+        if missing:
+            raise KeyError(f"Missing columns in export: {', '.join(missing)}")
+        positions = [header.index(col) for col in columns]
+    names = [header[i] for i in positions]
+
+    if skip_rows:
+        rows = itertools.islice(rows, skip_rows, None)
+    batch = []
+    for row in rows:
+        batch.append([row[i] if i < len(row) else None for i in positions])
+        if len(batch) >= chunksize:
+            yield pd.DataFrame(batch, columns=names)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch, columns=names)
+
+
+def read_export(filepath, header_row=HEADER_ROW, reader=None):
+    """The whole export below its header row as one DataFrame of object columns
+
+    Gives what pd.read_excel(header=None) gave after dropping the preamble
+    (empty cells and the NA_TEXTS become NaN), whichever backend reads it.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if os.path.splitext(filepath)[1].lower() == '.csv':
+        return pd.read_csv(filepath, skiprows=header_row, header=0, dtype=object)
+
+    header, rows = _xlsx_header_and_rows(filepath, header_row, reader)
+    if header is None:
+        return pd.DataFrame()
+    width = len(header)
+    data = [row[:width] if len(row) >= width else tuple(row) + (None,) * (width - len(row)) for row in rows]
+    df = pd.DataFrame(data, columns=header, dtype=object) if data else pd.DataFrame(columns=header, dtype=object)
+    return df.mask(df.isna() | df.isin(NA_TEXTS), np.nan)
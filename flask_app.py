@@ -1,21 +1,63 @@
 import os
 import json
 import tempfile
+import threading
 import base64
+import gzip
+import uuid
+import zlib
 from datetime import datetime
 import io
-from flask import Flask, request, jsonify, send_file, render_template_string
+from flask import Flask, Response, request, jsonify, send_file, render_template_string, stream_with_context
+from levels import classify_titles, level_columns, level_name, level_patterns, patterns_version, titles_reference
+from progress_events import broker, valid_job_id
 
 # Import heavy dependencies only when needed
 def get_pandas():
     import pandas as pd
     return pd
 
-def get_re():
-    import re
-    return re
+# Exports at least this large are aggregated in chunks instead of loaded whole
+STREAMING_THRESHOLD_MB = float(os.environ.get('STREAMING_THRESHOLD_MB', '50'))
+STREAMING_CHUNK_ROWS = int(os.environ.get('STREAMING_CHUNK_ROWS', '50000'))
 
-# Configuration for easy pattern management
+# Every processed report is stored as a dated snapshot for trend queries
+SNAPSHOTS_ENABLED = os.environ.get('SNAPSHOTS_ENABLED', '1') not in ('0', 'false', 'no')
+SNAPSHOT_DB_PATH = os.environ.get('SNAPSHOT_DB_PATH', os.path.join('data', 'report_history.db'))
+
+# Processed transcripts and results are kept as memory-mapped Arrow files
+# that every worker shares (needs pyarrow), for ARROW_DATASET_HOURS; each
+# worker keeps at most ARROW_MAPPED_TABLES of them mapped
+ARROW_DATASETS_ENABLED = os.environ.get('ARROW_DATASETS', '1') not in ('0', 'false', 'no')
+ARROW_DATASET_DIR = os.environ.get('ARROW_DATASET_DIR', os.path.join('data', 'datasets'))
+ARROW_DATASET_HOURS = float(os.environ.get('ARROW_DATASET_HOURS', '24'))
+ARROW_MAPPED_TABLES = int(os.environ.get('ARROW_MAPPED_TABLES', '16'))
+
+# Results of identical requests (same file contents, job role, patterns and
+# options) are reused; the least recently used beyond RESULT_CACHE_ENTRIES go
+RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE', '1') not in ('0', 'false', 'no')
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join('data', 'result_cache'))
+RESULT_CACHE_ENTRIES = int(os.environ.get('RESULT_CACHE_ENTRIES', '50'))
+
+# Rows converted from Arrow at a time when streaming dataset results
+NDJSON_BATCH_ROWS = int(os.environ.get('NDJSON_BATCH_ROWS', '5000'))
+
+# Every SSE progress listener holds a request thread while it waits; beyond
+# this many per worker process the page polls /progress/<job_id>/events
+PROGRESS_MAX_LISTENERS = int(os.environ.get('PROGRESS_MAX_LISTENERS', '4'))
+
+# JSON responses at least this large are compressed for clients that accept it
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+
+# Preview mode: users sampled and seconds spent scanning before answering
+PREVIEW_SAMPLE_USERS = int(os.environ.get('PREVIEW_SAMPLE_USERS', '2000'))
+PREVIEW_TIME_BUDGET = float(os.environ.get('PREVIEW_TIME_BUDGET', '0.5'))
+
+# /bundle groupings and the completion column each one splits on
+BUNDLE_GROUPS = {'job_role': 'Job Role', 'dealer': 'Dealer Name'}
+
+# Configuration for easy pattern management; every 'level<N>_patterns'
+# list defines a training level (see levels.py)
 CONFIG = {
     'level1_patterns': [
         # Core patterns
@@ -80,116 +122,17 @@ CONFIG = {
     ]
 }
 
-def identify_level1_trainings(df):
-    """Identify Level 1 training titles with flexible pattern matching"""
-    re = get_re()
-    level1_patterns = CONFIG['level1_patterns']
-    
-    level1_titles = set()
-    for title in df['Training Title'].unique():
-        title_str = str(title).upper()
-        for pattern in level1_patterns:
-            if re.search(pattern, title_str):
-                level1_titles.add(title)
-                break
-                
-    return list(level1_titles)
-
-def identify_level2_trainings(df):
-    """Identify Level 2 training titles with flexible pattern matching"""
-    re = get_re()
-    level2_patterns = CONFIG['level2_patterns']
-    
-    level2_titles = set()
-    for title in df['Training Title'].unique():
-        title_str = str(title).upper()
-        for pattern in level2_patterns:
-            if re.search(pattern, title_str):
-                level2_titles.add(title)
-                break
-                
-    return list(level2_titles)
-
-def extract_brand(user_df):
-    """Extract brand information from training data"""
-    training_titles = user_df['Training Title'].astype(str).str.upper()
-    
-    if any('FIAT' in title for title in training_titles):
-        return 'Fiat Professional'
-    elif any('JEEP' in title for title in training_titles):
-        return 'Jeep'
-    elif any('PEUGEOT' in title for title in training_titles):
-        return 'Peugeot'
-    elif any('CITROEN' in title for title in training_titles):
-        return 'Citroen'
-    elif any('ALFA ROMEO' in title for title in training_titles):
-        return 'Alfa Romeo'
-    else:
-        return 'Other'
+def identify_level_trainings(df):
+    """Map each configured level to its training titles, classified in one pass"""
+    return classify_titles(df['Training Title'].unique(), level_patterns(CONFIG))
 
-def calculate_completion_percentages(df, level1_titles, level2_titles):
-    """Calculate completion percentages for each individual"""
-    completion_data = []
+def calculate_completion_percentages(df, level_titles):
+    """Calculate completion percentages for each individual and level"""
+    from parallel_aggregation import calculate_completion_percentages_parallel
     
-    # Group by User ID and User Full Name
-    user_groups = df.groupby(['User ID', 'User Full Name'])
-    
-    for (user_id, user_name), user_df in user_groups:
-        # Split full name into first and last name
-        name_parts = str(user_name).split(', ')
-        if len(name_parts) >= 2:
-            last_name = name_parts[0]
-            first_name = name_parts[1] if len(name_parts) > 1 else ""
-        else:
-            last_name = str(user_name)
-            first_name = ""
-        
-        user_data = {
-            'User ID': user_id,
-            'First Name': first_name,
-            'Last Name': last_name,
-            'Job Role': user_df['Position'].iloc[0] if len(user_df) > 0 else '',
-            'Dealer Name': user_df['Division'].iloc[0] if len(user_df) > 0 else '',
-            'User Brand': extract_brand(user_df),
-            'Total Level 1 Trainings': 0,
-            'Completed Level 1 Trainings': 0,
-            'Level 1 Completion %': 0.0,
-            'Total Level 2 Trainings': 0,
-            'Completed Level 2 Trainings': 0,
-            'Level 2 Completion %': 0.0,
-            'Overall Completion %': 0.0
-        }
-        
-        # Level 1 calculations
-        level1_df = user_df[user_df['Training Title'].isin(level1_titles)]
-        user_data['Total Level 1 Trainings'] = len(level1_df)
-        user_data['Completed Level 1 Trainings'] = len(level1_df[level1_df['Transcript Status'].isin(['Completed', 'Approved'])])
-        
-        if user_data['Total Level 1 Trainings'] > 0:
-            user_data['Level 1 Completion %'] = round(
-                (user_data['Completed Level 1 Trainings'] / user_data['Total Level 1 Trainings']) * 100, 2
-            )
-        
-        # Level 2 calculations
-        level2_df = user_df[user_df['Training Title'].isin(level2_titles)]
-        user_data['Total Level 2 Trainings'] = len(level2_df)
-        user_data['Completed Level 2 Trainings'] = len(level2_df[level2_df['Transcript Status'].isin(['Completed', 'Approved'])])
-        
-        if user_data['Total Level 2 Trainings'] > 0:
-            user_data['Level 2 Completion %'] = round(
-                (user_data['Completed Level 2 Trainings'] / user_data['Total Level 2 Trainings']) * 100, 2
-            )
-        
-        # Overall completion percentage
-        total_trainings = user_data['Total Level 1 Trainings'] + user_data['Total Level 2 Trainings']
-        total_completed = user_data['Completed Level 1 Trainings'] + user_data['Completed Level 2 Trainings']
-        
-        if total_trainings > 0:
-            user_data['Overall Completion %'] = round((total_completed / total_trainings) * 100, 2)
-        
-        completion_data.append(user_data)
-        
-    return completion_data
+    # Rows are sharded by User ID across AGGREGATION_WORKERS processes;
+    # exports below PARALLEL_MIN_ROWS rows are aggregated in this process
+    return calculate_completion_percentages_parallel(df, level_titles)
 
 def create_stellantis_report(completion_data):
     """Create a STELLANTIS format report DataFrame"""
@@ -198,12 +141,10 @@ def create_stellantis_report(completion_data):
         
     df = get_pandas().DataFrame(completion_data)
     
-    # Reorder columns to match STELLANTIS format with assigned counts
+    # Reorder columns to match STELLANTIS format with assigned counts per level
     column_order = [
-        'User ID', 'First Name', 'Last Name', 'Job Role', 'Dealer Name', 
-        'User Brand', 'Total Level 1 Trainings', 'Completed Level 1 Trainings', 'Level 1 Completion %',
-        'Total Level 2 Trainings', 'Completed Level 2 Trainings', 'Level 2 Completion %'
-    ]
+        'User ID', 'First Name', 'Last Name', 'Job Role', 'Dealer Name', 'User Brand'
+    ] + level_columns(df.columns)
     
     # Filter to only include columns that exist
     existing_columns = [col for col in column_order if col in df.columns]
@@ -478,8 +419,8 @@ MAIN_HTML = """
                     <i class="fas fa-file-excel"></i>
                 </div>
                 <h3>Upload Training Report Excel File</h3>
-                <p class="text-muted">Select your Enterprise Training Report Excel file to process</p>
-                <input type="file" id="fileInput" class="file-input" accept=".xlsx,.xls">
+                <p class="text-muted">Select your Enterprise Training Report Excel file to process (several overlapping exports are merged)</p>
+                <input type="file" id="fileInput" class="file-input" accept=".xlsx,.xls,.csv" multiple>
                 <button class="btn btn-primary" onclick="document.getElementById('fileInput').click()">
                     <i class="fas fa-upload"></i> Choose File
                 </button>
@@ -500,7 +441,24 @@ MAIN_HTML = """
                         <option value="SER-2-Service Advisor">SER-2-Service Advisor</option>
                     </select>
                 </div>
-                <div class="col-md-6 text-end">
+                <div class="col-md-3">
+                    <label for="outputFormat" class="form-label fw-bold">Output Format:</label>
+                    <select id="outputFormat" class="form-select">
+                        <option value="xlsx">Excel (.xlsx)</option>
+                        <option value="csv">CSV</option>
+                        <option value="ndjson">NDJSON</option>
+                        <option value="parquet">Parquet</option>
+                    </select>
+                </div>
+                <div class="col-md-3 text-end">
+                    <div class="form-check form-check-inline mb-2">
+                        <input class="form-check-input" type="checkbox" id="splitDealers">
+                        <label class="form-check-label" for="splitDealers">Split per dealer</label>
+                    </div>
+                    <div class="form-check form-check-inline mb-2">
+                        <input class="form-check-input" type="checkbox" id="quickPreview">
+                        <label class="form-check-label" for="quickPreview">Quick preview first</label>
+                    </div>
                     <button class="btn btn-success" id="processBtn" onclick="processFile()" disabled>
                         <i class="fas fa-cogs"></i> Generate Training Report
                     </button>
@@ -511,7 +469,10 @@ MAIN_HTML = """
         <div class="loading" id="loading">
             <div class="spinner"></div>
             <h4>Processing your training report...</h4>
-            <p class="text-muted">This may take a few moments</p>
+            <p class="text-muted" id="progressText">This may take a few moments</p>
+            <div class="progress mx-auto" style="max-width: 400px; height: 8px;">
+                <div class="progress-bar bg-secondary" id="progressBar" role="progressbar" style="width: 0%"></div>
+            </div>
         </div>
         
         <div class="results-section" id="results"></div>
@@ -520,6 +481,7 @@ MAIN_HTML = """
     <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js"></script>
     <script>
         let selectedFile = null;
+        let selectedFiles = [];
         
         // Drag and drop functionality
         const uploadArea = document.getElementById('uploadArea');
@@ -538,25 +500,27 @@ MAIN_HTML = """
             uploadArea.classList.remove('dragover');
             const files = e.dataTransfer.files;
             if (files.length > 0) {
-                handleFileSelect(files[0]);
+                handleFileSelect(files);
             }
         });
         
         document.getElementById('fileInput').addEventListener('change', function(e) {
-            const file = e.target.files[0];
-            if (file) {
-                handleFileSelect(file);
+            if (e.target.files.length > 0) {
+                handleFileSelect(e.target.files);
             }
         });
         
-        function handleFileSelect(file) {
-            selectedFile = file;
+        function handleFileSelect(files) {
+            selectedFiles = Array.from(files);
+            selectedFile = selectedFiles[0];
+            const totalSize = selectedFiles.reduce((sum, file) => sum + file.size, 0);
             document.getElementById('fileInfo').innerHTML = `
                 <div class="d-flex align-items-center">
                     <i class="fas fa-file-excel me-3" style="font-size: 2em; color: #28a745;"></i>
                     <div>
-                        <strong>File Selected:</strong> ${file.name}<br>
-                        <strong>Size:</strong> ${(file.size / (1024 * 1024)).toFixed(2)} MB
+                        <strong>${selectedFiles.length > 1 ? 'Files Selected (merged)' : 'File Selected'}:</strong>
+                        ${selectedFiles.map(file => file.name).join(', ')}<br>
+                        <strong>Size:</strong> ${(totalSize / (1024 * 1024)).toFixed(2)} MB
                     </div>
                 </div>
             `;
@@ -568,8 +532,25 @@ MAIN_HTML = """
             if (!selectedFile) return;
             
             const formData = new FormData();
-            formData.append('file', selectedFile);
+            selectedFiles.forEach(file => formData.append('file', file));
             formData.append('job_role', document.getElementById('jobRole').value);
+            formData.append('output_format', document.getElementById('outputFormat').value);
+            if (document.getElementById('splitDealers').checked) {
+                formData.append('split_dealers', '1');
+            }
+            const preview = document.getElementById('quickPreview').checked;
+            if (preview) {
+                formData.append('preview', '1');
+            }
+            
+            // Subscribe to progress before uploading so no event is missed
+            const jobId = newJobId();
+            formData.append('job_id', jobId);
+            const events = watchProgress(jobId, (result) => {
+                // The full report finished in the background after a preview
+                document.getElementById('loading').style.display = 'none';
+                showResults(result);
+            });
             
             document.getElementById('loading').style.display = 'block';
             document.getElementById('results').style.display = 'none';
@@ -580,6 +561,12 @@ MAIN_HTML = """
             })
             .then(response => response.json())
             .then(data => {
+                if (data.success && data.preview) {
+                    // Keep listening: the full report is still being generated
+                    showPreview(data);
+                    return;
+                }
+                events.close();
                 document.getElementById('loading').style.display = 'none';
                 if (data.success) {
                     showResults(data);
@@ -588,11 +575,149 @@ MAIN_HTML = """
                 }
             })
             .catch(error => {
+                events.close();
                 document.getElementById('loading').style.display = 'none';
                 alert('Error: ' + error.message);
             });
         }
         
+        function newJobId() {
+            if (window.crypto && crypto.randomUUID) {
+                return crypto.randomUUID();
+            }
+            return Date.now().toString(36) + Math.random().toString(36).slice(2, 12);
+        }
+        
+        function watchProgress(jobId, onResult) {
+            const bar = document.getElementById('progressBar');
+            const text = document.getElementById('progressText');
+            bar.style.width = '0%';
+            text.textContent = 'Uploading file...';
+            
+            let lastId = -1;
+            let timer = null;
+            let closed = false;
+            const handle = (event) => {
+                lastId = event.id;
+                if (event.percent !== null && event.percent !== undefined) {
+                    bar.style.width = event.percent + '%';
+                }
+                if (event.stage === 'reading') {
+                    text.textContent = `Reading rows... ${event.rows_read.toLocaleString()}` +
+                        (event.total_rows ? ` of ${event.total_rows.toLocaleString()}` : '');
+                } else if (event.stage === 'classified') {
+                    const found = Object.keys(event).filter(key => /^level\\d+_titles$/.test(key))
+                        .map(key => `${event[key]} Level ${key.match(/\\d+/)[0]}`);
+                    text.textContent = `Found ${found.join(', ')} training titles`;
+                } else if (event.stage === 'aggregated') {
+                    text.textContent = `Calculated completion for ${event.users.toLocaleString()} individuals`;
+                } else if (event.stage === 'writing') {
+                    text.textContent = `Writing sheet ${event.sheet}...`;
+                } else if (event.stage === 'done' || event.stage === 'error') {
+                    watcher.close();
+                    if (event.result && onResult) {
+                        onResult(event.result);
+                    } else if (event.stage === 'error' && event.background) {
+                        document.getElementById('loading').style.display = 'none';
+                        alert('Error: ' + event.error);
+                    }
+                }
+            };
+            const poll = () => {
+                fetch(`/progress/${jobId}/events?after=${lastId}`)
+                    .then(response => response.json())
+                    .then(data => (data.events || []).forEach(event => { if (!closed) handle(event); }))
+                    .catch(() => {})
+                    .finally(() => { if (!closed) timer = setTimeout(poll, 1000); });
+            };
+            const events = new EventSource('/progress/' + jobId);
+            events.addEventListener('progress', (e) => handle(JSON.parse(e.data)));
+            events.addEventListener('error', () => {
+                // Refused (too many listeners) or gone for good: poll instead
+                if (events.readyState === EventSource.CLOSED && !closed && timer === null) {
+                    poll();
+                }
+            });
+            const watcher = {
+                close() {
+                    closed = true;
+                    events.close();
+                    clearTimeout(timer);
+                }
+            };
+            return watcher;
+        }
+        
+        function formatInterval(low, high) {
+            return (low === null || high === null) ? '' : `<div class="stat-label">95% CI ${low}% - ${high}%</div>`;
+        }
+        
+        function showPreview(data) {
+            const resultsDiv = document.getElementById('results');
+            // Estimates from a scanned prefix come without intervals: later rows may differ
+            const coverage = data.sample.complete
+                ? `all ${data.sample.rows_scanned.toLocaleString()} rows scanned`
+                : `estimated from the first ${data.sample.rows_scanned.toLocaleString()} rows only`;
+            resultsDiv.innerHTML = `
+                <h5 class="text-muted"><i class="fas fa-bolt"></i> Preview from ${data.sample.users_sampled.toLocaleString()} sampled individuals (${coverage}) - full report in progress</h5>
+                <div class="stats-grid">
+                    <div class="stat-card">
+                        <i class="fas fa-users"></i>
+                        <div class="stat-number">${data.sample.users_seen.toLocaleString()}</div>
+                        <div class="stat-label">Individuals Seen</div>
+                    </div>
+                    ${data.levels.map(level => `
+                    <div class="stat-card">
+                        <i class="fas fa-chart-pie"></i>
+                        <div class="stat-number">~${data['avg_' + level.label + '_completion']}%</div>
+                        <div class="stat-label">Avg ${level.name} Completion</div>
+                        ${data.sample.complete
+                            ? formatInterval(...data['avg_' + level.label + '_completion_ci'])
+                            : '<div class="stat-label">Prefix estimate, no CI</div>'}
+                    </div>`).join('')}
+                </div>
+                <div class="job-breakdown">
+                    <h5><i class="fas fa-users"></i> Job Role Breakdown (${data.sample.complete ? 'approximate' : 'scaled up from the scanned rows'})</h5>
+                    ${Object.entries(data.job_role_breakdown).map(([role, count]) =>
+                        `<div class="job-item">
+                            <span>${role}</span>
+                            <span class="badge" style="background-color: #6c757d; color: white;">~${count}</span>
+                        </div>`
+                    ).join('')}
+                </div>
+            `;
+            resultsDiv.style.display = 'block';
+        }
+        
+        function downloadBundle(by) {
+            if (!selectedFile) return;
+            
+            const formData = new FormData();
+            formData.append('file', selectedFile);
+            formData.append('job_role', document.getElementById('jobRole').value);
+            formData.append('by', by);
+            
+            fetch('/bundle', {
+                method: 'POST',
+                body: formData
+            })
+            .then(response => {
+                if (!response.ok) {
+                    return response.json().then(data => { throw new Error(data.error || 'Unknown error occurred'); });
+                }
+                const disposition = response.headers.get('Content-Disposition') || '';
+                const match = disposition.match(/filename=([^;]+)/);
+                return response.blob().then(blob => {
+                    const link = document.createElement('a');
+                    link.href = URL.createObjectURL(blob);
+                    link.download = match ? match[1] : `Stellantis_Reports_by_${by}.zip`;
+                    link.click();
+                    URL.revokeObjectURL(link.href);
+                });
+            })
+            .catch(error => alert('Error: ' + error.message));
+        }
+        
         function showResults(data) {
             const resultsDiv = document.getElementById('results');
             
@@ -604,53 +729,38 @@ MAIN_HTML = """
                         <div class="stat-number">${data.total_individuals}</div>
                         <div class="stat-label">Total Individuals</div>
                     </div>
+                    ${data.levels.map(level => `
                     <div class="stat-card">
                         <i class="fas fa-graduation-cap"></i>
-                        <div class="stat-number">${data.level1_titles_count}</div>
-                        <div class="stat-label">Level 1 Available</div>
-                    </div>
-                    <div class="stat-card">
-                        <i class="fas fa-star"></i>
-                        <div class="stat-number">${data.level2_titles_count}</div>
-                        <div class="stat-label">Level 2 Available</div>
-                    </div>
+                        <div class="stat-number">${data[level.label + '_titles_count']}</div>
+                        <div class="stat-label">${level.name} Available</div>
+                    </div>`).join('')}
+                    ${data.levels.map(level => `
                     <div class="stat-card">
                         <i class="fas fa-chart-pie"></i>
-                        <div class="stat-number">${data.avg_level1_completion}%</div>
-                        <div class="stat-label">Avg Level 1 Completion</div>
-                    </div>
-                    <div class="stat-card">
-                        <i class="fas fa-chart-line"></i>
-                        <div class="stat-number">${data.avg_level2_completion}%</div>
-                        <div class="stat-label">Avg Level 2 Completion</div>
-                    </div>
+                        <div class="stat-number">${data['avg_' + level.label + '_completion']}%</div>
+                        <div class="stat-label">Avg ${level.name} Completion</div>
+                    </div>`).join('')}
                     <div class="stat-card">
                         <i class="fas fa-tasks"></i>
-                        <div class="stat-number">${data.avg_assigned_level1}/${data.avg_assigned_level2}</div>
-                        <div class="stat-label">Avg Assigned L1/L2</div>
+                        <div class="stat-number">${data.levels.map(level => data['avg_assigned_' + level.label]).join('/')}</div>
+                        <div class="stat-label">Avg Assigned ${data.levels.map(level => level.name.replace('Level ', 'L')).join('/')}</div>
                     </div>
                 </div>
             `;
             
-            // Create training titles section
+            // Create training titles section, one column per level
             const trainingTitlesHTML = `
                 <div class="row">
-                    <div class="col-md-6">
+                    ${data.levels.map(level => `
+                    <div class="col-md-${Math.max(4, 12 / data.levels.length)}">
                         <div class="training-titles">
-                            <h5><i class="fas fa-graduation-cap"></i> Level 1 Training Titles</h5>
+                            <h5><i class="fas fa-graduation-cap"></i> ${level.name} Training Titles</h5>
                             <div class="training-list">
-                                ${data.level1_titles.map(title => `<div class="training-item"><i class="fas fa-check me-2" style="color: #28a745;"></i>${title}</div>`).join('')}
+                                ${data[level.label + '_titles'].map(title => `<div class="training-item"><i class="fas fa-check me-2" style="color: #28a745;"></i>${title}</div>`).join('')}
                             </div>
                         </div>
-                    </div>
-                    <div class="col-md-6">
-                        <div class="training-titles">
-                            <h5><i class="fas fa-star"></i> Level 2 Training Titles</h5>
-                            <div class="training-list">
-                                ${data.level2_titles.map(title => `<div class="training-item"><i class="fas fa-check me-2" style="color: #28a745;"></i>${title}</div>`).join('')}
-                            </div>
-                        </div>
-                    </div>
+                    </div>`).join('')}
                 </div>
             `;
             
@@ -658,6 +768,7 @@ MAIN_HTML = """
             const jobBreakdownHTML = `
                 <div class="job-breakdown">
                     <h5><i class="fas fa-users"></i> Job Role Breakdown</h5>
+                    ${data.merge ? `<p class="text-muted">Merged ${data.merge.files} exports: ${data.merge.duplicates_removed} duplicate rows removed</p>` : ''}
                     ${Object.entries(data.job_role_breakdown).map(([role, count]) => 
                         `<div class="job-item">
                             <span>${role}</span>
@@ -670,9 +781,22 @@ MAIN_HTML = """
             // Create download section
             const downloadHTML = `
                 <div class="download-section">
-                    <a href="/download/${data.filename}" class="btn-download">
-                        <i class="fas fa-download"></i> Download Stellantis Report
-                    </a>
+                    ${data.files.map(file => `
+                    <a href="/download/${file}" class="btn-download">
+                        <i class="fas fa-download"></i> Download ${data.files.length > 1 ? file : 'Stellantis Report'}
+                    </a>`).join('')}
+                    ${data.dealer_zip ? `
+                    <a href="/download/${data.dealer_zip}" class="btn-download">
+                        <i class="fas fa-file-archive"></i> Download Per-Dealer Reports (.zip)
+                    </a>` : ''}
+                    <div class="mt-3">
+                        <button class="btn btn-outline-secondary btn-sm me-2" onclick="downloadBundle('job_role')">
+                            <i class="fas fa-file-archive"></i> Zip of reports by job role
+                        </button>
+                        <button class="btn btn-outline-secondary btn-sm" onclick="downloadBundle('dealer')">
+                            <i class="fas fa-file-archive"></i> Zip of reports by dealer
+                        </button>
+                    </div>
                 </div>
             `;
             
@@ -706,124 +830,807 @@ def test():
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
+    job_id = request.form.get('job_id') or None
+    if job_id is not None and not valid_job_id(job_id):
+        return jsonify({'error': 'job_id must be 8-64 letters, digits, - or _'}), 400
+    progress = broker.reporter(job_id) if job_id else None
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
         
-        file = request.files['file']
+        files = request.files.getlist('file')
+        file = files[0]
         job_role = request.form.get('job_role', 'All')
+        streaming = parse_streaming_flag(request.form.get('streaming'))
+        preview = parse_streaming_flag(request.form.get('preview')) is True
+        try:
+            from report_formats import check_output_format
+            output_format = check_output_format(request.form.get('output_format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        snapshot_date = request.form.get('snapshot_date') or None
+        if snapshot_date:
+            try:
+                snapshot_date = datetime.strptime(snapshot_date, '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({'error': 'snapshot_date must be YYYY-MM-DD'}), 400
+        
+        try:
+            from completion_windows import parse_points
+            completion_points = parse_points(request.form.get('as_of'), request.form.get('window_days'),
+                                             request.form.get('windows'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if file.filename == '':
+        if any(f.filename == '' for f in files):
             return jsonify({'error': 'No file selected'}), 400
+        try:
+            from export_reader import export_suffix
+            suffixes = [export_suffix(f.filename) for f in files]
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Save file temporarily
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"temp_upload_{timestamp}.xlsx"
+        # Save files temporarily under names no concurrent upload can share, keeping their type
+        os.makedirs('uploads', exist_ok=True)
+        filepaths = []
+        for suffix in suffixes:
+            fd, path = tempfile.mkstemp(prefix='temp_upload_', suffix=suffix, dir='uploads')
+            os.close(fd)
+            filepaths.append(path)
+        filepath = filepaths[0]
+        options = dict(streaming=streaming, source_name=', '.join(f.filename for f in files),
+                       snapshot_date=snapshot_date, output_format=output_format,
+                       split_dealers=parse_streaming_flag(request.form.get('split_dealers')) is True,
+                       completion_points=completion_points)
+        handed_off = False
+        try:
+            for f, path in zip(files, filepaths):
+                f.save(path)
+            if completion_points:
+                # Refuse as_of before processing when the export has no dates for it
+                try:
+                    check_date_columns(filepaths)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+            
+            # Several overlapping exports are merged; the sampled preview reads a single file
+            if len(filepaths) > 1:
+                result = process_training_report(filepaths, job_role, progress=progress, **options)
+            elif preview:
+                # Answer from a sample now and run the full report in the background
+                job_id = job_id or uuid.uuid4().hex
+                result = preview_report(filepath, job_role)
+                threading.Thread(target=run_background_report, args=(job_id, filepath, job_role, options),
+                                 daemon=True).start()
+                handed_off = True
+                return jsonify(dict(result, job_id=job_id))
+            else:
+                # Process the file
+                result = process_training_report(filepath, job_role, progress=progress, **options)
+        finally:
+            # Clean up (a background report removes the file itself)
+            if not handed_off:
+                for path in filepaths:
+                    os.remove(path)
+        
+        if progress:
+            progress('done', percent=100, filename=result['filename'])
+        return jsonify(result)
         
-        # Create uploads directory if it doesn't exist
+    except Exception as e:
+        if progress:
+            progress('error', error=str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/bundle', methods=['POST'])
+def bundle_reports():
+    """Zip of one report per job role or per dealer, streamed while it is generated"""
+    try:
+        if 'file' not in request.files or request.files['file'].filename == '':
+            return jsonify({'error': 'No file provided'}), 400
+        group_by = request.form.get('by', 'job_role')
+        if group_by not in BUNDLE_GROUPS:
+            return jsonify({'error': f"by must be one of: {', '.join(BUNDLE_GROUPS)}"}), 400
+        try:
+            from export_reader import export_suffix
+            suffix = export_suffix(request.files['file'].filename)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Load the upload once; every report in the bundle is built from it
         os.makedirs('uploads', exist_ok=True)
-        filepath = os.path.join('uploads', filename)
-        file.save(filepath)
+        fd, filepath = tempfile.mkstemp(prefix='temp_bundle_', suffix=suffix, dir='uploads')
+        os.close(fd)
+        try:
+            request.files['file'].save(filepath)
+            df_clean = load_clean_export(filepath)
+        finally:
+            os.remove(filepath)
         
-        # Process the file
-        result = process_training_report(filepath, job_role)
+        members = bundle_members(df_clean, request.form.get('job_role', 'All'), group_by)
         
-        # Clean up
-        os.remove(filepath)
+        from report_bundle import iter_zip
         
-        return jsonify(result)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return Response(
+            stream_with_context(iter_zip(members)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename=Stellantis_Reports_by_{group_by}_{timestamp}.zip'}
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/results.ndjson', methods=['POST'])
+def results_ndjson():
+    """Every per-user result row of an upload as NDJSON, encoded while it is sent
+
+    The export is aggregated chunk by chunk; the rows are then built and
+    encoded one batch at a time, so the full result never exists as one
+    JSON document.
+    """
+    from report_formats import MIMETYPES, iter_ndjson
+    from streaming_aggregation import aggregate_export_streaming
+    
+    try:
+        if 'file' not in request.files or request.files['file'].filename == '':
+            return jsonify({'error': 'No file provided'}), 400
+        try:
+            from export_reader import export_suffix
+            suffix = export_suffix(request.files['file'].filename)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        os.makedirs('uploads', exist_ok=True)
+        fd, filepath = tempfile.mkstemp(prefix='temp_ndjson_', suffix=suffix, dir='uploads')
+        os.close(fd)
+        try:
+            request.files['file'].save(filepath)
+            accumulator = aggregate_export_streaming(
+                filepath,
+                level_patterns(CONFIG),
+                get_job_roles(request.form.get('job_role', 'All')),
+                chunksize=STREAMING_CHUNK_ROWS
+            )
+        finally:
+            os.remove(filepath)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return Response(stream_with_context(iter_ndjson(accumulator.iter_completion_rows())),
+                    mimetype=MIMETYPES['ndjson'], headers={'X-Total-Count': str(len(accumulator.users))})
+
+@app.route('/diff', methods=['POST'])
+def diff_reports():
+    """Compare two exports, uploaded as 'before' and 'after' or given as stored dataset ids"""
+    from export_diff import diff_exports, read_transcripts, write_diff_workbook
+    
+    try:
+        sides = {}
+        for side in ('before', 'after'):
+            dataset_id = request.form.get(f'{side}_dataset')
+            upload = request.files.get(side)
+            if dataset_id:
+                from arrow_store import TRANSCRIPTS, valid_dataset_id
+                store = get_arrow_store()
+                if store is None or not valid_dataset_id(dataset_id) or not store.exists(dataset_id):
+                    return jsonify({'error': f'{side}_dataset is not a stored dataset'}), 404
+                sides[side] = store.table(dataset_id, TRANSCRIPTS).to_pandas()
+            elif upload is not None and upload.filename != '':
+                try:
+                    from export_reader import export_suffix
+                    suffix = export_suffix(upload.filename)
+                except ValueError as e:
+                    return jsonify({'error': f'{side}: {e}'}), 400
+                os.makedirs('uploads', exist_ok=True)
+                fd, filepath = tempfile.mkstemp(prefix='temp_diff_', suffix=suffix, dir='uploads')
+                os.close(fd)
+                try:
+                    upload.save(filepath)
+                    sides[side] = read_transcripts(filepath, chunksize=STREAMING_CHUNK_ROWS)
+                finally:
+                    os.remove(filepath)
+            else:
+                return jsonify({'error': f"Provide a '{side}' file or {side}_dataset"}), 400
         
+        tables, summary = diff_exports(sides['before'], sides['after'], level_patterns(CONFIG),
+                                       get_job_roles(request.form.get('job_role', 'All')))
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_filename = f"Stellantis_Diff_{timestamp}_{uuid.uuid4().hex[:8]}.xlsx"
+        write_diff_workbook(tables, os.path.join('uploads', output_filename))
+        return jsonify(dict(summary, success=True, filename=output_filename))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.after_request
+def compress_json(response):
+    """gzip or deflate JSON responses for clients that accept it"""
+    if (response.mimetype != 'application/json' or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(['gzip', 'deflate'])
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+    if encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=6)
+    else:
+        body = zlib.compress(body, 6)  # HTTP "deflate" is the zlib format
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+_progress_listeners = threading.BoundedSemaphore(PROGRESS_MAX_LISTENERS)
+
+def listener_slot_release():
+    """Release callback of a taken listener slot that frees it only once, however often it is called"""
+    taken = [True]
+    lock = threading.Lock()
+    
+    def release():
+        with lock:
+            if not taken[0]:
+                return
+            taken[0] = False
+        _progress_listeners.release()
+    return release
+
+@app.route('/progress/<job_id>')
+def progress_stream(job_id):
+    """Server-Sent Events stream of a job's progress, ending when it finishes"""
+    if not valid_job_id(job_id):
+        return jsonify({'error': 'Invalid job id'}), 400
+    # Listeners must not take every request thread; the page polls instead
+    if not _progress_listeners.acquire(blocking=False):
+        return jsonify({'error': 'Too many progress listeners, poll /progress/<job_id>/events'}), 503, \
+            {'Retry-After': '1'}
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else None
+    response = Response(
+        stream_with_context(broker.stream(job_id, last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # The server closes every response, even one whose stream never started
+    response.call_on_close(listener_slot_release())
+    return response
+
+@app.route('/progress/<job_id>/events')
+def progress_events(job_id):
+    """A job's progress events so far after the event id 'after', without waiting"""
+    if not valid_job_id(job_id):
+        return jsonify({'error': 'Invalid job id'}), 400
+    after = request.args.get('after', '')
+    return jsonify({'events': broker.events(job_id, int(after) if after.isdigit() else None)})
+
+@app.route('/trend')
+def trend():
+    """Completion over time from stored snapshots, filtered by query parameters"""
+    try:
+        rows = get_snapshot_store().trend(
+            user_id=request.args.get('user_id'),
+            dealer_name=request.args.get('dealer'),
+            job_role=request.args.get('job_role'),
+            level=request.args.get('level'),
+            start=request.args.get('start'),
+            end=request.args.get('end')
+        )
+        return jsonify({'trend': rows})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/datasets/<dataset_id>/results')
+def dataset_results(dataset_id):
+    """A page of per-user results of a processed upload, read from the shared Arrow dataset"""
+    from arrow_store import RESULTS, filter_rows, valid_dataset_id
+    
+    store = get_arrow_store()
+    if store is None:
+        return jsonify({'error': 'Arrow datasets are not enabled (they need pyarrow)'}), 404
+    if not valid_dataset_id(dataset_id):
+        return jsonify({'error': 'Invalid dataset id'}), 400
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(1000, max(1, int(request.args.get('limit', 100))))
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be numbers'}), 400
+    try:
+        table = store.table(dataset_id, RESULTS)
+    except FileNotFoundError:
+        return jsonify({'error': 'Dataset not found or expired'}), 404
+    rows = filter_rows(table, {
+        'User ID': request.args.get('user_id'),
+        'Dealer Name': request.args.get('dealer'),
+        'Job Role': request.args.get('job_role'),
+    })
+    return jsonify({
+        'dataset_id': dataset_id,
+        'total': rows.num_rows,
+        'offset': offset,
+        'limit': limit,
+        'rows': rows.slice(offset, limit).to_pylist()
+    })
+
+@app.route('/datasets/<dataset_id>/results.ndjson')
+def dataset_results_ndjson(dataset_id):
+    """Every per-user result of a processed upload as NDJSON, streamed from the shared Arrow dataset"""
+    from arrow_store import RESULTS, filter_rows, valid_dataset_id
+    from report_formats import MIMETYPES, iter_ndjson
+    
+    store = get_arrow_store()
+    if store is None:
+        return jsonify({'error': 'Arrow datasets are not enabled (they need pyarrow)'}), 404
+    if not valid_dataset_id(dataset_id):
+        return jsonify({'error': 'Invalid dataset id'}), 400
+    try:
+        table = store.table(dataset_id, RESULTS)
+    except FileNotFoundError:
+        return jsonify({'error': 'Dataset not found or expired'}), 404
+    rows = filter_rows(table, {
+        'User ID': request.args.get('user_id'),
+        'Dealer Name': request.args.get('dealer'),
+        'Job Role': request.args.get('job_role'),
+    })
+    # Rows leave the mapped file one batch at a time
+    records = (record for batch in rows.to_batches(max_chunksize=NDJSON_BATCH_ROWS) for record in batch.to_pylist())
+    return Response(iter_ndjson(records), mimetype=MIMETYPES['ndjson'],
+                    headers={'X-Total-Count': str(rows.num_rows)})
+
+@app.route('/datasets/<dataset_id>/report')
+def dataset_report(dataset_id):
+    """Regenerate the report workbook from the shared transcripts, re-aggregated for a job role"""
+    from arrow_store import TRANSCRIPTS, filter_rows, valid_dataset_id
+    
+    store = get_arrow_store()
+    if store is None:
+        return jsonify({'error': 'Arrow datasets are not enabled (they need pyarrow)'}), 404
+    if not valid_dataset_id(dataset_id):
+        return jsonify({'error': 'Invalid dataset id'}), 400
+    try:
+        transcripts = store.table(dataset_id, TRANSCRIPTS)
+        job_role = request.args.get('job_role') or store.metadata(dataset_id).get('job_role', 'All')
+    except FileNotFoundError:
+        return jsonify({'error': 'Dataset not found or expired'}), 404
+    try:
+        # Only the selected job roles' rows leave the mapped file
+        df = filter_rows(transcripts, {'Position': get_job_roles(job_role)}).to_pandas()
+        level_titles = identify_level_trainings(df)
+        completion_data = calculate_completion_percentages(df, level_titles)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return send_file(io.BytesIO(build_report_bytes(completion_data, level_titles)), as_attachment=True,
+                         download_name=f"Stellantis_Report_{timestamp}.xlsx",
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_streaming_flag(value):
+    """'1'/'true' forces streaming, '0'/'false' disables it, anything else is automatic"""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    return None
+
 @app.route('/download/<filename>')
 def download_file(filename):
     try:
         filepath = os.path.join('uploads', filename)
         if os.path.exists(filepath):
-            return send_file(filepath, as_attachment=True, download_name=filename)
+            from report_formats import mimetype_for
+            return send_file(filepath, as_attachment=True, download_name=filename,
+                             mimetype=mimetype_for(filename))
         else:
             return "File not found", 404
     except Exception as e:
         return f"Error: {str(e)}", 500
 
-def process_training_report(filepath, selected_job_role):
-    """Process the training report and return results"""
+_snapshot_store = None
+
+def get_snapshot_store():
+    """Open the snapshot database on first use"""
+    global _snapshot_store
+    if _snapshot_store is None:
+        from snapshot_store import SnapshotStore
+        _snapshot_store = SnapshotStore(SNAPSHOT_DB_PATH)
+    return _snapshot_store
+
+_arrow_store = None
+
+def get_arrow_store():
+    """Open the Arrow dataset directory on first use; None if disabled or pyarrow is missing"""
+    global _arrow_store
+    if _arrow_store is None and ARROW_DATASETS_ENABLED:
+        from arrow_store import ArrowStore, arrow_available
+        if arrow_available():
+            _arrow_store = ArrowStore(ARROW_DATASET_DIR, max_age_seconds=ARROW_DATASET_HOURS * 3600,
+                                      max_mapped=ARROW_MAPPED_TABLES)
+    return _arrow_store
+
+_result_cache = None
+
+def get_result_cache():
+    """Open the result cache directory on first use; None if disabled"""
+    global _result_cache
+    if _result_cache is None and RESULT_CACHE_ENABLED:
+        from result_cache import ResultCache
+        _result_cache = ResultCache(RESULT_CACHE_DIR, max_entries=RESULT_CACHE_ENTRIES)
+    return _result_cache
+
+def get_job_roles(selected_job_role):
+    """Positions included in the report for the selected job role filter"""
+    if selected_job_role != 'All' and selected_job_role in CONFIG['target_job_roles']:
+        return [selected_job_role]
+    return list(CONFIG['target_job_roles'])
+
+def use_streaming(filepath):
+    """Stream exports above STREAMING_THRESHOLD_MB instead of loading them whole"""
+    return os.path.getsize(filepath) >= STREAMING_THRESHOLD_MB * 1024 * 1024
+
+def load_clean_export(filepath):
+    """Load the export and drop the 8 rows of report information above the headers"""
+    from export_reader import read_export
+    
+    # The fastest reader backend available (XLSX_READER) parses the rows
+    return read_export(filepath)
+
+def new_date_index(columns):
+    """DateIndex over the export's assignment and completion date columns"""
+    from completion_windows import DateIndex, find_date_columns
+    
+    assigned_column, completed_column = find_date_columns(columns)
+    if assigned_column is None and completed_column is None:
+        raise ValueError("The export has no assignment or completion date column for as_of")
+    return DateIndex(assigned_column, completed_column)
+
+def export_date_index(paths):
+    """DateIndex for one or more exports, which must all have the same date columns
+
+    The merged rows are read with the first export's date columns, so an
+    export without them would count every row of its own as undated.
+    """
+    from completion_windows import find_date_columns
+    from export_reader import export_columns
+    
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    date_index = new_date_index(export_columns(paths[0]))
+    for number, path in enumerate(paths[1:], start=2):
+        if find_date_columns(export_columns(path)) != (date_index.assigned_column, date_index.completed_column):
+            raise ValueError(f"Export {number} of {len(paths)} does not have the same assignment and completion "
+                             f"date columns as the first, so as_of cannot be answered")
+    return date_index
+
+def check_date_columns(paths):
+    """Raise ValueError when the exports have no common date columns to answer as_of from"""
+    export_date_index(paths)
+
+def write_report_workbook(target, summary_df, completion_data, level_titles, trend_df=None, over_time_df=None,
+                          progress=None):
+    """Write the report sheets to a path or binary file object"""
     pd = get_pandas()
+    report = progress or (lambda stage, **data: None)
     
-    # Load the Excel file
-    df_original = pd.read_excel(filepath, header=None)
+    with pd.ExcelWriter(target, engine='openpyxl') as writer:
+        report('writing', percent=80, sheet='Stellantis_Training_Report')
+        summary_df.to_excel(writer, sheet_name='Stellantis_Training_Report', index=False)
+        
+        # Detailed completion summary
+        if completion_data:
+            report('writing', percent=85, sheet='Detailed_Completion_Summary')
+            detailed_df = pd.DataFrame(completion_data)
+            detailed_df = detailed_df.sort_values('Overall Completion %', ascending=False)
+            detailed_df.to_excel(writer, sheet_name='Detailed_Completion_Summary', index=False)
+        
+        # Training titles reference
+        report('writing', percent=90, sheet='Training_Titles_Reference')
+        titles_reference(level_titles).to_excel(writer, sheet_name='Training_Titles_Reference', index=False)
+        
+        # Completion over time from the stored snapshots
+        if trend_df is not None and len(trend_df) > 0:
+            report('writing', percent=95, sheet='Completion_Trend')
+            trend_df.to_excel(writer, sheet_name='Completion_Trend', index=False)
+        
+        # Completion as of the requested dates and windows
+        if over_time_df is not None:
+            report('writing', percent=97, sheet='Completion_Over_Time')
+            over_time_df.to_excel(writer, sheet_name='Completion_Over_Time', index=False)
+
+def build_report_bytes(completion_data, level_titles):
+    """Write one report for already aggregated rows, as .xlsx bytes"""
+    buffer = io.BytesIO()
+    write_report_workbook(buffer, create_stellantis_report(completion_data), completion_data, level_titles)
+    return buffer.getvalue()
+
+def bundle_members(df_clean, selected_job_role, group_by):
+    """Lazily build one (name, xlsx bytes) report per job role or dealer
+
+    The export is classified and aggregated once; each report only selects
+    its group's individuals.
+    """
+    from dealer_split import group_completion_rows
     
-    # Remove first 8 rows and set proper headers
-    df_clean = df_original.iloc[8:].reset_index(drop=True)
-    df_clean.columns = df_clean.iloc[0]
-    df_clean = df_clean.iloc[1:].reset_index(drop=True)
+    df_clean = df_clean[df_clean['Position'].isin(get_job_roles(selected_job_role))]
+    level_titles = identify_level_trainings(df_clean)
+    completion_data = calculate_completion_percentages(df_clean, level_titles)
+    for name, rows in group_completion_rows(completion_data, BUNDLE_GROUPS[group_by]).items():
+        yield f"Stellantis_Report_{name}.xlsx", build_report_bytes(rows, level_titles)
+
+def write_bundle(filepath, selected_job_role, group_by, zip_path):
+    """Write the report bundle for an export to zip_path, e.g. in a worker process"""
+    from report_bundle import iter_zip
     
-    # Filter to only show the 5 target job roles
-    df_clean = df_clean[df_clean['Position'].isin(CONFIG['target_job_roles'])]
+    members = bundle_members(load_clean_export(filepath), selected_job_role, group_by)
+    with open(zip_path, 'wb') as handle:
+        for chunk in iter_zip(members):
+            handle.write(chunk)
+    return zip_path
+
+def preview_report(filepath, selected_job_role):
+    """Approximate results from a user sample, in the shape of the full results"""
+    from preview_sample import preview_export
     
-    # Apply specific job role filter if selected
-    if selected_job_role != 'All' and selected_job_role in CONFIG['target_job_roles']:
-        df_clean = df_clean[df_clean['Position'] == selected_job_role]
+    preview = preview_export(
+        filepath,
+        level_patterns(CONFIG),
+        get_job_roles(selected_job_role),
+        sample_users=PREVIEW_SAMPLE_USERS,
+        time_budget=PREVIEW_TIME_BUDGET
+    )
+    breakdown = preview['job_role_breakdown']
+    result = {
+        'success': True,
+        'preview': True,
+        'levels': [{'label': label, 'name': level_name(label)} for label in preview['levels']],
+    }
+    for label, level in preview['levels'].items():
+        result[f'avg_{label}_completion'] = level['mean']
+        result[f'avg_{label}_completion_ci'] = [level['ci_low'], level['ci_high']]
+    result['job_role_breakdown'] = {role: counts['rows'] for role, counts in breakdown.items()}
+    result['job_role_breakdown_ci'] = {role: [counts['ci_low'], counts['ci_high']]
+                                       for role, counts in breakdown.items()}
+    result['sample'] = {key: preview[key] for key in
+                        ('complete', 'rows_scanned', 'total_rows', 'users_seen', 'users_sampled', 'elapsed_seconds')}
+    return result
+
+def run_background_report(job_id, filepath, selected_job_role, options):
+    """Run the full report after a preview; the result is sent with the 'done' event"""
+    progress = broker.reporter(job_id)
+    try:
+        result = process_training_report(filepath, selected_job_role, progress=progress, **options)
+        progress('done', percent=100, filename=result['filename'], result=result)
+    except Exception as e:
+        progress('error', error=str(e), background=True)
+    finally:
+        os.remove(filepath)
+
+def process_training_report(filepath, selected_job_role, streaming=None, source_name=None, snapshot_date=None,
+                            progress=None, output_format='xlsx', split_dealers=False, completion_points=None):
+    """Process the training report and return results
+
+    progress, if given, is called as progress(stage, percent=..., **details)
+    at each stage boundary (and once per chunk when streaming).
+    output_format 'parquet', 'csv' or 'ndjson' writes the report tables as
+    one file each instead of the Excel workbook. split_dealers also writes
+    one workbook per dealer, packaged as a zip.
+    filepath may be a list of overlapping exports; they are merged, keeping
+    one row per user and training with the best status, and streamed.
+    completion_points, a list of (window start, as-of date) pairs from
+    completion_windows.parse_points, adds the completion as of those dates
+    from the export's date columns.
+    """
+    from report_formats import check_output_format
+    
+    pd = get_pandas()
+    report = progress or (lambda stage, **data: None)
+    output_format = check_output_format(output_format)
+    
+    paths = list(filepath) if isinstance(filepath, (list, tuple)) else [filepath]
+    merge_stats = None
     
-    # Identify Level 1 and Level 2 training titles
-    level1_titles = identify_level1_trainings(df_clean)
-    level2_titles = identify_level2_trainings(df_clean)
+    # An identical earlier request already produced the result and its files
+    cache = get_result_cache()
+    if cache is not None:
+        from result_cache import cache_key, file_digest
+        cache_entry = cache_key(
+            file_digest(paths),
+            job_role=selected_job_role,
+            target_job_roles=CONFIG['target_job_roles'],
+            patterns=patterns_version(CONFIG),
+            output_format=output_format,
+            split_dealers=split_dealers,
+            # The day the snapshot is saved under, so a later day's upload runs again
+            # and adds its point to the trend history
+            snapshot_date=snapshot_date or datetime.now().date(),
+            completion_points=completion_points
+        )
+        cached = cache.get(cache_entry)
+        # Its shared dataset may have expired since
+        if cached is not None and cached.get('dataset_id'):
+            store = get_arrow_store()
+            if store is None or not store.exists(cached['dataset_id']):
+                cached = None
+        if cached is not None:
+            report('cached', percent=95)
+            return dict(cached, cached=True)
+    if len(paths) > 1:
+        streaming = True
+    elif streaming is None:
+        streaming = use_streaming(filepath)
     
-    # Calculate completion percentages
-    completion_data = calculate_completion_percentages(df_clean, level1_titles, level2_titles)
+    report('reading', percent=0, rows_read=0)
+    date_index = None
+    
+    # Transcripts of every target job role and the results are kept as a shared Arrow dataset
+    from export_reader import REPORT_COLUMNS
+    store = get_arrow_store()
+    dataset = store.writer() if store is not None else None
+    try:
+        if streaming:
+            from export_reader import export_row_count, iter_export_chunks
+            from streaming_aggregation import aggregate_chunks
+        
+            columns = REPORT_COLUMNS
+            if completion_points:
+                date_index = export_date_index(paths)
+                columns = REPORT_COLUMNS + [column for column in (date_index.assigned_column,
+                                                                  date_index.completed_column) if column]
+            if len(paths) > 1:
+                from export_merge import ExportMerge
+            
+                # First pass picks the surviving rows, the second feeds them to aggregation
+                chunks = ExportMerge(paths, chunksize=STREAMING_CHUNK_ROWS, columns=columns).plan()
+                merge_stats = chunks.stats()
+                report('merged', percent=35, **merge_stats)
+                total_rows = chunks.rows_kept
+            else:
+                chunks = iter_export_chunks(filepath, chunksize=STREAMING_CHUNK_ROWS, columns=columns)
+                total_rows = export_row_count(filepath) if progress else None
+            if date_index is not None:
+                # Record the dates of the rows as they go past
+                chunks = date_index.tap(chunks, get_job_roles(selected_job_role))
+            if dataset is not None:
+                from arrow_store import TRANSCRIPTS
+                chunks = dataset.tap(TRANSCRIPTS, chunks, CONFIG['target_job_roles'], REPORT_COLUMNS)
+        
+            def on_chunk(accumulator):
+                percent = min(70, 70 * accumulator.rows_read // total_rows) if total_rows else None
+                report('reading', percent=percent, rows_read=accumulator.rows_read, total_rows=total_rows)
+        
+            # Fold the export into per-user counters chunk by chunk
+            accumulator = aggregate_chunks(
+                chunks,
+                level_patterns(CONFIG),
+                get_job_roles(selected_job_role),
+                on_chunk=on_chunk if progress else None
+            )
+            level_titles = {label: accumulator.titles_for(label) for label in accumulator.labels}
+            report('classified', percent=72, **{f'{label}_titles': len(titles) for label, titles in level_titles.items()})
+            completion_data = accumulator.completion_data()
+            job_role_breakdown = accumulator.job_role_breakdown()
+        else:
+            df_clean = load_clean_export(filepath)
+            report('reading', percent=40, rows_read=len(df_clean), total_rows=len(df_clean))
+            if dataset is not None:
+                from arrow_store import TRANSCRIPTS
+                target_rows = df_clean['Position'].isin(CONFIG['target_job_roles'])
+                dataset.add(TRANSCRIPTS, df_clean.loc[target_rows, REPORT_COLUMNS], as_text=REPORT_COLUMNS)
+        
+            # Filter to the target job roles, or the specific job role if selected
+            df_clean = df_clean[df_clean['Position'].isin(get_job_roles(selected_job_role))]
+            if completion_points:
+                date_index = new_date_index(df_clean.columns)
+                date_index.add_chunk(df_clean)
+        
+            # Assign training titles to the configured levels
+            level_titles = identify_level_trainings(df_clean)
+            report('classified', percent=55, **{f'{label}_titles': len(titles) for label, titles in level_titles.items()})
+        
+            # Calculate completion percentages
+            completion_data = calculate_completion_percentages(df_clean, level_titles)
+            job_role_breakdown = df_clean['Position'].value_counts().to_dict()
+        report('aggregated', percent=75, users=len(completion_data))
+        dataset_id = None
+        if dataset is not None:
+            from arrow_store import RESULTS
+            dataset.add(RESULTS, pd.DataFrame(completion_data))
+            dataset_id = dataset.commit({
+                'job_role': selected_job_role,
+                'source_name': source_name or ', '.join(os.path.basename(path) for path in paths),
+            })
+    except Exception:
+        # Drop the half-written dataset instead of leaving its temporary directory behind
+        if dataset is not None:
+            dataset.abort()
+        raise
     
     # Create summary report
     summary_df = create_stellantis_report(completion_data)
     
+    # Completion as of the requested dates, in one sweep over the sorted dates
+    over_time_df = over_time = None
+    if date_index is not None:
+        from completion_windows import completion_over_time
+        over_time_df, over_time = completion_over_time(date_index, level_titles, completion_points)
+    
+    # Persist this run as a dated snapshot and fetch the completion trend
+    snapshot_id = None
+    trend_df = None
+    if SNAPSHOTS_ENABLED:
+        from snapshot_store import trend_table
+        store = get_snapshot_store()
+        snapshot_id = store.save_snapshot(
+            completion_data,
+            snapshot_date=snapshot_date,
+            source_name=source_name or ', '.join(os.path.basename(path) for path in paths),
+            job_role_filter=selected_job_role
+        )
+        job_roles = get_job_roles(selected_job_role)
+        trend_df = trend_table(store.trend(job_role=job_roles[0] if len(job_roles) == 1 else None))
+    
     # Generate output file
+    # The random suffix keeps reports generated in the same second apart
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_filename = f"Stellantis_Report_{timestamp}.xlsx"
+    output_filename = f"Stellantis_Report_{timestamp}_{uuid.uuid4().hex[:8]}.xlsx"
     output_path = os.path.join('uploads', output_filename)
     
     os.makedirs('uploads', exist_ok=True)
     
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        summary_df.to_excel(writer, sheet_name='Stellantis_Training_Report', index=False)
-        
-        # Detailed completion summary
-        if completion_data:
-            detailed_df = pd.DataFrame(completion_data)
-            detailed_df = detailed_df.sort_values('Overall Completion %', ascending=False)
-            detailed_df.to_excel(writer, sheet_name='Detailed_Completion_Summary', index=False)
-        
-        # Training titles reference
-        titles_df = pd.DataFrame({
-            'Level 1 Training Titles': level1_titles,
-            'Level 2 Training Titles': level2_titles + [''] * max(0, len(level1_titles) - len(level2_titles))
-        })
-        titles_df.to_excel(writer, sheet_name='Training_Titles_Reference', index=False)
-    
-    # Calculate summary statistics
-    if len(summary_df) > 0:
-        avg_level1 = summary_df['Level 1 Completion %'].mean()
-        avg_level2 = summary_df['Level 2 Completion %'].mean()
-        
-        # Calculate average assigned trainings
-        avg_assigned_level1 = summary_df['Total Level 1 Trainings'].mean()
-        avg_assigned_level2 = summary_df['Total Level 2 Trainings'].mean()
+    if output_format == 'xlsx':
+        write_report_workbook(output_path, summary_df, completion_data, level_titles,
+                              trend_df=trend_df, over_time_df=over_time_df, progress=progress)
+        files = [output_filename]
     else:
-        avg_level1 = avg_level2 = avg_assigned_level1 = avg_assigned_level2 = 0
+        # One file per table; no workbook is written
+        from report_formats import report_tables, write_report_tables
+        report('writing', percent=85, sheet=f'{output_format} tables')
+        tables = report_tables(summary_df, completion_data, 'Stellantis_Training_Report')
+        if over_time_df is not None:
+            tables['Completion_Over_Time'] = over_time_df
+        paths = write_report_tables(output_path, output_format, tables)
+        files = [os.path.basename(path) for path in paths.values()]
+        output_filename = files[0]
+    
+    # One workbook per dealer from the same aggregation, written in parallel
+    dealer_zip = None
+    if split_dealers:
+        from dealer_split import split_report
+        report('writing', percent=97, sheet='per-dealer workbooks')
+        dealer_zip = f"Stellantis_Reports_by_dealer_{timestamp}_{uuid.uuid4().hex[:8]}.zip"
+        split_report(completion_data, level_titles, os.path.join('uploads', dealer_zip),
+                     prefix='Stellantis_Report')
     
-    return {
+    result = {
         'success': True,
         'filename': output_filename,
+        'files': files,
+        'output_format': output_format,
         'total_individuals': len(summary_df),
-        'level1_titles_count': len(level1_titles),
-        'level2_titles_count': len(level2_titles),
-        'avg_level1_completion': round(avg_level1, 2),
-        'avg_level2_completion': round(avg_level2, 2),
-        'avg_assigned_level1': round(avg_assigned_level1, 1),
-        'avg_assigned_level2': round(avg_assigned_level2, 1),
-        'level1_titles': level1_titles[:10],  # First 10 for display
-        'level2_titles': level2_titles[:10],  # First 10 for display
-        'job_role_breakdown': df_clean['Position'].value_counts().to_dict()
+        'levels': [{'label': label, 'name': level_name(label)} for label in level_titles],
+        'job_role_breakdown': job_role_breakdown,
+        'snapshot_id': snapshot_id,
+        'dealer_zip': dealer_zip,
+        'merge': merge_stats,
+        'completion_over_time': over_time,
+        'dataset_id': dataset_id
     }
+    
+    # Summary statistics per level, e.g. avg_level1_completion and avg_assigned_level1
+    for label, titles in level_titles.items():
+        name = level_name(label)
+        if len(summary_df) > 0:
+            avg_completion = summary_df[f'{name} Completion %'].mean()
+            avg_assigned = summary_df[f'Total {name} Trainings'].mean()
+        else:
+            avg_completion = avg_assigned = 0
+        result[f'{label}_titles_count'] = len(titles)
+        result[f'avg_{label}_completion'] = round(avg_completion, 2)
+        result[f'avg_assigned_{label}'] = round(avg_assigned, 1)
+        result[f'{label}_titles'] = titles[:10]  # First 10 for display
+    
+    if cache is not None:
+        cached_files = [os.path.join('uploads', name) for name in files + ([dealer_zip] if dealer_zip else [])]
+        cache.put(cache_entry, result, cached_files)
+    return result
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
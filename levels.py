@@ -0,0 +1,84 @@
+"""
+Training levels defined by configuration.
+
+Every 'level<N>_patterns' list in the configuration defines a level: label
+'level<N>', shown as 'Level <N>'. Adding Level 3 only takes a
+'level3_patterns' list; classification, aggregation and the report columns
+follow from it. Titles are classified against all levels in one pass and get
+at most one level: the highest one with a matching pattern, so a Level 3
+title that mentions its Level 1 prerequisite counts as Level 3.
+"""
+import hashlib
+import json
+import re
+
+from title_matcher import get_title_matcher
+
+LEVEL_KEY = re.compile(r'^level(\d+)_patterns$')
+
+
+def level_patterns(config):
+    """Map each level label to its patterns, in level order"""
+    levels = sorted((int(match.group(1)), key) for key, match in
+                    ((key, LEVEL_KEY.match(key)) for key in config) if match)
+    return {f'level{number}': list(config[key]) for number, key in levels}
+
+
+def patterns_version(config):
+    """Short hash of the configured level patterns; any edit gives a new version"""
+    text = json.dumps(level_patterns(config), sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+def level_name(label):
+    """'level3' -> 'Level 3'; other labels are shown as they are"""
+    match = re.fullmatch(r'level(\d+)', label)
+    return f'Level {match.group(1)}' if match else label
+
+
+def level_matcher(patterns_by_level):
+    """TitleMatcher whose first_label is the highest matching level
+
+    Levels are given in ascending order, so they are matched in reverse.
+    """
+    return get_title_matcher(dict(reversed(list(patterns_by_level.items()))))
+
+
+def classify_titles(titles, patterns_by_level):
+    """Map each level label to its titles, keeping input order
+
+    Each title is checked once against the patterns of every level and is
+    assigned to the highest level that matches.
+    """
+    matcher = level_matcher(patterns_by_level)
+    results = {label: [] for label in patterns_by_level}
+    for title in titles:
+        label = matcher.first_label(title)
+        if label is not None:
+            results[label].append(title)
+    return results
+
+
+def level_columns(columns, counts=True):
+    """The per-level columns among a report's columns, in their order
+
+    With counts=False only the '<Level> Completion %' columns are kept.
+    """
+    selected = []
+    for column in columns:
+        if column.endswith(' Completion %') and column != 'Overall Completion %':
+            selected.append(column)
+        elif counts and column.endswith(' Trainings') and column.startswith(('Total ', 'Completed ')):
+            selected.append(column)
+    return selected
+
+
+def titles_reference(level_titles):
+    """One column of titles per level, padded to the longest"""
+    import pandas as pd
+
+    longest = max((len(titles) for titles in level_titles.values()), default=0)
+    return pd.DataFrame({
+        f'{level_name(label)} Training Titles': list(titles) + [''] * (longest - len(titles))
+        for label, titles in level_titles.items()
+    })
@@ -0,0 +1,188 @@
+"""
+Hash-sharded multi-process aggregation of transcript rows.
+
+Rows are encoded into a compact numeric table (user code, level flags,
+completed flag, brand rank), copied once into shared memory and partitioned by
+a hash of 'User ID', so every user lives in exactly one shard. Worker
+processes attach to the shared block, aggregate their contiguous shard with
+numpy and send back only per-user counters, which are merged in user order.
+Small inputs are aggregated in-process with the same code path.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from streaming_aggregation import (
+    COMPLETED_STATUSES, OTHER_BRAND, brand_name, brand_rank, build_user_row,
+)
+
+# Below this many rows the pool start-up costs more than it saves
+PARALLEL_MIN_ROWS = int(os.environ.get('PARALLEL_MIN_ROWS', '200000'))
+
+ROW_DTYPE = np.dtype([('user', '<i8'), ('row', '<i8'), ('flags', '<u2'), ('brand', 'i1')])
+
+# Bit 15 of 'flags' marks a completed transcript, bits 0-14 the levels
+COMPLETED_BIT = 1 << 15
+MAX_LEVELS = 15
+
+
+def default_workers():
+    """Worker count from AGGREGATION_WORKERS, defaulting to the CPU count"""
+    value = os.environ.get('AGGREGATION_WORKERS')
+    if value:
+        return max(1, int(value))
+    return os.cpu_count() or 1
+
+
+def encode_rows(df, level_titles):
+    """Encode transcript rows as ROW_DTYPE records
+
+    Returns (df, records): df without rows lacking a user key, and one record
+    per df row whose 'user' code follows the sorted (User ID, User Full Name)
+    group order of calculate_completion_percentages.
+    """
+    labels = list(level_titles)
+    if len(labels) > MAX_LEVELS:
+        raise ValueError(f"At most {MAX_LEVELS} levels are supported")
+
+    df = df.dropna(subset=['User ID', 'User Full Name'])
+    keys = ['User ID', 'User Full Name']
+    grouped = df.groupby(keys, sort=True)
+    user_codes = grouped.ngroup().to_numpy(dtype=np.int64)
+
+    titles = df['Training Title']
+    flags = np.zeros(len(df), dtype=np.uint16)
+    for bit, label in enumerate(labels):
+        flags |= titles.isin(level_titles[label]).to_numpy().astype(np.uint16) << bit
+    flags |= df['Transcript Status'].isin(COMPLETED_STATUSES).to_numpy().astype(np.uint16) * COMPLETED_BIT
+
+    unique_titles = titles.unique()
+    ranks = dict(zip(unique_titles, (brand_rank(t) for t in unique_titles)))
+
+    records = np.empty(len(df), dtype=ROW_DTYPE)
+    records['user'] = user_codes
+    records['row'] = np.arange(len(df), dtype=np.int64)
+    records['flags'] = flags
+    records['brand'] = titles.map(ranks).fillna(OTHER_BRAND).to_numpy(dtype=np.int8)
+    return df, records
+
+
+def aggregate_records(records, n_levels):
+    """Per-user counters for a block of records (rows in original order)"""
+    users, first, inverse = np.unique(records['user'], return_index=True, return_inverse=True)
+    size = len(users)
+    completed = (records['flags'] & COMPLETED_BIT) != 0
+    counts = np.zeros((size, n_levels, 2), dtype=np.int64)
+    for bit in range(n_levels):
+        is_level = (records['flags'] >> bit) & 1
+        counts[:, bit, 0] = np.bincount(inverse, weights=is_level, minlength=size)
+        counts[:, bit, 1] = np.bincount(inverse, weights=is_level * completed, minlength=size)
+    brands = np.full(size, OTHER_BRAND, dtype=np.int8)
+    np.minimum.at(brands, inverse, records['brand'])
+    return {
+        'users': users,
+        'first_row': records['row'][first],
+        'counts': counts,
+        'brands': brands,
+    }
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+def _aggregate_shard(shm_name, length, start, stop, n_levels):
+    """Worker entry point: aggregate records[start:stop] of the shared block"""
+    shm = _attach(shm_name)
+    try:
+        records = np.ndarray((length,), dtype=ROW_DTYPE, buffer=shm.buf)
+        result = aggregate_records(records[start:stop], n_levels)
+        del records
+    finally:
+        shm.close()
+    return result
+
+
+def shard_bounds(shard_ids, shards):
+    """Start/stop offsets of each shard once records are sorted by shard id"""
+    counts = np.bincount(shard_ids, minlength=shards)
+    stops = np.cumsum(counts)
+    return list(zip(stops - counts, stops))
+
+
+def aggregate_sharded(df, records, n_levels, workers):
+    """Aggregate records in a process pool, sharded by a hash of 'User ID'"""
+    user_hash = pd.util.hash_pandas_object(df['User ID'], index=False).to_numpy()
+    shard_ids = (user_hash % np.uint64(workers)).astype(np.int64)
+    # A stable sort keeps each shard's rows in their original order
+    order = np.argsort(shard_ids, kind='stable')
+    bounds = shard_bounds(shard_ids, workers)
+
+    shm = shared_memory.SharedMemory(create=True, size=records.nbytes)
+    try:
+        shared = np.ndarray(records.shape, dtype=ROW_DTYPE, buffer=shm.buf)
+        np.take(records, order, out=shared)
+        del shared
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_aggregate_shard, shm.name, len(records), start, stop, n_levels)
+                for start, stop in bounds if stop > start
+            ]
+            parts = [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+    return merge_results(parts)
+
+
+def calculate_completion_percentages_parallel(df, level_titles, workers=None, min_rows=None):
+    """Hash-sharded equivalent of calculate_completion_percentages
+
+    level_titles maps a level label ('level1', 'level2', ...) to its titles.
+    Inputs smaller than min_rows, or a single worker, are aggregated in this
+    process.
+    """
+    labels = list(level_titles)
+    workers = default_workers() if workers is None else max(1, workers)
+    min_rows = PARALLEL_MIN_ROWS if min_rows is None else min_rows
+
+    df, records = encode_rows(df, level_titles)
+    if len(records) == 0:
+        return []
+
+    if workers == 1 or len(records) < min_rows:
+        merged = aggregate_records(records, len(labels))
+    else:
+        merged = aggregate_sharded(df, records, len(labels), workers)
+
+    return build_completion_rows(df, merged, labels)
+
+
+def merge_results(parts):
+    """Combine shard results in user-code order, independent of shard order"""
+    users = np.concatenate([part['users'] for part in parts])
+    order = np.argsort(users, kind='stable')
+    return {
+        key: np.concatenate([part[key] for part in parts])[order]
+        for key in ('users', 'first_row', 'counts', 'brands')
+    }
+
+
+def build_completion_rows(df, merged, labels):
+    """Turn merged per-user counters into completion_data rows"""
+    first_rows = df.iloc[merged['first_row']]
+    rows = []
+    for (user_id, user_name, position, division), counts, rank in zip(
+        first_rows[['User ID', 'User Full Name', 'Position', 'Division']].itertuples(index=False),
+        merged['counts'].tolist(),
+        merged['brands'].tolist(),
+    ):
+        rows.append(build_user_row(user_id, user_name, position, division,
+                                   brand_name(rank), counts, labels))
+    return rows
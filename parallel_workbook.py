@@ -0,0 +1,209 @@
+"""
+Multi-sheet .xlsx workbooks written with one worker process per sheet.
+
+An .xlsx file is a zip package of XML parts, and each worksheet is its own
+part. Every large sheet is serialized to worksheet XML and deflated in a
+worker process. The main process then writes the compressed parts, the
+small workbook, style and relationship parts into one zip package. Cells are
+written the way pandas' to_excel writes them: a bold, bordered header row,
+numbers, booleans, dates and text (as inline strings, so no shared string
+table has to be collected across workers).
+
+Sheets below PARALLEL_MIN_CELLS cells are written in this process, as is
+everything when only one worker is available.
+"""
+import datetime
+import math
+import os
+import re
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+
+from parallel_aggregation import default_workers
+
+# Sheets with fewer cells are not worth a trip to a worker process
+PARALLEL_MIN_CELLS = int(os.environ.get('WORKBOOK_PARALLEL_MIN_CELLS', '200000'))
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+SHEET_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+
+# Cell styles (indexes into cellXfs below)
+HEADER_STYLE = 1
+DATETIME_STYLE = 2
+DATE_STYLE = 3
+
+STYLES_XML = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="{MAIN_NS}">
+<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy\\-mm\\-dd\\ hh:mm:ss"/><numFmt numFmtId="165" formatCode="yyyy\\-mm\\-dd"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font><font><b/><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border><border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf><xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/><xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+# Characters XML 1.0 does not allow; openpyxl refuses them, here they are dropped
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+# Zip compression method number of deflate
+DEFLATE_METHOD = 8
+
+
+def column_letter(index):
+    """0 -> 'A', 25 -> 'Z', 26 -> 'AA'"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _text_cell(ref, text, style=0):
+    text = ILLEGAL_XML_CHARS.sub('', text)
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    style = f' s="{style}"' if style else ''
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def _cell(ref, value):
+    """XML of one cell, or '' for an empty one"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return ''
+        return f'<c r="{ref}"><v>{value!r}</v></c>'
+    if isinstance(value, datetime.datetime):
+        if value != value:  # NaT
+            return ''
+        serial = (value.replace(tzinfo=None) - EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c r="{ref}" s="{DATETIME_STYLE}"><v>{serial!r}</v></c>'
+    if isinstance(value, datetime.date):
+        serial = (value - EXCEL_EPOCH.date()).days
+        return f'<c r="{ref}" s="{DATE_STYLE}"><v>{serial}</v></c>'
+    return _text_cell(ref, str(value))
+
+
+def sheet_xml(df):
+    """Worksheet XML of a DataFrame with its column names as the header row"""
+    letters = [column_letter(i) for i in range(len(df.columns))]
+    parts = [f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{MAIN_NS}"><sheetData>']
+    header = ''.join(_text_cell(f'{letter}1', str(name), HEADER_STYLE) for letter, name in zip(letters, df.columns))
+    parts.append(f'<row r="1">{header}</row>')
+    # Python scalars (not numpy ones) from each column, missing values as None
+    columns = [df.iloc[:, i].astype(object).where(df.iloc[:, i].notna(), None).tolist()
+               for i in range(len(df.columns))]
+    for number, row in enumerate(zip(*columns), 2):
+        cells = ''.join(_cell(f'{letter}{number}', value) for letter, value in zip(letters, row))
+        parts.append(f'<row r="{number}">{cells}</row>')
+    parts.append('</sheetData></worksheet>')
+    return ''.join(parts).encode('utf-8')
+
+
+def compressed_part(data):
+    """(raw deflate data, CRC-32, uncompressed size) of a package part"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data)
+
+
+def _sheet_part(df):
+    """Worker entry point: one sheet's compressed worksheet part"""
+    return compressed_part(sheet_xml(df))
+
+
+def _package_parts(sheet_names):
+    """The parts other than the worksheets, as (name, xml) pairs"""
+    sheets = ''.join(f'<sheet name={quoteattr(name)} sheetId="{i}" r:id="rId{i}"/>'
+                     for i, name in enumerate(sheet_names, 1))
+    sheet_rels = ''.join(
+        f'<Relationship Id="rId{i}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(sheet_names) + 1)
+    )
+    overrides = ''.join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="{SHEET_TYPE}"/>'
+                        for i in range(1, len(sheet_names) + 1))
+    declaration = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    return [
+        ('[Content_Types].xml', declaration
+         + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+         '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+         '<Default Extension="xml" ContentType="application/xml"/>'
+         '<Override PartName="/xl/workbook.xml" '
+         'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+         '<Override PartName="/xl/styles.xml" '
+         'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+         f'{overrides}</Types>'),
+        ('_rels/.rels', declaration + f'<Relationships xmlns="{PACKAGE_REL_NS}">'
+         f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>'),
+        ('xl/workbook.xml', declaration + f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><sheets>{sheets}'
+         '</sheets></workbook>'),
+        ('xl/_rels/workbook.xml.rels', declaration + f'<Relationships xmlns="{PACKAGE_REL_NS}">{sheet_rels}'
+         f'<Relationship Id="rId{len(sheet_names) + 1}" Type="{REL_NS}/styles" Target="styles.xml"/>'
+         '</Relationships>'),
+        ('xl/styles.xml', STYLES_XML),
+    ]
+
+
+def write_zip(handle, parts):
+    """Write a zip archive of already deflated (name, (data, crc, size)) parts to a binary file"""
+    now = time.localtime()
+    dos_time = (now.tm_hour << 11) | (now.tm_min << 5) | (now.tm_sec // 2)
+    dos_date = ((now.tm_year - 1980) << 9) | (now.tm_mon << 5) | now.tm_mday
+    offset = 0
+    central = []
+    for name, (data, crc, size) in parts:
+        if len(data) > 0xFFFFFFFF or size > 0xFFFFFFFF or offset > 0xFFFFFFFF:
+            raise ValueError(f"{name} is too large for a workbook part")
+        encoded = name.encode('utf-8')
+        fields = (20, 0, DEFLATE_METHOD, dos_time, dos_date, crc, len(data), size, len(encoded))
+        handle.write(struct.pack('<IHHHHHIIIHH', 0x04034B50, *fields, 0) + encoded)
+        handle.write(data)
+        central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014B50, 20, *fields, 0, 0, 0, 0, 0, offset)
+                       + encoded)
+        offset += 30 + len(encoded) + len(data)
+    directory = b''.join(central)
+    handle.write(directory)
+    handle.write(struct.pack('<IHHHHIIH', 0x06054B50, 0, 0, len(central), len(central), len(directory),
+                             offset, 0))
+
+
+def write_workbook(target, sheets, workers=None, min_cells=None):
+    """Write DataFrames by sheet name as one .xlsx workbook to a path or binary file object"""
+    names = list(sheets)
+    workers = default_workers() if workers is None else max(1, workers)
+    min_cells = PARALLEL_MIN_CELLS if min_cells is None else min_cells
+    large = [name for name in names if sheets[name].size >= min_cells]
+
+    parts = {}
+    if workers > 1 and len(large) > 1:
+        # Largest sheets first, so the longest job starts straight away
+        large.sort(key=lambda name: -sheets[name].size)
+        with ProcessPoolExecutor(max_workers=min(workers, len(large))) as pool:
+            futures = {name: pool.submit(_sheet_part, sheets[name]) for name in large}
+            for name in names:
+                if name not in futures:
+                    parts[name] = _sheet_part(sheets[name])
+            for name, future in futures.items():
+                parts[name] = future.result()
+    else:
+        for name in names:
+            parts[name] = _sheet_part(sheets[name])
+
+    package = [(name, compressed_part(xml.encode('utf-8'))) for name, xml in _package_parts(names)]
+    package += [(f'xl/worksheets/sheet{i}.xml', parts[name]) for i, name in enumerate(names, 1)]
+    if hasattr(target, 'write'):
+        write_zip(target, package)
+    else:
+        with open(target, 'wb') as handle:
+            write_zip(handle, package)
+    return target
@@ -0,0 +1,172 @@
+"""
+Coverage and cost profile of the training title patterns.
+
+Every title is classified the way TitleMatcher does it (literal prefilter,
+then the candidate patterns), except that every candidate is evaluated and
+timed instead of stopping at a label's first match. Per pattern the profile
+reports how many titles it matched first in its list (the matches that
+decide classification), how many it matched in total, how often it ran and
+how long it took. Titles matched by more than one level (they count towards
+the highest of them) and unmatched titles that look like level trainings are
+listed too, so dead, redundant and expensive patterns can be pruned.
+
+    python pattern_profiler.py export.xlsx -o pattern_profile.xlsx --json pattern_profile.json
+"""
+import argparse
+import json
+import re
+import sys
+import time
+
+from levels import level_patterns
+from title_matcher import TitleMatcher
+
+# Unmatched titles containing any of these look like level trainings
+SUSPECT_TITLE = re.compile(r'LEVEL|\bL\s?\d\b|X0\d[A-Z]{2}|INDUCTION|FOUNDATION|ADVANCED|CURRICULUM')
+
+PROFILE_SHEET = 'Pattern_Profile'
+MULTI_LEVEL_SHEET = 'Multi_Level_Titles'
+UNMATCHED_SHEET = 'Suspect_Unmatched_Titles'
+
+
+def profile_titles(pattern_sets, titles):
+    """Profile the patterns of each label against the distinct titles
+
+    Returns a JSON-serializable dict with a 'patterns' list (one entry per
+    pattern, in configuration order), 'multi_level_titles',
+    'suspect_unmatched_titles' and the totals.
+    """
+    matcher = TitleMatcher(pattern_sets)
+    stats = [{
+        'label': compiled.label,
+        'index': compiled.index,
+        'pattern': compiled.pattern,
+        'linear': compiled.linear,
+        'first_matches': 0,
+        'total_matches': 0,
+        'evaluations': 0,
+        'seconds': 0.0,
+    } for compiled in matcher.patterns]
+    position = {id(compiled): i for i, compiled in enumerate(matcher.patterns)}
+
+    titles = [title for title in dict.fromkeys(titles) if title is not None]
+    multi_level, suspect = [], []
+    matched_titles = 0
+    scan_seconds = 0.0
+    for title in titles:
+        text = str(title).upper()
+        started = time.perf_counter()
+        candidates = matcher.candidates(text)
+        scan_seconds += time.perf_counter() - started
+
+        labels = []
+        for compiled in candidates:
+            entry = stats[position[id(compiled)]]
+            started = time.perf_counter()
+            hit = compiled.search(text)
+            entry['seconds'] += time.perf_counter() - started
+            entry['evaluations'] += 1
+            if hit:
+                entry['total_matches'] += 1
+                if compiled.label not in labels:
+                    entry['first_matches'] += 1
+                    labels.append(compiled.label)
+
+        if labels:
+            matched_titles += 1
+            if len(labels) > 1:
+                multi_level.append({'title': title, 'labels': [l for l in matcher.labels if l in labels]})
+        elif SUSPECT_TITLE.search(text):
+            suspect.append(title)
+
+    for entry in stats:
+        entry['seconds'] = round(entry['seconds'], 6)
+        if entry['total_matches'] == 0:
+            entry['verdict'] = 'dead'
+        elif entry['first_matches'] == 0:
+            entry['verdict'] = 'redundant'  # only matches titles an earlier pattern already matched
+        else:
+            entry['verdict'] = ''
+
+    return {
+        'titles': len(titles),
+        'matched_titles': matched_titles,
+        'scan_seconds': round(scan_seconds, 6),
+        'patterns': stats,
+        'multi_level_titles': multi_level,
+        'suspect_unmatched_titles': suspect,
+    }
+
+
+def export_titles(filepath, job_roles=None):
+    """Distinct training titles of an export, optionally only for the given positions"""
+    from export_reader import iter_export_rows
+
+    job_roles = set(job_roles) if job_roles else None
+    titles = {}
+    for title, position in iter_export_rows(filepath, ['Training Title', 'Position']):
+        if job_roles is None or position in job_roles:
+            titles[title] = None
+    return list(titles)
+
+
+def profile_tables(profile):
+    """The profile as DataFrames by sheet name"""
+    import pandas as pd
+
+    patterns = pd.DataFrame(profile['patterns']).rename(columns={
+        'label': 'Label', 'index': 'Position in List', 'pattern': 'Pattern', 'linear': 'Linear Time',
+        'first_matches': 'First Matches', 'total_matches': 'Total Matches', 'evaluations': 'Evaluations',
+        'seconds': 'Match Time (s)', 'verdict': 'Verdict',
+    })
+    multi_level = pd.DataFrame(
+        [(entry['title'], ', '.join(entry['labels'])) for entry in profile['multi_level_titles']],
+        columns=['Training Title', 'Levels']
+    )
+    unmatched = pd.DataFrame({'Training Title': profile['suspect_unmatched_titles']})
+    return {PROFILE_SHEET: patterns, MULTI_LEVEL_SHEET: multi_level, UNMATCHED_SHEET: unmatched}
+
+
+def write_profile_workbook(profile, output_path):
+    import pandas as pd
+
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        for sheet_name, df in profile_tables(profile).items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return output_path
+
+
+def write_profile_json(profile, output_path):
+    with open(output_path, 'w', encoding='utf-8') as handle:
+        json.dump(profile, handle, indent=2, ensure_ascii=False, default=str)
+    return output_path
+
+
+def main(argv=None):
+    from flask_app import CONFIG
+
+    parser = argparse.ArgumentParser(description="Profile the training level title patterns against an export")
+    parser.add_argument('input', help="Enterprise Training Report export (.xlsx or .csv)")
+    parser.add_argument('-o', '--output', default='pattern_profile.xlsx', help="Profile workbook")
+    parser.add_argument('--json', help="Also write the profile as JSON")
+    parser.add_argument('--all-roles', action='store_true',
+                        help="Use the titles of every position, not only the target job roles")
+    args = parser.parse_args(argv)
+
+    titles = export_titles(args.input, None if args.all_roles else CONFIG['target_job_roles'])
+    profile = profile_titles(level_patterns(CONFIG), titles)
+    write_profile_workbook(profile, args.output)
+    print(args.output)
+    if args.json:
+        print(write_profile_json(profile, args.json))
+
+    dead = sum(entry['verdict'] == 'dead' for entry in profile['patterns'])
+    redundant = sum(entry['verdict'] == 'redundant' for entry in profile['patterns'])
+    print(f"{profile['titles']} titles, {profile['matched_titles']} matched; {dead} dead and "
+          f"{redundant} redundant patterns; {len(profile['multi_level_titles'])} titles in several levels, "
+          f"{len(profile['suspect_unmatched_titles'])} suspect unmatched titles", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Quick approximate report from a sample of the export's users.
+
+The export is scanned row by row for a short time budget. Position counts
+are kept for every scanned row, and a bottom-k sample of users is kept by a
+hash of 'User ID': a user is in the sample when its hash is among the k
+smallest seen so far, and all of its rows are kept with it. Hashing users
+rather than sampling rows keeps each sampled user's completion exact, so the
+sample mean of per-user completion is an unbiased estimate of the report's
+average, with a normal-approximation confidence interval.
+
+When the time budget runs out first, the sample only covers the scanned
+prefix of the export. Exports are often sorted (by dealer, role or user), so
+the prefix need not resemble the rest: the estimates are then given without
+confidence intervals, which would only cover the sampling error.
+"""
+import hashlib
+import heapq
+import math
+import os
+import time
+
+from export_reader import REPORT_COLUMNS, export_row_count, iter_export_rows
+from levels import level_name
+from streaming_aggregation import CompletionAccumulator
+
+# z-score of a two-sided 95% confidence interval
+Z_95 = 1.959964
+
+# The time budget is checked once per this many rows
+CHECK_EVERY = 500
+
+
+def user_hash(user_id):
+    """Stable 64-bit hash of a User ID, the same in every process"""
+    digest = hashlib.blake2b(str(user_id).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class UserSample:
+    """Bottom-k sample of users by hash, holding every row of the sampled users"""
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []  # (-hash, user id) of the sampled users; largest hash on top
+        self.rows = {}  # user id -> rows
+        self.hashes = {}  # user id -> hash, for every user seen
+
+    def add(self, user_id, row):
+        h = self.hashes.get(user_id)
+        if h is None:
+            h = self.hashes[user_id] = user_hash(user_id)
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, (-h, user_id))
+                self.rows[user_id] = []
+            elif h < -self._heap[0][0]:
+                _, evicted = heapq.heapreplace(self._heap, (-h, user_id))
+                del self.rows[evicted]
+                self.rows[user_id] = []
+        rows = self.rows.get(user_id)
+        if rows is not None:
+            rows.append(row)
+
+    @property
+    def users_seen(self):
+        return len(self.hashes)
+
+    def sampled_rows(self):
+        for rows in self.rows.values():
+            yield from rows
+
+
+def mean_interval(values, population=None, z=Z_95):
+    """Mean of a sample with a confidence interval, clamped to 0-100
+
+    When the population size is known a finite population correction is
+    applied, so a sample of every user has a zero-width interval.
+    """
+    n = len(values)
+    if n == 0:
+        return None, None, None
+    mean = sum(values) / n
+    if n < 2:
+        return round(mean, 2), None, None
+    variance = sum((value - mean) ** 2 for value in values) / (n - 1)
+    half_width = z * math.sqrt(variance / n)
+    if population is not None and population > 1:
+        half_width *= math.sqrt(max(0, population - n) / (population - 1))
+    return round(mean, 2), round(max(0.0, mean - half_width), 2), round(min(100.0, mean + half_width), 2)
+
+
+def preview_export(filepath, level_patterns, job_roles, sample_users=2000, time_budget=0.5):
+    """Approximate report statistics from a user sample, within about time_budget seconds
+
+    The result says whether the whole export was scanned ('complete'). If
+    not, the sample only covers the scanned prefix of the export, role
+    counts are scaled up to the export's declared row count, when known, and
+    the confidence intervals are None.
+    """
+    import pandas as pd
+
+    started = time.perf_counter()
+    job_roles = set(job_roles)
+    sample = UserSample(sample_users)
+    position_counts = {}
+    rows_scanned = 0
+    complete = True
+    user_index = REPORT_COLUMNS.index('User ID')
+    position_index = REPORT_COLUMNS.index('Position')
+
+    # calamine parses the whole sheet before its first row; the XML reader streams, so the scan stops on time
+    # (only .xls needs calamine)
+    reader = None if os.path.splitext(filepath)[1].lower() == '.xls' else 'xml'
+    for row in iter_export_rows(filepath, REPORT_COLUMNS, reader=reader):
+        if rows_scanned % CHECK_EVERY == 0 and rows_scanned and time.perf_counter() - started > time_budget:
+            complete = False
+            break
+        rows_scanned += 1
+        position = row[position_index]
+        if position in job_roles:
+            position_counts[position] = position_counts.get(position, 0) + 1
+            if row[user_index] is not None:
+                sample.add(row[user_index], row)
+
+    accumulator = CompletionAccumulator(level_patterns, job_roles)
+    accumulator.add_chunk(pd.DataFrame(list(sample.sampled_rows()), columns=REPORT_COLUMNS))
+    completion_data = accumulator.completion_data()
+
+    population = sample.users_seen if complete else None
+    total_rows = rows_scanned if complete else export_row_count(filepath)
+    scale = total_rows / rows_scanned if total_rows and rows_scanned else 1.0
+
+    levels = {}
+    for label in accumulator.labels:
+        name = level_name(label)
+        mean, low, high = mean_interval([row[f'{name} Completion %'] for row in completion_data], population)
+        if not complete:
+            low = high = None
+        levels[label] = {'mean': mean, 'ci_low': low, 'ci_high': high}
+
+    breakdown = {}
+    for position, count in sorted(position_counts.items(), key=lambda item: -item[1]):
+        if complete:
+            breakdown[position] = {'rows': count, 'ci_low': count, 'ci_high': count}
+        else:
+            breakdown[position] = {'rows': round(count * scale), 'ci_low': None, 'ci_high': None}
+
+    return {
+        'complete': complete,
+        'rows_scanned': rows_scanned,
+        'total_rows': total_rows,
+        'users_seen': sample.users_seen,
+        'users_sampled': len(completion_data),
+        'levels': levels,
+        'job_role_breakdown': breakdown,
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+    }
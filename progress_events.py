@@ -0,0 +1,187 @@
+"""
+Progress events for report jobs, served as Server-Sent Events.
+
+process_training_report reports progress through a plain callback. The
+broker appends each event as one JSON line to the job's file under
+PROGRESS_DIR, so every process can publish and follow any job: all gunicorn
+workers, the ASGI app and its worker processes. Any number of listeners can
+follow a job, and a listener that connects late first replays the events it
+missed (an event's id is its line number). Listeners poll the file, with a
+blocking wait for WSGI threads (listen) or an asyncio one (alisten). Job
+files are removed some time after they finish or go quiet.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+
+# Client-chosen job ids are restricted to a safe alphabet and length
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+FINAL_STAGES = ('done', 'error')
+
+# Directory of the job files shared by every process
+PROGRESS_DIR = os.environ.get('PROGRESS_DIR', os.path.join('data', 'progress'))
+
+# Seconds between two looks at a job file by a listener
+POLL_SECONDS = float(os.environ.get('PROGRESS_POLL_SECONDS', '0.25'))
+
+
+def valid_job_id(job_id):
+    return bool(job_id) and JOB_ID_PATTERN.match(job_id) is not None
+
+
+class JobReporter:
+    """Progress callback bound to one job; picklable, so it can be passed to worker processes"""
+
+    def __init__(self, broker, job_id):
+        self.broker = broker
+        self.job_id = job_id
+
+    def __call__(self, stage, **data):
+        self.broker.publish(self.job_id, stage, **data)
+
+
+class _Cursor:
+    """Read position of one listener in a job file"""
+
+    def __init__(self, path, last_event_id=None):
+        self.path = path
+        self.offset = 0
+        self.skip = 0 if last_event_id is None else last_event_id + 1
+        self.next_id = 0
+        self.finished = False
+
+    def poll(self):
+        """Events appended since the last poll; only complete lines are consumed"""
+        try:
+            with open(self.path, 'rb') as handle:
+                handle.seek(self.offset)
+                data = handle.read()
+        except FileNotFoundError:
+            return []
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        events = []
+        for line in data[:end].splitlines():
+            event = dict(json.loads(line), id=self.next_id)
+            self.next_id += 1
+            if event['id'] >= self.skip:
+                events.append(event)
+            if event['stage'] in FINAL_STAGES:
+                self.finished = True
+                break
+        return events
+
+
+class ProgressBroker:
+    """Keep per-job progress events in files and follow them for SSE listeners"""
+
+    def __init__(self, directory=PROGRESS_DIR, retention_seconds=600, idle_seconds=3600, heartbeat_seconds=15,
+                 poll_seconds=POLL_SECONDS):
+        self.directory = directory
+        self.retention_seconds = retention_seconds
+        self.idle_seconds = idle_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+
+    def _path(self, job_id):
+        if not valid_job_id(job_id):
+            raise ValueError("Invalid job id")
+        return os.path.join(self.directory, f'{job_id}.ndjson')
+
+    def _expire(self):
+        # Finished jobs are kept for retention_seconds, silent ones for idle_seconds
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                age = now - os.path.getmtime(path)
+                if age <= self.retention_seconds:
+                    continue
+                if age <= self.idle_seconds:
+                    with open(path, 'rb') as handle:
+                        handle.seek(max(0, os.path.getsize(path) - 4096))
+                        last = handle.read().rstrip(b'\n').rsplit(b'\n', 1)[-1]
+                    if json.loads(last)['stage'] not in FINAL_STAGES:
+                        continue
+                os.remove(path)
+            except (OSError, ValueError, KeyError):
+                continue
+
+    def publish(self, job_id, stage, **data):
+        """Append an event to a job's file"""
+        path = self._path(job_id)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            self._expire()
+        line = json.dumps(dict(data, stage=stage), default=str) + '\n'
+        # One append-mode write per event, so events from several processes never interleave
+        with open(path, 'a', encoding='utf-8') as handle:
+            handle.write(line)
+
+    def reporter(self, job_id):
+        """Progress callback bound to one job, as passed to process_training_report"""
+        return JobReporter(self, job_id)
+
+    def events(self, job_id, after=None):
+        """A job's events recorded so far after the event id after, without waiting"""
+        return _Cursor(self._path(job_id), after).poll()
+
+    def listen(self, job_id, last_event_id=None):
+        """Yield a job's events as they arrive, ending after 'done' or 'error'
+
+        None is yielded when nothing happened for heartbeat_seconds, so the
+        caller can send a keep-alive and notice disconnected clients.
+        """
+        cursor = _Cursor(self._path(job_id), last_event_id)
+        quiet_since = time.monotonic()
+        while not cursor.finished:
+            events = cursor.poll()
+            yield from events
+            if events:
+                quiet_since = time.monotonic()
+            elif time.monotonic() - quiet_since >= self.heartbeat_seconds:
+                quiet_since = time.monotonic()
+                yield None
+            if not cursor.finished:
+                time.sleep(self.poll_seconds)
+
+    async def alisten(self, job_id, last_event_id=None):
+        """listen for the event loop: waiting holds a coroutine, not a thread"""
+        cursor = _Cursor(self._path(job_id), last_event_id)
+        loop = asyncio.get_running_loop()
+        quiet_since = loop.time()
+        while not cursor.finished:
+            events = cursor.poll()
+            for event in events:
+                yield event
+            if events:
+                quiet_since = loop.time()
+            elif loop.time() - quiet_since >= self.heartbeat_seconds:
+                quiet_since = loop.time()
+                yield None
+            if not cursor.finished:
+                await asyncio.sleep(self.poll_seconds)
+
+    @staticmethod
+    def _sse(event):
+        if event is None:
+            return ': keep-alive\n\n'
+        return f"id: {event['id']}\nevent: progress\ndata: {json.dumps(event, default=str)}\n\n"
+
+    def stream(self, job_id, last_event_id=None):
+        """Server-Sent Events text for a job, one chunk per event"""
+        yield 'retry: 2000\n\n'
+        for event in self.listen(job_id, last_event_id):
+            yield self._sse(event)
+
+    async def astream(self, job_id, last_event_id=None):
+        """stream for the event loop"""
+        yield 'retry: 2000\n\n'
+        async for event in self.alisten(job_id, last_event_id):
+            yield self._sse(event)
+
+
+broker = ProgressBroker()
@@ -0,0 +1,233 @@
+"""
+Resumable batch report generation over many exports.
+
+    python report_batch.py exports/ -o reports/ --state-dir .batch_state
+    python report_batch.py north.xlsx south.xlsx -o reports/ -f csv -r SER-12-Technician
+
+Every export gets its own report, named after the export and a key made from
+the export's path, size and modification time, the job role, the output
+format and the pattern version. Re-running a batch therefore writes the same
+file names, and reports are written under a temporary name and renamed into
+place, so a killed run never leaves a half-written report behind.
+
+The state directory records each finished export; a restarted batch skips
+them. While an export is aggregated, the running counters are saved every
+few chunks, so an interrupted export resumes after the last saved chunk
+instead of from the first row.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+from export_reader import REPORT_COLUMNS, iter_export_chunks
+from levels import level_patterns, patterns_version
+from report_formats import OUTPUT_FORMATS, check_output_format
+
+EXPORT_EXTENSIONS = ('.xlsx', '.csv')
+
+# Rows per chunk, and chunks between two checkpoints of the running counters
+CHUNK_ROWS = 50000
+CHECKPOINT_CHUNKS = 4
+
+
+def find_exports(inputs):
+    """Export files among the given files and directories, sorted within each directory"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for extension in EXPORT_EXTENSIONS:
+                paths.extend(sorted(glob.glob(os.path.join(item, f'*{extension}'))))
+        else:
+            paths.append(item)
+    # Keep the first occurrence of every file
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def input_key(path, job_role, output_format, version, chunksize):
+    """Identity of one export's report; changes whenever the export or the options do"""
+    stat = os.stat(path)
+    text = json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns, job_role, output_format,
+                       version, chunksize])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def output_path(out_dir, path, key, output_format):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(out_dir, f'{stem}_STELLANTIS_Report_{key}.{output_format}')
+
+
+def _write_json(path, data):
+    temp = f'{path}.tmp'
+    with open(temp, 'w', encoding='utf-8') as handle:
+        json.dump(data, handle, indent=2, default=str)
+    os.replace(temp, path)
+
+
+class BatchState:
+    """Finished exports and partial aggregates in a state directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, f'{key}.{suffix}')
+
+    def finished(self, key):
+        """The record of a finished export whose outputs all still exist, or None"""
+        try:
+            with open(self._path(key, 'done.json'), encoding='utf-8') as handle:
+                record = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return record if all(os.path.exists(path) for path in record['output_files']) else None
+
+    def mark_finished(self, key, record):
+        _write_json(self._path(key, 'done.json'), record)
+        self.discard_checkpoint(key)
+
+    def load_checkpoint(self, key):
+        """(chunks done, accumulator) saved for an interrupted export, or None"""
+        try:
+            with open(self._path(key, 'partial.pickle'), 'rb') as handle:
+                return pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def save_checkpoint(self, key, chunks_done, accumulator):
+        path = self._path(key, 'partial.pickle')
+        with open(f'{path}.tmp', 'wb') as handle:
+            pickle.dump((chunks_done, accumulator), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{path}.tmp', path)
+
+    def discard_checkpoint(self, key):
+        try:
+            os.remove(self._path(key, 'partial.pickle'))
+        except FileNotFoundError:
+            pass
+
+
+def aggregate_with_checkpoints(path, key, state, patterns, job_roles, chunksize=CHUNK_ROWS,
+                               checkpoint_chunks=CHECKPOINT_CHUNKS, log=None):
+    """Aggregate an export, resuming from and saving checkpoints of the running counters"""
+    from streaming_aggregation import CompletionAccumulator
+
+    log = log or (lambda message: None)
+    checkpoint = state.load_checkpoint(key)
+    if checkpoint is not None:
+        chunks_done, accumulator = checkpoint
+        log(f"Resuming after {accumulator.rows_read} rows")
+    else:
+        chunks_done, accumulator = 0, CompletionAccumulator(patterns, job_roles)
+
+    # Rows already in the restored counters are skipped before they become DataFrames
+    chunks = iter_export_chunks(path, chunksize=chunksize, columns=REPORT_COLUMNS, skip_rows=chunks_done * chunksize)
+    for index, chunk in enumerate(chunks, chunks_done):
+        accumulator.add_chunk(chunk)
+        chunks_done = index + 1
+        if chunks_done % checkpoint_chunks == 0:
+            state.save_checkpoint(key, chunks_done, accumulator)
+    return accumulator
+
+
+def write_outputs(target, accumulator, output_format):
+    """Write the report under temporary names, then rename it into place; returns the paths"""
+    from report_formats import report_tables, table_path, write_report_tables
+    from report_pipeline import create_stellantis_report, save_report
+
+    completion_data = accumulator.completion_data()
+    level_titles = {label: accumulator.titles_for(label) for label in accumulator.labels}
+    summary_df = create_stellantis_report(completion_data)
+    stem = os.path.splitext(target)[0]
+    partial = f'{stem}.partial.{output_format}'
+    if output_format == 'xlsx':
+        save_report(partial, summary_df, completion_data, None, level_titles)
+        os.replace(partial, target)
+        return [target], len(summary_df)
+    tables = report_tables(summary_df, completion_data, 'STELLANTIS_Training_Report')
+    paths = []
+    for name, temp in write_report_tables(partial, output_format, tables).items():
+        final = table_path(target, name, output_format)
+        os.replace(temp, final)
+        paths.append(final)
+    return paths, len(summary_df)
+
+
+def run_batch(inputs, out_dir, state_dir, config, job_role='All', output_format='xlsx',
+              chunksize=CHUNK_ROWS, checkpoint_chunks=CHECKPOINT_CHUNKS, log=None):
+    """Generate a report per export, skipping finished ones; returns a summary dict"""
+    log = log or (lambda message: None)
+    output_format = check_output_format(output_format)
+    target_roles = list(config['target_job_roles'])
+    job_roles = [job_role] if job_role in target_roles else target_roles
+    patterns = level_patterns(config)
+    version = patterns_version(config)
+    os.makedirs(out_dir, exist_ok=True)
+    state = BatchState(state_dir)
+
+    summary = {'processed': [], 'skipped': [], 'failed': []}
+    exports = find_exports(inputs)
+    for number, path in enumerate(exports, 1):
+        name = os.path.basename(path)
+        try:
+            key = input_key(path, job_role, output_format, version, chunksize)
+            record = state.finished(key)
+            if record is not None:
+                log(f"[{number}/{len(exports)}] {name}: already done")
+                summary['skipped'].append(record)
+                continue
+            log(f"[{number}/{len(exports)}] {name}: processing...")
+            accumulator = aggregate_with_checkpoints(path, key, state, patterns, job_roles, chunksize,
+                                                     checkpoint_chunks, log)
+            output_files, individuals = write_outputs(output_path(out_dir, path, key, output_format),
+                                                      accumulator, output_format)
+            record = {'input': path, 'key': key, 'output_files': output_files, 'individuals': individuals}
+            state.mark_finished(key, record)
+            summary['processed'].append(record)
+            log(f"[{number}/{len(exports)}] {name}: {individuals} individuals")
+        except Exception as e:
+            # Any failure (a corrupt or non-zip export too) only skips this export;
+            # the next run retries it from its last checkpoint
+            log(f"[{number}/{len(exports)}] {name}: failed: {e}")
+            summary['failed'].append({'input': path, 'error': str(e)})
+    return summary
+
+
+def main(argv=None):
+    from flask_app import CONFIG
+
+    parser = argparse.ArgumentParser(description="Generate one STELLANTIS report per export, resumably")
+    parser.add_argument('inputs', nargs='+', help="Exports (.xlsx, .csv) or directories containing them")
+    parser.add_argument('-o', '--out-dir', default='reports', help="Directory for the reports (default: reports)")
+    parser.add_argument('-s', '--state-dir', default='.batch_state',
+                        help="Directory for finished-export records and checkpoints (default: .batch_state)")
+    parser.add_argument('-f', '--format', dest='output_format', choices=OUTPUT_FORMATS, default='xlsx',
+                        help="Output format (default: xlsx)")
+    parser.add_argument('-r', '--job-role', default='All', help="One of the target job roles, or All (default)")
+    parser.add_argument('--checkpoint-chunks', type=int, default=CHECKPOINT_CHUNKS,
+                        help=f"Chunks of {CHUNK_ROWS} rows between checkpoints (default: {CHECKPOINT_CHUNKS})")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only print the output files")
+    args = parser.parse_args(argv)
+
+    log = None if args.quiet else (lambda message: print(message, file=sys.stderr))
+    try:
+        summary = run_batch(args.inputs, args.out_dir, args.state_dir, CONFIG, args.job_role, args.output_format,
+                            checkpoint_chunks=max(1, args.checkpoint_chunks), log=log)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for record in summary['processed'] + summary['skipped']:
+        for path in record['output_files']:
+            print(path)
+    if log:
+        log(f"{len(summary['processed'])} processed, {len(summary['skipped'])} already done, "
+            f"{len(summary['failed'])} failed")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Streaming zip archives of several generated reports.
+
+iter_zip writes the archive into a small in-memory sink and hands out the
+bytes after every member, so a response can start while later reports are
+still being generated and the whole archive is never held in memory.
+"""
+import io
+import re
+import time
+import zipfile
+
+# Members that are already compressed (.xlsx is a zip itself) are stored as is
+STORED_EXTENSIONS = ('.xlsx', '.zip', '.gz', '.parquet')
+
+# Member data is written in pieces of this size so large reports flush steadily
+WRITE_BLOCK = 1024 * 1024
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable stream that collects bytes until taken"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def safe_member_name(name, used):
+    """File-system safe member name that is not in used (which is updated)"""
+    stem, dot, extension = name.rpartition('.')
+    if not dot:
+        stem, extension = name, ''
+    stem = re.sub(r'[^A-Za-z0-9._-]+', '_', stem).strip('._') or 'report'
+    candidate = f'{stem}.{extension}' if extension else stem
+    counter = 2
+    while candidate in used:
+        candidate = f'{stem}_{counter}.{extension}' if extension else f'{stem}_{counter}'
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def iter_zip(members):
+    """Yield a zip archive in pieces from an iterable of (name, data) pairs
+
+    members is consumed lazily, so each report can be generated only when
+    the previous one has been sent.
+    """
+    sink = _ChunkSink()
+    used = set()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for name, data in members:
+            info = zipfile.ZipInfo(safe_member_name(name, used), date_time=time.localtime()[:6])
+            if info.filename.lower().endswith(STORED_EXTENSIONS):
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w', force_zip64=len(data) > 0x7FFFFFFF) as member:
+                for start in range(0, len(data), WRITE_BLOCK):
+                    member.write(data[start:start + WRITE_BLOCK])
+                    chunk = sink.take()
+                    if chunk:
+                        yield chunk
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    yield sink.take()
@@ -0,0 +1,64 @@
+"""
+Command line report generation, for scheduled jobs and BI exports.
+
+    python report_cli.py export.xlsx -o report.xlsx
+    python report_cli.py export.xlsx -o report.parquet --format parquet --job-role SER-12-Technician
+    python report_cli.py north.xlsx south.xlsx -o merged.xlsx
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from flask_app import CONFIG
+from report_formats import OUTPUT_FORMATS
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a STELLANTIS training report from an export")
+    parser.add_argument('input', nargs='+',
+                        help="Enterprise Training Report export (.xlsx); several overlapping exports "
+                             "are merged, keeping one row per user and training with the best status")
+    parser.add_argument('-o', '--output',
+                        help="Output file; tables are written next to it for non-Excel formats "
+                             "(default: <input>_STELLANTIS_Report_<timestamp>.<format>)")
+    parser.add_argument('-f', '--format', dest='output_format', choices=OUTPUT_FORMATS, default='xlsx',
+                        help="Output format (default: xlsx)")
+    parser.add_argument('-r', '--job-role', default='All',
+                        help="One of the target job roles, or All (default)")
+    parser.add_argument('--split-dealers', action='store_true',
+                        help="Also write one workbook per dealer, zipped as <output>_by_dealer.zip")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only print the output files")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from report_pipeline import ReportPipeline
+
+    output = args.output
+    if not output:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = f"{os.path.splitext(args.input[0])[0]}_STELLANTIS_Report_{timestamp}.{args.output_format}"
+
+    log = None if args.quiet else (lambda message: print(message, file=sys.stderr))
+    pipeline = ReportPipeline(CONFIG, log=log)
+    try:
+        inputs = args.input if len(args.input) > 1 else args.input[0]
+        result = pipeline.run(inputs, output, args.job_role, output_format=args.output_format)
+        if args.split_dealers:
+            from dealer_split import split_report
+            zip_path = f"{os.path.splitext(output)[0]}_by_dealer.zip"
+            split_report(result['completion_data'], result['level_titles'], zip_path)
+            result['output_files'].append(zip_path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    for path in result['output_files']:
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
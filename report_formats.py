@@ -0,0 +1,96 @@
+"""
+Columnar output formats for the report tables.
+
+Besides the Excel workbook the two main tables, Stellantis_Training_Report
+and Detailed_Completion_Summary, can be written as Parquet, CSV or NDJSON
+files for BI tools, one file per table. Parquet needs the optional pyarrow
+package.
+"""
+import os
+
+OUTPUT_FORMATS = ('xlsx', 'parquet', 'csv', 'ndjson')
+
+MIMETYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+SUMMARY_TABLE = 'Stellantis_Training_Report'
+DETAILED_TABLE = 'Detailed_Completion_Summary'
+
+
+def check_output_format(output_format):
+    """Normalise an output format name, raising ValueError for unknown or unavailable ones"""
+    output_format = (output_format or 'xlsx').strip().lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Output format must be one of: {', '.join(OUTPUT_FORMATS)}")
+    if output_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet output needs pyarrow (pip install pyarrow)")
+    return output_format
+
+
+def mimetype_for(filename):
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    return MIMETYPES.get(extension)
+
+
+def report_tables(summary_df, completion_data, summary_name=SUMMARY_TABLE):
+    """The report tables by name, as they appear in the workbook"""
+    import pandas as pd
+
+    tables = {summary_name: summary_df}
+    if completion_data:
+        detailed_df = pd.DataFrame(completion_data)
+        tables[DETAILED_TABLE] = detailed_df.sort_values('Overall Completion %', ascending=False)
+    return tables
+
+
+def iter_ndjson(records, flush_bytes=64 * 1024):
+    """Encode dict records as NDJSON, yielding about flush_bytes of lines at a time"""
+    import json
+
+    lines, size = [], 0
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False, default=str).encode('utf-8') + b'\n'
+        lines.append(line)
+        size += len(line)
+        if size >= flush_bytes:
+            yield b''.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield b''.join(lines)
+
+
+def table_path(output_path, table_name, output_format):
+    """File for one table: the output path's stem, the table name and the format extension"""
+    stem = os.path.splitext(output_path)[0]
+    return f"{stem}_{table_name}.{output_format}"
+
+
+def write_table(df, path, output_format):
+    if output_format == 'csv':
+        df.to_csv(path, index=False)
+    elif output_format == 'ndjson':
+        df.to_json(path, orient='records', lines=True, force_ascii=False, date_format='iso')
+    elif output_format == 'parquet':
+        # Mixed-type object columns (e.g. numeric and text User IDs) are stored as text
+        df = df.astype({column: 'string' for column in df.columns[df.dtypes == object]})
+        df.to_parquet(path, index=False, engine='pyarrow')
+    else:
+        raise ValueError(f"Cannot write a single table as {output_format}")
+
+
+def write_report_tables(output_path, output_format, tables):
+    """Write each table to its own file next to output_path and return the paths by table name"""
+    output_format = check_output_format(output_format)
+    paths = {}
+    for name, df in tables.items():
+        path = table_path(output_path, name, output_format)
+        write_table(df, path, output_format)
+        paths[name] = path
+    return paths
@@ -0,0 +1,204 @@
+"""
+Memoized report pipeline used by the desktop application.
+
+The report is built in stages: load -> role filter -> classify ->
+aggregate -> write. Each stage result is cached together with a key made from
+its own inputs and the key of the stage before it, so a re-run only
+recomputes the stages whose inputs changed. Changing the job role, for
+example, reuses the loaded and cleaned export; changing only the output file
+just writes the cached results again (the write stage always runs), in
+any of the output formats.
+"""
+import os
+
+import pandas as pd
+
+from export_reader import HEADER_ROW, choose_reader, read_export
+from levels import classify_titles, level_columns, level_name, level_patterns, titles_reference
+from parallel_aggregation import calculate_completion_percentages_parallel
+from parallel_workbook import write_workbook
+from report_formats import check_output_format, report_tables, write_report_tables
+
+
+def create_stellantis_report(completion_data):
+    """Create a STELLANTIS format report DataFrame"""
+    if not completion_data:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(completion_data)
+
+    # Reorder columns to match STELLANTIS format, one completion column per level
+    column_order = [
+        'User ID', 'First Name', 'Last Name', 'Job Role', 'Dealer Name', 'User Brand'
+    ] + level_columns(df.columns, counts=False)
+
+    # Filter to only include columns that exist
+    existing_columns = [col for col in column_order if col in df.columns]
+    return df[existing_columns]
+
+
+def report_sheets(summary_df, completion_data, df_clean, level_titles):
+    """The report's DataFrames by sheet name, in workbook order"""
+    # Main STELLANTIS report sheet
+    sheets = {'STELLANTIS_Training_Report': summary_df}
+
+    # Detailed completion summary
+    if completion_data:
+        detailed_df = pd.DataFrame(completion_data)
+        sheets['Detailed_Completion_Summary'] = detailed_df.sort_values('Overall Completion %', ascending=False)
+
+    if df_clean is not None:
+        # One details sheet per level
+        for label, titles in level_titles.items():
+            level_df = df_clean[df_clean['Training Title'].isin(titles)]
+            if len(level_df) > 0:
+                sheets[f"{level_name(label).replace(' ', '_')}_Training_Details"] = level_df
+
+        # All training details sheet
+        sheets['All_Training_Details'] = df_clean
+
+    # Training titles reference sheet
+    sheets['Training_Titles_Reference'] = titles_reference(level_titles)
+    return sheets
+
+
+def save_report(output_path, summary_df, completion_data, df_clean, level_titles, workers=None):
+    """Save results to Excel with STELLANTIS format
+
+    Large sheets are serialized in parallel worker processes (see
+    parallel_workbook.py).
+    """
+    write_workbook(output_path, report_sheets(summary_df, completion_data, df_clean, level_titles), workers=workers)
+
+
+class ReportPipeline:
+    """Stage-by-stage report builder that memoizes every stage by its inputs"""
+
+    def __init__(self, config, log=None, workers=None, workbook_workers=None):
+        self.config = config
+        self.log = log or (lambda message: None)
+        self.workers = workers  # processes aggregating completion, None for AGGREGATION_WORKERS
+        self.workbook_workers = workbook_workers  # processes writing workbook sheets, None for all CPUs
+        self._cache = {}  # stage name -> (key, value)
+
+    def _stage(self, name, key, compute, reuse_message):
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == key:
+            self.log(reuse_message)
+            return cached[1]
+        value = compute()
+        self._cache[name] = (key, value)
+        return value
+
+    def clear(self):
+        self._cache.clear()
+
+    def load(self, input_path):
+        """Read the raw export and clean it; keyed by path, size and mtime
+
+        Only the cleaned frame is cached, since the raw one is not needed by
+        any later stage. input_path may be a list of overlapping exports,
+        which are merged into one deduplicated frame.
+        """
+        paths = list(input_path) if isinstance(input_path, (list, tuple)) else [input_path]
+        stats = [os.stat(path) for path in paths]
+        key = tuple((os.path.abspath(path), stat.st_size, stat.st_mtime_ns) for path, stat in zip(paths, stats))
+
+        def compute():
+            if len(paths) > 1:
+                from export_merge import merge_exports_frame
+
+                self.log(f"Merging {len(paths)} exports...")
+                df_clean, stats = merge_exports_frame(paths)
+                self.log(f"Read {stats['rows_read']} rows, removed {stats['duplicates_removed']} duplicates")
+                return df_clean
+            self.log(f"Loading Excel file ({choose_reader(paths[0])} reader)...")
+            df_clean = read_export(paths[0])
+            self.log(f"After removing the first {HEADER_ROW} rows: {len(df_clean)} rows and "
+                     f"{len(df_clean.columns)} columns")
+            return df_clean
+
+        names = ', '.join(os.path.basename(path) for path in paths)
+        df_clean = self._stage('load', key, compute, f"Reusing loaded data from {names}")
+        return df_clean, key
+
+    def role_filter(self, df_clean, clean_key, job_role):
+        """Keep the target job roles, then the selected one if any"""
+        target_job_roles = tuple(self.config['target_job_roles'])
+        key = (clean_key, target_job_roles, job_role)
+
+        def compute():
+            self.log("Filtering to target job roles (SAL-2, SAL-3, SER-12, SER-1, SER-2)...")
+            df = df_clean[df_clean['Position'].isin(target_job_roles)]
+            self.log(f"After filtering to target job roles: {len(df)} rows")
+
+            # Show breakdown by job role
+            for role in target_job_roles:
+                role_count = len(df[df['Position'] == role])
+                self.log(f"  {role}: {role_count} records")
+
+            # Apply specific job role filter if selected
+            if job_role in target_job_roles:
+                df = df[df['Position'] == job_role]
+                self.log(f"Filtered to {job_role}: {len(df)} rows")
+            return df
+
+        df = self._stage('role_filter', key, compute, f"Reusing job role filter ({job_role})")
+        return df, key
+
+    def classify(self, df, filter_key):
+        """Assign training titles to levels in one pass over every level's patterns"""
+        patterns = level_patterns(self.config)
+        key = (filter_key, tuple((label, tuple(level)) for label, level in patterns.items()))
+
+        def compute():
+            level_titles = classify_titles(df['Training Title'].unique(), patterns)
+            for label, titles in level_titles.items():
+                self.log(f"Found {len(titles)} {level_name(label)} training titles")
+            return level_titles
+
+        level_titles = self._stage('classify', key, compute, "Reusing classified training titles")
+        return level_titles, key
+
+    def aggregate(self, df, level_titles, classify_key):
+        """Calculate completion percentages and the STELLANTIS summary"""
+
+        def compute():
+            self.log("Calculating completion percentages...")
+            completion_data = calculate_completion_percentages_parallel(df, level_titles, workers=self.workers)
+            self.log("Creating STELLANTIS format report...")
+            return completion_data, create_stellantis_report(completion_data)
+
+        return self._stage('aggregate', classify_key, compute, "Reusing completion results")
+
+    def run(self, input_path, output_path, job_role, output_format='xlsx'):
+        """Run every stage, recomputing only what changed, and write the report
+
+        With output_format 'parquet', 'csv' or 'ndjson' the report tables are
+        written as one file each next to output_path instead of a workbook.
+        """
+        output_format = check_output_format(output_format)
+        df_clean, clean_key = self.load(input_path)
+        df, filter_key = self.role_filter(df_clean, clean_key, job_role)
+        level_titles, classify_key = self.classify(df, filter_key)
+        completion_data, summary_df = self.aggregate(df, level_titles, classify_key)
+
+        if output_format == 'xlsx':
+            self.log("Saving to Excel...")
+            save_report(output_path, summary_df, completion_data, df, level_titles, workers=self.workbook_workers)
+            self.log(f"STELLANTIS Excel report saved with {len(summary_df)} individuals processed")
+            output_files = [output_path]
+        else:
+            self.log(f"Saving {output_format.upper()} tables...")
+            paths = write_report_tables(output_path, output_format,
+                                        report_tables(summary_df, completion_data, 'STELLANTIS_Training_Report'))
+            output_files = list(paths.values())
+            for path in output_files:
+                self.log(f"Saved {path}")
+        return {
+            'output_files': output_files,
+            'summary_df': summary_df,
+            'completion_data': completion_data,
+            'level_titles': level_titles,
+            'df_clean': df,
+        }
@@ -0,0 +1,152 @@
+"""
+Concurrent report generation for a queue of exports.
+
+Every queued export is processed by its own ReportPipeline in a worker
+process, so several exports are handled at once while the window stays
+responsive. Workers send their pipeline log messages back through a queue,
+which the GUI polls to show the current stage of every file.
+"""
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+QUEUED = 'Queued'
+RUNNING = 'Processing'
+DONE = 'Done'
+FAILED = 'Failed'
+
+_messages = None  # queue of (task id, message) in worker processes
+
+
+def report_output_path(input_path, output_format='xlsx', timestamp=None):
+    """<input>_STELLANTIS_Report_<timestamp>.<format> next to the input"""
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{os.path.splitext(input_path)[0]}_STELLANTIS_Report_{timestamp}.{output_format}"
+
+
+def _init_worker(messages):
+    global _messages
+    _messages = messages
+
+
+def _process(task_id, input_path, output_path, config, job_role, output_format, split_dealers):
+    """Generate one report in a worker process"""
+    from report_pipeline import ReportPipeline
+
+    # Already in a worker process, so aggregation and the workbook sheets run in it too
+    pipeline = ReportPipeline(config, log=lambda message: _messages.put((task_id, message)), workers=1,
+                              workbook_workers=1)
+    result = pipeline.run(input_path, output_path, job_role, output_format=output_format)
+    output_files = result['output_files']
+    if split_dealers:
+        from dealer_split import split_report
+
+        _messages.put((task_id, "Writing one workbook per dealer..."))
+        zip_path = f"{os.path.splitext(output_path)[0]}_by_dealer.zip"
+        split_report(result['completion_data'], result['level_titles'], zip_path, workers=1)
+        output_files.append(zip_path)
+    return {
+        'output_files': output_files,
+        'individuals': len(result['summary_df']),
+        'completion_data': result['completion_data'],
+    }
+
+
+class ReportQueue:
+    """Exports waiting for, or going through, report generation"""
+
+    def __init__(self, config, workers=None):
+        self.config = config
+        self.workers = (os.cpu_count() or 1) if workers is None else max(1, workers)
+        self.tasks = {}  # task id -> {'input', 'output', 'job_role', 'status', 'detail', 'result'}
+        self._futures = {}
+        self._next_id = 1
+        self._pool = None
+        self._messages = None
+
+    def add(self, input_path):
+        """Queue an export; returns its task id, or None if it is already waiting"""
+        for task in self.tasks.values():
+            if task['input'] == input_path and task['status'] in (QUEUED, RUNNING):
+                return None
+        task_id = self._next_id
+        self._next_id += 1
+        self.tasks[task_id] = {'input': input_path, 'output': None, 'job_role': None, 'status': QUEUED,
+                               'detail': '', 'result': None}
+        return task_id
+
+    def start(self, job_role, output_format='xlsx', split_dealers=False):
+        """Submit every queued export with the given settings; returns the task ids started"""
+        pending = [task_id for task_id, task in self.tasks.items() if task['status'] == QUEUED]
+        if not pending:
+            return []
+        if self._pool is None:
+            # spawn, not fork: the Tk process must not be forked
+            context = multiprocessing.get_context('spawn')
+            self._messages = context.Queue()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(self._messages,))
+        # One timestamp per batch, as in the single-file output name
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        taken = {task['output'] for task in self.tasks.values() if task['output']}
+        for task_id in pending:
+            task = self.tasks[task_id]
+            # export.xlsx and export.xls in one folder would share an output name
+            output = report_output_path(task['input'], output_format, timestamp)
+            stem, number = os.path.splitext(output)[0], 2
+            while output in taken:
+                output = f"{stem}_{number}.{output_format}"
+                number += 1
+            taken.add(output)
+            task['output'] = output
+            task['job_role'] = job_role
+            task['status'], task['detail'] = RUNNING, 'Waiting for a worker'
+            self._futures[task_id] = self._pool.submit(
+                _process, task_id, task['input'], task['output'], self.config, job_role, output_format,
+                split_dealers
+            )
+        return pending
+
+    def poll(self):
+        """Apply progress messages and finished results; returns the ids of changed tasks"""
+        changed = set()
+        while self._messages is not None:
+            try:
+                task_id, message = self._messages.get_nowait()
+            except queue.Empty:
+                break
+            # Late messages must not overwrite a finished task
+            if self.tasks.get(task_id, {}).get('status') == RUNNING:
+                self.tasks[task_id]['detail'] = message
+                changed.add(task_id)
+        for task_id, future in list(self._futures.items()):
+            if not future.done():
+                continue
+            del self._futures[task_id]
+            task = self.tasks[task_id]
+            try:
+                task['result'] = future.result()
+                task['status'] = DONE
+                task['detail'] = f"{task['result']['individuals']} individuals"
+            except Exception as e:
+                task['status'], task['detail'] = FAILED, str(e)
+            changed.add(task_id)
+        return sorted(changed)
+
+    @property
+    def active(self):
+        return bool(self._futures)
+
+    def clear_finished(self):
+        """Forget finished and failed tasks; returns their ids"""
+        finished = [task_id for task_id, task in self.tasks.items() if task['status'] in (DONE, FAILED)]
+        for task_id in finished:
+            del self.tasks[task_id]
+        return finished
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,99 @@
+"""
+Cache of processed report results, keyed by what determines them.
+
+The key combines a SHA-256 of the uploaded file contents with the selected
+job role, the pattern version and the output options, so a re-submitted
+file (a double click, a colleague uploading the same export) gets the
+stored result and its already written report files back without running the
+pipeline again. Entries are JSON files in a shared directory, so every web
+worker sees them; the least recently used entries beyond max_entries are
+evicted together with their report files.
+"""
+import hashlib
+import json
+import os
+
+# Files are hashed in blocks of this size
+HASH_BLOCK = 1024 * 1024
+
+
+def file_digest(paths):
+    """SHA-256 of the contents of the files, in order"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(HASH_BLOCK), b''):
+                digest.update(block)
+        digest.update(b'\0')  # keeps [ab, c] apart from [a, bc]
+    return digest.hexdigest()
+
+
+def cache_key(content_digest, **options):
+    """Key of a content digest and the options that change the result"""
+    text = json.dumps([content_digest, sorted(options.items())], default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Least recently used result entries, each a JSON file named by its key"""
+
+    def __init__(self, directory, max_entries=50):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        """The stored result, or None if there is none or one of its files is gone"""
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as handle:
+                entry = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if not all(os.path.exists(file) for file in entry['files']):
+            self._remove(path, entry)
+            return None
+        os.utime(path)  # most recently used
+        return entry['result']
+
+    def put(self, key, result, files):
+        """Store a result and the report files it refers to, then evict beyond max_entries"""
+        path = self._path(key)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as handle:
+            json.dump({'result': result, 'files': list(files)}, handle, default=str)
+        os.replace(f'{path}.tmp', path)
+        self.evict()
+
+    def _remove(self, path, entry=None):
+        if entry is None:
+            try:
+                with open(path, encoding='utf-8') as handle:
+                    entry = json.load(handle)
+            except (OSError, ValueError):
+                entry = {'files': []}
+        for file in entry['files']:
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Remove the least recently used entries and their files beyond max_entries"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            self._remove(path)
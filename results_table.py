@@ -0,0 +1,205 @@
+"""
+Paged, sortable and filterable results table for the desktop application.
+
+Only the rows around the view are inserted into the Treeview: the first
+page is shown straight away, the next one is appended whenever the list is
+scrolled near its end and the previous one is put back when it is scrolled
+near its start. At most MAX_PAGES pages are kept; pages beyond that at the
+other end are dropped, so the widget stays small however far the list is
+scrolled, even with 100k+ users. The scrollbar covers the inserted window.
+Sorting and filtering work on the in-memory DataFrame and only produce a new
+row order.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+import pandas as pd
+
+# Rows inserted into the Treeview at a time
+PAGE_ROWS = 200
+
+# Pages kept in the Treeview at once
+MAX_PAGES = 5
+
+# Load the next page once the view is scrolled past this fraction (the
+# previous one before 1 - LOAD_AHEAD)
+LOAD_AHEAD = 0.9
+
+# Wait this long after the last keystroke before filtering
+FILTER_DELAY_MS = 250
+
+
+class ResultsModel:
+    """Row order of a results DataFrame after filtering and sorting"""
+
+    def __init__(self, df=None):
+        self.load(pd.DataFrame() if df is None else df)
+
+    def load(self, df):
+        self.df = df.reset_index(drop=True)
+        self.columns = list(self.df.columns)
+        self.filter_text = ''
+        self.sort_column = None
+        self.descending = False
+        self.order = np.arange(len(self.df))
+        self._search = None
+
+    def __len__(self):
+        return len(self.order)
+
+    def _search_keys(self):
+        """Lower-cased text of every row, built on the first filter"""
+        if self._search is None:
+            keys = pd.Series('', index=self.df.index)
+            for column in self.columns:
+                keys = keys + '\t' + self.df[column].astype(str)
+            self._search = keys.str.lower()
+        return self._search
+
+    def _refresh(self):
+        if self.filter_text:
+            matches = self._search_keys().str.contains(self.filter_text.lower(), regex=False)
+            positions = np.flatnonzero(matches.to_numpy())
+        else:
+            positions = np.arange(len(self.df))
+        if self.sort_column is not None:
+            values = self.df[self.sort_column].iloc[positions]
+            try:
+                values = values.sort_values(ascending=not self.descending, kind='stable', na_position='last')
+            except TypeError:
+                # Mixed types, e.g. numeric and text User IDs
+                values = values.astype(str).sort_values(ascending=not self.descending, kind='stable')
+            positions = values.index.to_numpy()
+        self.order = positions
+
+    def set_filter(self, text):
+        """Keep the rows containing text in any column (case-insensitive)"""
+        self.filter_text = text.strip()
+        self._refresh()
+
+    def sort_by(self, column):
+        """Sort by a column; sorting by the same column again reverses the order"""
+        if column == self.sort_column:
+            self.descending = not self.descending
+        else:
+            self.sort_column, self.descending = column, False
+        self._refresh()
+
+    def rows(self, start, stop):
+        """Display values of the rows at positions start to stop in the current order"""
+        page = self.df.iloc[self.order[start:stop]]
+        return [tuple('' if pd.isna(value) else value for value in row)
+                for row in page.itertuples(index=False, name=None)]
+
+
+class ResultsTable(ttk.Frame):
+    """Treeview of a window of a results DataFrame's rows, moved a page at a time as it is scrolled"""
+
+    def __init__(self, master, page_rows=PAGE_ROWS, max_pages=MAX_PAGES, **kwargs):
+        super().__init__(master, **kwargs)
+        self.model = ResultsModel()
+        self.page_rows = page_rows
+        self.max_rows = page_rows * max(2, max_pages)
+        self.first = 0  # positions first to loaded of the current order are inserted
+        self.loaded = 0
+        self._page_pending = False
+        self._filter_job = None
+
+        bar = ttk.Frame(self)
+        bar.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        self.filter_var = tk.StringVar()
+        self.count_var = tk.StringVar(value="No results yet")
+        ttk.Label(bar, text="Filter:").pack(side=tk.LEFT)
+        ttk.Entry(bar, textvariable=self.filter_var, width=40).pack(side=tk.LEFT, padx=5)
+        ttk.Label(bar, textvariable=self.count_var).pack(side=tk.RIGHT)
+        self.filter_var.trace_add('write', self._on_filter_typed)
+
+        self.tree = ttk.Treeview(self, show='headings', selectmode='browse')
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+    def load(self, df):
+        """Show a new results DataFrame, clearing any filter and sort"""
+        self.model.load(df)
+        self.tree['columns'] = self.model.columns
+        for column in self.model.columns:
+            numeric = pd.api.types.is_numeric_dtype(self.model.df[column])
+            self.tree.heading(column, text=column, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=90 if numeric else 160, anchor=tk.E if numeric else tk.W)
+        self.filter_var.set('')  # resets the view through _on_filter_typed
+        self._reset()
+
+    def sort_by(self, column):
+        self.model.sort_by(column)
+        for name in self.model.columns:
+            arrow = (' ▼' if self.model.descending else ' ▲') if name == column else ''
+            self.tree.heading(name, text=name + arrow)
+        self._reset()
+
+    def _on_filter_typed(self, *args):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DELAY_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        if self.filter_var.get().strip() != self.model.filter_text:
+            self.model.set_filter(self.filter_var.get())
+            self._reset()
+
+    def _reset(self):
+        """Drop the inserted rows and show the first page of the current order"""
+        self.tree.delete(*self.tree.get_children())
+        self.first = self.loaded = 0
+        self._load_page()
+        self.tree.yview_moveto(0)
+        total = len(self.model.df)
+        shown = len(self.model)
+        self.count_var.set(f"{shown} of {total} users" if shown != total else f"{total} users")
+
+    def _load_page(self, previous=False):
+        """Insert the page after the window (or before it) and drop the rows beyond max_rows at the other end"""
+        self._page_pending = False
+        top = float(self.tree.yview()[0])
+        shown = self.loaded - self.first
+        if previous:
+            start = max(0, self.first - self.page_rows)
+            rows = self.model.rows(start, self.first)
+            for row in reversed(rows):
+                self.tree.insert('', 0, values=row)
+            self.first = start
+            excess = max(0, self.loaded - self.first - self.max_rows)
+            if excess:
+                self.tree.delete(*self.tree.get_children()[-excess:])
+                self.loaded -= excess
+            moved = len(rows)
+        else:
+            rows = self.model.rows(self.loaded, self.loaded + self.page_rows)
+            for row in rows:
+                self.tree.insert('', tk.END, values=row)
+            self.loaded += len(rows)
+            excess = max(0, self.loaded - self.first - self.max_rows)
+            if excess:
+                self.tree.delete(*self.tree.get_children()[:excess])
+                self.first += excess
+            moved = -excess
+        if shown and moved:
+            # Keep the same rows in view while rows come and go above them
+            self.tree.yview_moveto((top * shown + moved) / (self.loaded - self.first))
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        # Inserting rows scrolls again, so a page is queued at most once
+        if self._page_pending:
+            return
+        if float(last) >= LOAD_AHEAD and self.loaded < len(self.model):
+            self._page_pending = True
+            self.after_idle(self._load_page)
+        elif float(first) <= 1 - LOAD_AHEAD and self.first > 0:
+            self._page_pending = True
+            self.after_idle(self._load_page, True)
@@ -0,0 +1,182 @@
+"""
+SQLite store of dated report snapshots for completion trends.
+
+Every processed report is saved as a snapshot: one row per user and level
+('Level 1', 'Level 2', 'Overall') with the totals and completion percentage
+from completion_data. Rows are indexed by user, dealer, job role and date so
+trend queries only touch the snapshots they need.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    snapshot_date TEXT NOT NULL,
+    source_name TEXT NOT NULL,
+    job_role_filter TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (snapshot_date, source_name, job_role_filter)
+);
+CREATE TABLE IF NOT EXISTS snapshot_rows (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    snapshot_date TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    first_name TEXT,
+    last_name TEXT,
+    job_role TEXT,
+    dealer_name TEXT,
+    user_brand TEXT,
+    level TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    completion_pct REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rows_snapshot ON snapshot_rows (snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_rows_user ON snapshot_rows (user_id, level, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_rows_dealer ON snapshot_rows (dealer_name, level, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_rows_role ON snapshot_rows (job_role, level, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_rows_date ON snapshot_rows (level, snapshot_date);
+"""
+
+
+def level_names(completion_row):
+    """Level names present in a completion_data row, e.g. ['Level 1', 'Level 2']"""
+    return [
+        key[len('Total '):-len(' Trainings')]
+        for key in completion_row
+        if key.startswith('Total ') and key.endswith(' Trainings')
+    ]
+
+
+class SnapshotStore:
+    """Persist completion_data snapshots and answer trend queries"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA foreign_keys = ON')
+            conn.execute('PRAGMA journal_mode = WAL')
+            with conn:  # commits, or rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def save_snapshot(self, completion_data, snapshot_date=None, source_name='', job_role_filter='All'):
+        """Store completion_data as the snapshot for a date, source and role filter
+
+        Saving the same date, source and role filter again replaces the
+        earlier snapshot, so re-processing a file does not double count it.
+        """
+        if snapshot_date is None:
+            snapshot_date = date.today()
+        if not isinstance(snapshot_date, str):
+            snapshot_date = snapshot_date.isoformat()
+        rows = []
+        for user in completion_data:
+            base = (
+                str(user['User ID']), user.get('First Name'), user.get('Last Name'),
+                user.get('Job Role'), user.get('Dealer Name'), user.get('User Brand'),
+            )
+            total_all = completed_all = 0
+            for level in level_names(user):
+                total = int(user[f'Total {level} Trainings'])
+                completed = int(user[f'Completed {level} Trainings'])
+                total_all += total
+                completed_all += completed
+                rows.append(base + (level, total, completed, float(user[f'{level} Completion %'])))
+            rows.append(base + ('Overall', total_all, completed_all,
+                                float(user.get('Overall Completion %', 0.0))))
+
+        with self._connect() as conn:
+            conn.execute(
+                'DELETE FROM snapshots WHERE snapshot_date = ? AND source_name = ? AND job_role_filter = ?',
+                (snapshot_date, source_name, job_role_filter)
+            )
+            cursor = conn.execute(
+                'INSERT INTO snapshots (snapshot_date, source_name, job_role_filter) VALUES (?, ?, ?)',
+                (snapshot_date, source_name, job_role_filter)
+            )
+            snapshot_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT INTO snapshot_rows (snapshot_id, snapshot_date, user_id, first_name, last_name, '
+                'job_role, dealer_name, user_brand, level, total, completed, completion_pct) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(snapshot_id, snapshot_date) + row for row in rows]
+            )
+        return snapshot_id
+
+    def list_snapshots(self):
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(
+                'SELECT s.*, COUNT(DISTINCT r.user_id) AS individuals FROM snapshots s '
+                'LEFT JOIN snapshot_rows r ON r.snapshot_id = s.id '
+                'GROUP BY s.id ORDER BY s.snapshot_date, s.id'
+            )]
+
+    def trend(self, user_id=None, dealer_name=None, job_role=None, level=None, start=None, end=None):
+        """Completion over time per date and level for the matching users
+
+        When a user appears in several snapshots of the same date only the
+        most recent one is counted.
+        """
+        conditions, params = [], []
+        for column, value in (('user_id', user_id), ('dealer_name', dealer_name),
+                              ('job_role', job_role), ('level', level)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                params.append(str(value) if column == 'user_id' else value)
+        if start is not None:
+            conditions.append('snapshot_date >= ?')
+            params.append(str(start))
+        if end is not None:
+            conditions.append('snapshot_date <= ?')
+            params.append(str(end))
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+        query = f"""
+            WITH latest AS (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY snapshot_date, user_id, level ORDER BY snapshot_id DESC
+                ) AS rn
+                FROM snapshot_rows {where}
+            )
+            SELECT snapshot_date, level,
+                   COUNT(*) AS individuals,
+                   ROUND(AVG(completion_pct), 2) AS avg_completion_pct,
+                   SUM(completed) AS completed,
+                   SUM(total) AS total
+            FROM latest WHERE rn = 1
+            GROUP BY snapshot_date, level
+            ORDER BY snapshot_date, level
+        """
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+
+def trend_table(trend_rows):
+    """Pivot trend rows into one row per date with a column per level"""
+    import pandas as pd
+
+    if not trend_rows:
+        return pd.DataFrame(columns=['Date'])
+    df = pd.DataFrame(trend_rows)
+    table = df.pivot_table(index='snapshot_date', columns='level',
+                           values='avg_completion_pct', aggfunc='first')
+    table.columns = [f'{level} Avg Completion %' for level in table.columns]
+    individuals = df.groupby('snapshot_date')['individuals'].max()
+    table.insert(0, 'Individuals', individuals)
+    table = table.reset_index().rename(columns={'snapshot_date': 'Date'})
+    return table
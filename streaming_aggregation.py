@@ -0,0 +1,198 @@
+"""
+Memory-bounded aggregation of transcript rows.
+
+Rows are read in chunks, classified, and folded into per-user running
+counters (totals, completed, first position/division, brand priority), so the
+memory used grows with the number of users rather than the number of rows.
+The output matches calculate_completion_percentages in flask_app.py.
+"""
+import pandas as pd
+
+from export_reader import REPORT_COLUMNS, iter_export_chunks
+from levels import level_matcher, level_name
+
+COMPLETED_STATUSES = ['Completed', 'Approved']
+
+# Brand keywords in priority order, as checked by extract_brand
+BRANDS = [
+    ('FIAT', 'Fiat Professional'),
+    ('JEEP', 'Jeep'),
+    ('PEUGEOT', 'Peugeot'),
+    ('CITROEN', 'Citroen'),
+    ('ALFA ROMEO', 'Alfa Romeo'),
+]
+OTHER_BRAND = len(BRANDS)
+
+def brand_rank(title):
+    """Priority of the first brand keyword found in a title (lower wins)"""
+    text = str(title).upper()
+    for rank, (keyword, _) in enumerate(BRANDS):
+        if keyword in text:
+            return rank
+    return OTHER_BRAND
+
+
+def brand_name(rank):
+    return BRANDS[rank][1] if rank < OTHER_BRAND else 'Other'
+
+
+def split_user_name(user_name):
+    """Split 'Last, First' into (first_name, last_name)"""
+    name_parts = str(user_name).split(', ')
+    if len(name_parts) >= 2:
+        return name_parts[1], name_parts[0]
+    return "", str(user_name)
+
+
+def build_user_row(user_id, user_name, position, division, brand, counts, labels):
+    """Build one completion_data row from per-level (total, completed) counts"""
+    first_name, last_name = split_user_name(user_name)
+    user_data = {
+        'User ID': user_id,
+        'First Name': first_name,
+        'Last Name': last_name,
+        'Job Role': position,
+        'Dealer Name': division,
+        'User Brand': brand,
+    }
+    total_trainings = total_completed = 0
+    for label, (total, completed) in zip(labels, counts):
+        name = level_name(label)
+        user_data[f'Total {name} Trainings'] = total
+        user_data[f'Completed {name} Trainings'] = completed
+        user_data[f'{name} Completion %'] = round((completed / total) * 100, 2) if total > 0 else 0.0
+        total_trainings += total
+        total_completed += completed
+    user_data['Overall Completion %'] = (
+        round((total_completed / total_trainings) * 100, 2) if total_trainings > 0 else 0.0
+    )
+    return user_data
+
+
+class CompletionAccumulator:
+    """Running per-user completion counters fed one chunk at a time"""
+
+    def __init__(self, level_patterns, job_roles):
+        self.labels = list(level_patterns)
+        self.level_patterns = {label: list(patterns) for label, patterns in level_patterns.items()}
+        self.matcher = level_matcher(level_patterns)
+        self.job_roles = list(job_roles)
+        self.title_levels = {label: {} for label in self.labels}  # title -> bool
+        self.title_brands = {}  # title -> brand rank
+        self.level_titles = {label: {} for label in self.labels}  # ordered sets
+        self.position_counts = {}
+        # (user id, full name) -> [position, division, brand rank, [total, completed] per level]
+        self.users = {}
+        self.rows_read = 0
+
+    def __getstate__(self):
+        # The compiled matcher is rebuilt from the patterns when unpickled
+        state = self.__dict__.copy()
+        del state['matcher']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.matcher = level_matcher(self.level_patterns)
+
+    def _classify(self, titles):
+        for title in titles:
+            if title in self.title_brands:
+                continue
+            # Each title belongs to at most one level, the highest that matches
+            matched = self.matcher.first_label(title)
+            for label in self.labels:
+                self.title_levels[label][title] = label == matched
+            if matched is not None:
+                self.level_titles[matched][title] = None
+            self.title_brands[title] = brand_rank(title)
+
+    def add_chunk(self, chunk):
+        """Fold a DataFrame chunk of transcript rows into the counters"""
+        self.rows_read += len(chunk)
+        chunk = chunk[chunk['Position'].isin(self.job_roles)]
+        if len(chunk) == 0:
+            return
+
+        for position, count in chunk['Position'].value_counts().items():
+            self.position_counts[position] = self.position_counts.get(position, 0) + int(count)
+
+        titles = chunk['Training Title']
+        self._classify(titles.unique())
+
+        chunk = chunk.dropna(subset=['User ID', 'User Full Name'])
+        if len(chunk) == 0:
+            return
+        titles = chunk['Training Title']
+        completed = chunk['Transcript Status'].isin(COMPLETED_STATUSES)
+        columns = {
+            'User ID': chunk['User ID'],
+            'User Full Name': chunk['User Full Name'],
+            'Brand Rank': titles.map(self.title_brands),
+        }
+        for label in self.labels:
+            # Series.map with a dict also resolves missing (NaN) titles
+            is_level = titles.map(self.title_levels[label]).eq(True)
+            columns[f'{label} total'] = is_level
+            columns[f'{label} completed'] = is_level & completed
+        frame = pd.DataFrame(columns)
+
+        keys = ['User ID', 'User Full Name']
+        grouped = frame.groupby(keys, sort=False)
+        sums = grouped[[c for c in frame.columns if c.endswith((' total', ' completed'))]].sum()
+        ranks = grouped['Brand Rank'].min()
+        firsts = chunk.groupby(keys, sort=False).head(1)
+        first_seen = dict(zip(
+            zip(firsts['User ID'], firsts['User Full Name']),
+            zip(firsts['Position'], firsts['Division']),
+        ))
+
+        for key, rank, row in zip(sums.index, ranks.values, sums.itertuples(index=False)):
+            user = self.users.get(key)
+            if user is None:
+                position, division = first_seen[key]
+                user = [position, division, OTHER_BRAND, [[0, 0] for _ in self.labels]]
+                self.users[key] = user
+            user[2] = min(user[2], int(rank))
+            for i in range(len(self.labels)):
+                user[3][i][0] += int(row[2 * i])
+                user[3][i][1] += int(row[2 * i + 1])
+
+    def titles_for(self, label):
+        return list(self.level_titles[label])
+
+    def job_role_breakdown(self):
+        return dict(sorted(self.position_counts.items(), key=lambda item: -item[1]))
+
+    def iter_completion_rows(self):
+        """Per-user rows in the same order calculate_completion_percentages uses, built one at a time"""
+        try:
+            keys = sorted(self.users)
+        except TypeError:
+            keys = list(self.users)
+        for user_id, user_name in keys:
+            position, division, rank, counts = self.users[(user_id, user_name)]
+            yield build_user_row(user_id, user_name, position, division,
+                                 brand_name(rank), counts, self.labels)
+
+    def completion_data(self):
+        return list(self.iter_completion_rows())
+
+
+def aggregate_export_streaming(filepath, level_patterns, job_roles, chunksize=50000, on_chunk=None):
+    """Aggregate an export chunk by chunk and return the CompletionAccumulator
+
+    on_chunk, if given, is called with the accumulator after every chunk.
+    """
+    chunks = iter_export_chunks(filepath, chunksize=chunksize, columns=REPORT_COLUMNS)
+    return aggregate_chunks(chunks, level_patterns, job_roles, on_chunk=on_chunk)
+
+
+def aggregate_chunks(chunks, level_patterns, job_roles, on_chunk=None):
+    """Aggregate DataFrame chunks with the REPORT_COLUMNS and return the CompletionAccumulator"""
+    accumulator = CompletionAccumulator(level_patterns, job_roles)
+    for chunk in chunks:
+        accumulator.add_chunk(chunk)
+        if on_chunk is not None:
+            on_chunk(accumulator)
+    return accumulator
@@ -0,0 +1,33 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from arrow_store import RESULTS, ArrowStore
+
+
+def dataset(store, value):
+    writer = store.writer()
+    writer.add(RESULTS, pd.DataFrame({'User ID': [value]}))
+    return writer.commit()
+
+
+def test_only_the_most_recently_used_tables_stay_mapped(tmp_path):
+    store = ArrowStore(str(tmp_path), max_mapped=2)
+    first, second, third = (dataset(store, value) for value in ('A', 'B', 'C'))
+    store.table(first, RESULTS)
+    store.table(second, RESULTS)
+    store.table(first, RESULTS)
+    store.table(third, RESULTS)
+    assert list(store._mapped) == [(first, RESULTS), (third, RESULTS)]
+
+
+def test_a_dataset_removed_on_disk_is_not_served_from_the_cache(tmp_path):
+    store = ArrowStore(str(tmp_path))
+    dataset_id = dataset(store, 'A')
+    assert store.table(dataset_id, RESULTS)['User ID'].to_pylist() == ['A']
+    # Another worker pruned it
+    shutil.rmtree(store.dataset_path(dataset_id))
+    with pytest.raises(FileNotFoundError):
+        store.table(dataset_id, RESULTS)
+    assert not store._mapped
@@ -0,0 +1,93 @@
+import random
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from benchmarks.fixtures import HEADER, make_rows, write_export
+from completion_windows import DateIndex, completion_over_time, day_number, parse_points
+from flask_app import app, calculate_completion_percentages, identify_level_trainings
+
+LEVEL_TITLES = {'level1': ['L1 A', 'L1 B'], 'level2': ['L2 A']}
+
+
+def transcripts(rows):
+    columns = ['User ID', 'User Full Name', 'Training Title', 'Transcript Status', 'Assigned Date', 'Completed Date']
+    return pd.DataFrame(rows, columns=columns)
+
+
+def test_parse_points():
+    assert parse_points() == []
+    assert parse_points('2024-03-01, 2024-01-01') == [(None, date(2024, 1, 1)), (None, date(2024, 3, 1))]
+    assert parse_points('2024-03-31', '30', '3') == [
+        (date(2024, 1, 1), date(2024, 1, 31)),
+        (date(2024, 1, 31), date(2024, 3, 1)),
+        (date(2024, 3, 1), date(2024, 3, 31)),
+    ]
+    for args in (('2024-13-01',), ('2024-01-01', '0'), ('2024-01-01', None, '2'), (None, '30'),
+                 ('2024-01-01', '1', '500')):
+        with pytest.raises(ValueError):
+            parse_points(*args)
+
+
+def test_counts_by_day():
+    index = DateIndex('Assigned Date', 'Completed Date')
+    index.add_chunk(transcripts([
+        ['U1', 'ONE', 'L1 A', 'Completed', '2024-01-10', '2024-02-10'],
+        ['U1', 'ONE', 'L1 B', 'Registered', '2024-01-20', None],
+        ['U1', 'ONE', 'L2 A', 'Completed', '2024-03-01', None],  # completed when assigned
+        ['U2', 'TWO', 'L1 A', 'Completed', None, None],  # undated: counts from the start
+        ['U2', 'TWO', 'OTHER', 'Completed', '2024-01-01', '2024-01-02'],
+    ]))
+    points = [(None, day_number(date(2024, 1, 15))), (None, day_number(date(2023, 1, 1))),
+              (day_number(date(2024, 1, 15)), day_number(date(2024, 3, 1)))]
+    steps = [(position, counts.tolist(), in_window if in_window is None else in_window.tolist())
+             for position, counts, in_window in index.sweep(points, LEVEL_TITLES)]
+    # Visited by date; counts[user][level] = (assigned, completed), in_window[user][level]
+    assert steps == [
+        (1, [[[0, 0], [0, 0]], [[1, 1], [0, 0]]], None),
+        (0, [[[1, 0], [0, 0]], [[1, 1], [0, 0]]], None),
+        (2, [[[2, 1], [1, 1]], [[1, 1], [0, 0]]], [[1, 1], [0, 0]]),
+    ]
+
+
+def test_windows_count_completions_between_dates():
+    index = DateIndex('Assigned Date', 'Completed Date')
+    index.add_chunk(transcripts([
+        ['U1', 'ONE', 'L1 A', 'Completed', '2024-01-01', '2024-01-05'],
+        ['U1', 'ONE', 'L1 B', 'Completed', '2024-01-01', '2024-02-05'],
+        ['U2', 'TWO', 'L1 A', 'Completed', None, '2024-02-20'],
+    ]))
+    table, summary = completion_over_time(index, LEVEL_TITLES, parse_points('2024-02-29', '31', '2'))
+    assert table['Completed Level 1 Trainings 2024-01-29 to 2024-02-29'].tolist() == [1, 1]
+    assert table['Completed Level 1 Trainings 2023-12-29 to 2024-01-29'].tolist() == [1, 0]
+    assert table['Level 1 Completion % as of 2024-01-29'].tolist() == [50.0, 0.0]
+    assert summary[1]['levels']['level1'] == {
+        'avg_completion': 100.0, 'assigned': 3, 'completed': 3, 'completed_in_window': 2,
+    }
+
+
+def test_as_of_after_the_export_matches_the_report():
+    rng = random.Random(3)
+    df = pd.DataFrame(list(make_rows(60, 15)), columns=HEADER)
+    df['Transcript Assigned Date'] = [None if rng.random() < 0.2 else f'2024-0{rng.randint(1, 6)}-10'
+                                      for _ in range(len(df))]
+    df['Transcript Completed Date'] = [None if rng.random() < 0.3 else f'2024-0{rng.randint(6, 9)}-20'
+                                       for _ in range(len(df))]
+    level_titles = identify_level_trainings(df)
+    index = DateIndex('Transcript Assigned Date', 'Transcript Completed Date')
+    index.add_chunk(df)
+    table, _ = completion_over_time(index, level_titles, parse_points('2025-01-01'))
+
+    report = pd.DataFrame(calculate_completion_percentages(df, level_titles))
+    assert table['User ID'].tolist() == report['User ID'].tolist()
+    for name in ('Level 1', 'Level 2'):
+        assert table[f'{name} Completion % as of 2025-01-01'].tolist() == report[f'{name} Completion %'].tolist()
+
+
+def test_as_of_without_date_columns_is_a_bad_request(tmp_path):
+    path = write_export(str(tmp_path / 'export.xlsx'), 5, 5)
+    with open(path, 'rb') as handle:
+        response = app.test_client().post('/upload', data={'file': (handle, 'export.xlsx'), 'as_of': '2024-01-01'})
+    assert response.status_code == 400
+    assert 'date column' in response.get_json()['error']
@@ -0,0 +1,81 @@
+import pandas as pd
+
+from export_diff import (NEWLY_ASSIGNED, NEWLY_COMPLETED, NO_LONGER_COMPLETED, REMOVED, TRAININGS_SHEET,
+                         USERS_SHEET, diff_exports)
+from export_reader import REPORT_COLUMNS
+from flask_app import CONFIG
+from levels import level_patterns
+
+ROLE = 'SER-12-Technician'
+L1_A = 'PEUGEOT INDUCTION LEVEL 1 - X01EN'
+L1_C = 'CITROEN INDUCTION LEVEL 1 - X01EN'
+L1_D = 'FIAT INDUCTION LEVEL 1 - X01EN'
+L2_B = 'JEEP ADVANCED DIAGNOSTICS LEVEL 2 - X02EN'
+
+
+def export(rows):
+    return pd.DataFrame([[user, f'LAST{user}, FIRST{user}', title, status, 'DEALER 1', role]
+                         for user, title, status, role in rows], columns=REPORT_COLUMNS)
+
+
+BEFORE = export([
+    ('U1', L1_A, 'Registered', ROLE),
+    ('U1', L2_B, 'Completed', ROLE),
+    ('U1', L1_C, 'Completed', ROLE),
+    ('U2', L1_A, 'Completed', ROLE),
+    # Duplicate key: the completed row is the one compared
+    ('U3', L1_A, 'Registered', ROLE),
+    ('U3', L1_A, 'Completed', ROLE),
+    ('U5', L1_A, 'Completed', 'ADM-1-Administration'),
+])
+
+AFTER = export([
+    ('U1', L1_A, 'Completed', ROLE),
+    ('U1', L2_B, 'In Progress', ROLE),
+    ('U1', L1_D, 'Registered', ROLE),
+    ('U3', L1_A, 'Completed', ROLE),
+    ('U4', L1_A, 'Registered', ROLE),
+])
+
+
+def diff():
+    return diff_exports(BEFORE, AFTER, level_patterns(CONFIG), CONFIG['target_job_roles'])
+
+
+def test_training_changes():
+    tables, summary = diff()
+    changes = tables[TRAININGS_SHEET]
+    assert sorted(zip(changes['Change'], changes['User ID'], changes['Training Title'])) == sorted([
+        (NEWLY_ASSIGNED, 'U1', L1_D),
+        (NEWLY_ASSIGNED, 'U4', L1_A),
+        (NEWLY_COMPLETED, 'U1', L1_A),
+        (NO_LONGER_COMPLETED, 'U1', L2_B),
+        (REMOVED, 'U1', L1_C),
+        (REMOVED, 'U2', L1_A),
+    ])
+    removed = changes[(changes['Change'] == REMOVED) & (changes['User ID'] == 'U2')].iloc[0]
+    assert removed['User Full Name'] == 'LASTU2, FIRSTU2'
+    assert removed['Status Before'] == 'Completed' and pd.isna(removed['Status After'])
+    assert changes.set_index('Training Title')['Level'].to_dict() == {
+        L1_A: 'Level 1', L1_C: 'Level 1', L1_D: 'Level 1', L2_B: 'Level 2',
+    }
+    assert summary['trainings'] == {NEWLY_ASSIGNED: 2, REMOVED: 2, NEWLY_COMPLETED: 1, NO_LONGER_COMPLETED: 1}
+    assert summary['rows_before'] == 6
+
+
+def test_user_changes():
+    tables, summary = diff()
+    users = tables[USERS_SHEET].set_index('User ID')
+    # User completion counts every row like the report does, so U3's duplicate pulls Before down
+    assert users['Status'].to_dict() == {'U1': 'Regressed', 'U2': 'Removed', 'U3': 'Progressed', 'U4': 'New'}
+    u3 = users.loc['U3']
+    assert (u3['Level 1 Completion % Before'], u3['Level 1 Completion % After']) == (50.0, 100.0)
+    u1 = users.loc['U1']
+    assert (u1['Level 1 Completion % Before'], u1['Level 1 Completion % After']) == (50.0, 50.0)
+    assert (u1['Level 2 Completion % Before'], u1['Level 2 Completion % After']) == (100.0, 0.0)
+    assert u1['Overall Completion % Change'] == -33.34
+    assert u1[[f'{change} Trainings' for change in (NEWLY_ASSIGNED, NEWLY_COMPLETED, NO_LONGER_COMPLETED,
+                                                     REMOVED)]].tolist() == [1, 1, 1, 1]
+    assert pd.isna(users.loc['U4', 'Level 1 Completion % Before'])
+    assert users.loc['U4', 'Level 1 Completion % After'] == 0.0
+    assert summary['users'] == {'Regressed': 1, 'Removed': 1, 'Progressed': 1, 'New': 1}
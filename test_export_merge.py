@@ -0,0 +1,68 @@
+import numpy as np
+
+from benchmarks.fixtures import HEADER
+from export_merge import merge_exports_frame, select_winners
+from flask_app import app
+
+ROLE = 'SER-12-Technician'
+
+
+def write_export(path, header, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['Enterprise Training Report'])
+    for i in range(7):
+        sheet.append([f'Report parameter {i + 1}'])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def exports(tmp_path):
+    first = write_export(tmp_path / 'first.xlsx', HEADER + ['Completion Date'], [
+        [1001, 'ONE, USER', 'L1 A', 'Registered', 'DEALER 1', ROLE, None],
+        # Duplicated within the export: the completed row wins though it comes later
+        [1001, 'ONE, USER', 'L1 A', 'Completed', 'DEALER 1', ROLE, '2024-02-01'],
+        ['U2', 'TWO, USER', 'L1 A', 'In Progress', 'DEALER 1', ROLE, None],
+    ])
+    # No Completion Date column
+    second = write_export(tmp_path / 'second.xlsx', HEADER, [
+        # The numeric User ID above, as text
+        ['1001', 'ONE, USER', 'L1 A', 'Completed', 'DEALER 2', ROLE],
+        ['U2', 'TWO, USER', 'L1 A', 'Completed', 'DEALER 2', ROLE],
+        ['U3', 'THREE, USER', 'L1 A', 'Not Started', 'DEALER 2', ROLE],
+    ])
+    return first, second
+
+
+def test_best_status_then_earliest_row_wins():
+    keys = np.array([1, 2, 1, 1, 3, 2], dtype=np.uint64)
+    ranks = np.array([0, 1, 3, 3, -1, 1], dtype=np.int8)
+    assert select_winners(keys, ranks).tolist() == [False, True, True, False, True, False]
+    assert select_winners(keys[:0], ranks[:0]).tolist() == []
+
+
+def test_merged_exports_keep_one_row_per_user_and_title(tmp_path):
+    df, stats = merge_exports_frame(exports(tmp_path), chunksize=2)
+    assert stats == {'files': 2, 'rows_read': 6, 'rows_kept': 3, 'duplicates_removed': 3}
+    assert list(df.columns) == HEADER + ['Completion Date']
+    assert [str(user) for user in df['User ID']] == ['1001', 'U2', 'U3']
+    assert df['Transcript Status'].tolist() == ['Completed', 'Completed', 'Not Started']
+    # Ties between exports go to the first; rows of the export without the column have it empty
+    assert df['Division'].tolist() == ['DEALER 1', 'DEALER 2', 'DEALER 2']
+    assert str(df['Completion Date'][0]).startswith('2024-02-01')
+    assert df['Completion Date'][1:].isna().all()
+
+
+def test_as_of_needs_date_columns_in_every_export(tmp_path):
+    first, second = exports(tmp_path)
+    with open(first, 'rb') as one, open(second, 'rb') as two:
+        response = app.test_client().post('/upload', data={
+            'file': [(one, 'first.xlsx'), (two, 'second.xlsx')], 'as_of': '2024-03-01',
+        })
+    assert response.status_code == 400
+    assert 'Export 2 of 2' in response.get_json()['error']
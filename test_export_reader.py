@@ -0,0 +1,70 @@
+import re
+import zipfile
+
+import pytest
+
+from benchmarks.fixtures import HEADER, make_rows
+from export_reader import REPORT_COLUMNS, available_readers, export_row_count, iter_export_chunks, read_export
+
+
+def write_export(path, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['Enterprise Training Report'])
+    for i in range(7):
+        sheet.append([f'Report parameter {i + 1}'])
+    sheet.append(HEADER + ['Completion Date'])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def with_dimension(path, target, ref):
+    """Copy of an .xlsx with the worksheet's <dimension> replaced"""
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as copy:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename == 'xl/worksheets/sheet1.xml':
+                data = re.sub(rb'<dimension ref="[^"]*" ?/>', f'<dimension ref="{ref}"/>'.encode(), data)
+            copy.writestr(item, data)
+    return target
+
+
+@pytest.fixture
+def export(tmp_path):
+    rows = [row + [None if i % 3 else f'2024-01-{i % 28 + 1:02d}'] for i, row in enumerate(make_rows(50, 10))]
+    rows[7][3] = 'N/A'
+    return write_export(tmp_path / 'export.xlsx', rows)
+
+
+def test_backends_read_the_same_export(export):
+    frames = [read_export(str(export), reader=reader) for reader in available_readers()]
+    assert len(frames[0]) == 500
+    assert frames[0]['Transcript Status'].isna().sum() == 1
+    for frame in frames[1:]:
+        assert frame.equals(frames[0])
+
+
+def test_stale_dimension_does_not_drop_rows(export, tmp_path):
+    stale = str(with_dimension(export, tmp_path / 'stale.xlsx', 'A1:C5'))
+    expected = read_export(str(export), reader='xml')
+    for reader in available_readers():
+        assert read_export(stale, reader=reader).equals(expected), reader
+        chunks = list(iter_export_chunks(stale, chunksize=200, columns=REPORT_COLUMNS, reader=reader))
+        assert sum(len(chunk) for chunk in chunks) == 500, reader
+
+
+def test_xls_without_calamine_is_rejected(tmp_path):
+    path = tmp_path / 'export.xls'
+    path.write_bytes(b'\xd0\xcf\x11\xe0')
+    with pytest.raises(ValueError, match='.xls'):
+        read_export(str(path), reader='xml')
+
+
+def test_row_count_comes_from_the_dimension_only(export, tmp_path):
+    assert export_row_count(str(export)) == 500
+    assert export_row_count(str(with_dimension(export, tmp_path / 'stale.xlsx', 'A1:C20'))) == 11
+    assert export_row_count(str(with_dimension(export, tmp_path / 'bad.xlsx', ''))) is None
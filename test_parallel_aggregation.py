@@ -0,0 +1,69 @@
+import pandas as pd
+
+from benchmarks.fixtures import HEADER, make_rows
+from flask_app import identify_level_trainings
+from levels import level_name
+from parallel_aggregation import (aggregate_records, aggregate_sharded, calculate_completion_percentages_parallel,
+                                  encode_rows)
+from streaming_aggregation import COMPLETED_STATUSES, brand_name, brand_rank
+
+
+def transcripts():
+    rows = list(make_rows(400, 20, seed=11))
+    rows += [
+        [None, 'NO ID, USER', rows[0][2], 'Completed', 'DEALER 0001', rows[0][5]],
+        ['U9000002', 'NO TITLE, USER', None, 'Completed', 'DEALER 0002', rows[0][5]],
+        rows[5], rows[5],
+        [rows[10][0], 'RENAMED, USER'] + rows[10][2:],
+    ]
+    return pd.DataFrame(rows, columns=HEADER)
+
+
+def per_user_loop(df, level_titles):
+    """The original per-user groupby loop, one block of counts per level"""
+    completion_data = []
+    for (user_id, user_name), user_df in df.groupby(['User ID', 'User Full Name']):
+        name_parts = str(user_name).split(', ')
+        first_name, last_name = (name_parts[1], name_parts[0]) if len(name_parts) >= 2 else ('', str(user_name))
+        user_data = {
+            'User ID': user_id,
+            'First Name': first_name,
+            'Last Name': last_name,
+            'Job Role': user_df['Position'].iloc[0],
+            'Dealer Name': user_df['Division'].iloc[0],
+            'User Brand': brand_name(min(brand_rank(title) for title in user_df['Training Title'].astype(str))),
+        }
+        total_trainings = total_completed = 0
+        for label, titles in level_titles.items():
+            name = level_name(label)
+            level_df = user_df[user_df['Training Title'].isin(titles)]
+            total = len(level_df)
+            completed = int(level_df['Transcript Status'].isin(COMPLETED_STATUSES).sum())
+            user_data[f'Total {name} Trainings'] = total
+            user_data[f'Completed {name} Trainings'] = completed
+            user_data[f'{name} Completion %'] = round(completed / total * 100, 2) if total else 0.0
+            total_trainings += total
+            total_completed += completed
+        overall = round(total_completed / total_trainings * 100, 2) if total_trainings else 0.0
+        user_data['Overall Completion %'] = overall
+        completion_data.append(user_data)
+    return completion_data
+
+
+def test_sharded_counters_match_one_block():
+    df = transcripts()
+    df, records = encode_rows(df, identify_level_trainings(df))
+    expected = aggregate_records(records, 2)
+    for workers in (2, 3):
+        actual = aggregate_sharded(df, records, 2, workers)
+        for key, values in expected.items():
+            assert (actual[key] == values).all(), (workers, key)
+
+
+def test_pooled_and_in_process_rows_match_the_per_user_loop():
+    df = transcripts()
+    level_titles = identify_level_trainings(df)
+    expected = per_user_loop(df, level_titles)
+    assert any(row['Completed Level 2 Trainings'] for row in expected)
+    assert calculate_completion_percentages_parallel(df, level_titles, workers=1) == expected
+    assert calculate_completion_percentages_parallel(df, level_titles, workers=2, min_rows=0) == expected
@@ -0,0 +1,58 @@
+import datetime
+import io
+
+import numpy as np
+import pandas as pd
+
+import parallel_workbook
+from parallel_workbook import write_workbook
+
+
+def sheets(control='\x01'):
+    return {
+        'Summary & Totals': pd.DataFrame({
+            'Text': ['plain', '  leading', 'trailing  ', f'control{control}char', None, 'A < B & "C"'],
+            'Number': [1, 2.5, np.nan, -3, 10 ** 12, 0],
+            'Timestamp': pd.to_datetime(['2024-01-02 03:04:05', None, '2024-02-29', '1999-12-31', '2024-01-01',
+                                         '2024-06-30 23:59:59'], format='ISO8601'),
+            'Date': [datetime.date(2024, 1, day) for day in range(1, 7)],
+        }),
+        'Details': pd.DataFrame({'User ID': [f'U{i:05d}' for i in range(200)], 'Count': np.arange(200),
+                                 'Completion %': np.linspace(0, 100, 200).round(2)}),
+        'Empty': pd.DataFrame(columns=['User ID', 'Training Title']),
+    }
+
+
+def read_back(data):
+    return pd.read_excel(io.BytesIO(data), sheet_name=None)
+
+
+def openpyxl_workbook(frames):
+    target = io.BytesIO()
+    with pd.ExcelWriter(target, engine='openpyxl') as writer:
+        for name, df in frames.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    return target.getvalue()
+
+
+def test_reads_back_like_the_openpyxl_writer():
+    target = io.BytesIO()
+    write_workbook(target, sheets(), workers=1)
+    actual = read_back(target.getvalue())
+    # openpyxl refuses control characters; the parallel writer drops them
+    expected = read_back(openpyxl_workbook(sheets(control='')))
+    assert list(actual) == list(expected)
+    for name in expected:
+        pd.testing.assert_frame_equal(actual[name], expected[name], check_dtype=False)
+    assert actual['Summary & Totals']['Text'][1] == '  leading'
+    assert actual['Summary & Totals']['Text'][2] == 'trailing  '
+
+
+def test_pooled_and_in_process_bytes_match(monkeypatch):
+    # Fix the zip entries' timestamps, the only part that depends on the clock
+    now = datetime.datetime(2024, 5, 6, 7, 8, 10).timetuple()
+    monkeypatch.setattr(parallel_workbook.time, 'localtime', lambda: now)
+    in_process, pooled = io.BytesIO(), io.BytesIO()
+    write_workbook(in_process, sheets(), workers=1)
+    write_workbook(pooled, sheets(), workers=2, min_cells=0)
+    assert pooled.getvalue() == in_process.getvalue()
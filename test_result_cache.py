@@ -0,0 +1,43 @@
+import os
+
+from result_cache import ResultCache, cache_key, file_digest
+
+
+def report_file(tmp_path, name):
+    path = tmp_path / name
+    path.write_text(name)
+    return str(path)
+
+
+def test_least_recently_used_entries_are_evicted_with_their_files(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_entries=2)
+    files = {key: report_file(tmp_path, f'{key}.xlsx') for key in ('a', 'b', 'c')}
+    cache.put('a', {'name': 'a'}, [files['a']])
+    cache.put('b', {'name': 'b'}, [files['b']])
+    os.utime(cache._path('a'), (1000, 1000))
+    os.utime(cache._path('b'), (2000, 2000))
+    # Reading a makes it the most recently used, so b goes
+    assert cache.get('a') == {'name': 'a'}
+    cache.put('c', {'name': 'c'}, [files['c']])
+    assert cache.get('b') is None
+    assert not os.path.exists(files['b'])
+    assert cache.get('a') == {'name': 'a'} and cache.get('c') == {'name': 'c'}
+
+
+def test_an_entry_whose_report_file_is_gone_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    workbook, archive = report_file(tmp_path, 'report.xlsx'), report_file(tmp_path, 'dealers.zip')
+    cache.put('key', {'name': 'report.xlsx'}, [workbook, archive])
+    os.remove(workbook)
+    assert cache.get('key') is None
+    # The entry and the rest of its files are dropped too
+    assert not os.path.exists(cache._path('key'))
+    assert not os.path.exists(archive)
+
+
+def test_keys_follow_the_file_contents_and_options(tmp_path):
+    first, second = report_file(tmp_path, 'one'), report_file(tmp_path, 'two')
+    digest = file_digest([first, second])
+    assert digest != file_digest([second, first])
+    assert cache_key(digest, job_role='All', output='xlsx') == cache_key(digest, output='xlsx', job_role='All')
+    assert cache_key(digest, job_role='All') != cache_key(digest, job_role='SER-12-Technician')
@@ -0,0 +1,37 @@
+from snapshot_store import SnapshotStore
+
+
+def user(user_id, completed, dealer='DEALER 1'):
+    return {
+        'User ID': user_id, 'First Name': 'FIRST', 'Last Name': 'LAST', 'Job Role': 'SER-12-Technician',
+        'Dealer Name': dealer, 'User Brand': 'Jeep',
+        'Total Level 1 Trainings': 4, 'Completed Level 1 Trainings': completed,
+        'Level 1 Completion %': completed * 25.0, 'Overall Completion %': completed * 25.0,
+    }
+
+
+def test_saving_the_same_day_again_replaces_the_snapshot(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'history.db'))
+    store.save_snapshot([user('U1', 1), user('U2', 1)], '2024-01-31', 'export.xlsx')
+    store.save_snapshot([user('U1', 3)], '2024-01-31', 'export.xlsx')
+    snapshots = store.list_snapshots()
+    assert [(s['snapshot_date'], s['individuals']) for s in snapshots] == [('2024-01-31', 1)]
+    assert store.trend(level='Level 1') == [{
+        'snapshot_date': '2024-01-31', 'level': 'Level 1', 'individuals': 1,
+        'avg_completion_pct': 75.0, 'completed': 3, 'total': 4,
+    }]
+
+
+def test_trend_counts_the_latest_snapshot_of_each_date(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'history.db'))
+    store.save_snapshot([user('U1', 1), user('U2', 2)], '2024-01-31', 'region-a.xlsx')
+    # Another export of the same day with U1 again: only its newer figures count
+    store.save_snapshot([user('U1', 4, dealer='DEALER 2')], '2024-01-31', 'region-b.xlsx')
+    store.save_snapshot([user('U1', 2)], '2024-02-29', 'region-a.xlsx')
+    trend = {(row['snapshot_date'], row['level']): row for row in store.trend()}
+    january = trend[('2024-01-31', 'Level 1')]
+    assert (january['individuals'], january['completed'], january['avg_completion_pct']) == (2, 6, 75.0)
+    assert trend[('2024-02-29', 'Level 1')]['completed'] == 2
+    assert trend[('2024-01-31', 'Overall')]['individuals'] == 2
+    assert store.trend(user_id='U1', level='Level 1', end='2024-01-31')[0]['completed'] == 4
+    assert store.trend(dealer_name='DEALER 2', level='Level 1')[0]['individuals'] == 1
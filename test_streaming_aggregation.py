@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from benchmarks.fixtures import HEADER, make_rows, write_export
+from flask_app import CONFIG, calculate_completion_percentages, identify_level_trainings
+from levels import level_patterns
+from streaming_aggregation import aggregate_chunks, aggregate_export_streaming
+
+JOB_ROLES = CONFIG['target_job_roles']
+
+
+def transcripts():
+    """Synthetic rows plus the awkward ones: missing keys and titles, duplicates, a renamed user"""
+    rows = list(make_rows(300, 20, seed=5))
+    rows += [
+        [None, 'NO ID, USER', rows[0][2], 'Completed', 'DEALER 0001', JOB_ROLES[0]],
+        ['U9000001', None, rows[0][2], 'Completed', 'DEALER 0001', JOB_ROLES[0]],
+        ['U9000002', 'NO TITLE, USER', None, 'Completed', 'DEALER 0002', JOB_ROLES[1]],
+        rows[5], rows[5],
+        [rows[10][0], 'RENAMED, USER'] + rows[10][2:],
+    ]
+    return pd.DataFrame(rows, columns=HEADER)
+
+
+def in_memory(df):
+    df = df[df['Position'].isin(JOB_ROLES)]
+    level_titles = identify_level_trainings(df)
+    return calculate_completion_percentages(df, level_titles), level_titles, df['Position'].value_counts().to_dict()
+
+
+@pytest.mark.parametrize('chunksize', [97, 100000])
+def test_chunks_match_the_in_memory_aggregation(chunksize):
+    df = transcripts()
+    expected, level_titles, breakdown = in_memory(df)
+    assert any(row['Completed Level 1 Trainings'] for row in expected)
+    chunks = (df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize))
+    accumulator = aggregate_chunks(chunks, level_patterns(CONFIG), JOB_ROLES)
+    assert accumulator.completion_data() == expected
+    assert accumulator.rows_read == len(df)
+    assert accumulator.job_role_breakdown() == breakdown
+    for label, titles in level_titles.items():
+        assert sorted(accumulator.titles_for(label)) == sorted(titles)
+
+
+def test_export_file_matches_the_in_memory_aggregation(tmp_path):
+    path = write_export(str(tmp_path / 'export.xlsx'), 200, 15, seed=9)
+    df = pd.DataFrame(list(make_rows(200, 15, seed=9)), columns=HEADER)
+    expected, _, _ = in_memory(df)
+    accumulator = aggregate_export_streaming(path, level_patterns(CONFIG), JOB_ROLES, chunksize=500)
+    assert accumulator.completion_data() == expected
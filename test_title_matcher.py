@@ -0,0 +1,50 @@
+import re
+
+from benchmarks.fixtures import make_titles
+from flask_app import CONFIG
+from levels import classify_titles, level_patterns
+from title_matcher import TitleMatcher, is_linear_pattern
+
+
+def regex_loop(titles, patterns):
+    return [t for t in titles if any(re.search(p, str(t).upper()) for p in patterns)]
+
+
+def test_matches_regex_loop_on_configured_patterns():
+    """The matcher must classify exactly like the original re.search loop"""
+    titles = make_titles(2000, seed=7) + ['x01fr basic module', None, 'LEVEL 1\nINDUCTION']
+    pattern_sets = {'level1': CONFIG['level1_patterns'], 'level2': CONFIG['level2_patterns']}
+    results = TitleMatcher(pattern_sets).match_titles(titles)
+    for label, patterns in pattern_sets.items():
+        assert results[label] == regex_loop(titles, patterns)
+
+
+def test_configured_patterns_are_linear():
+    for pattern in CONFIG['level1_patterns'] + CONFIG['level2_patterns']:
+        assert is_linear_pattern(pattern), pattern
+
+
+def test_non_linear_patterns_fall_back_to_regex():
+    assert not is_linear_pattern(r'(A|B)+C')
+    matcher = TitleMatcher({'level1': [r'(INDUCTION|BASIC)+ LEVEL 1']})
+    assert matcher.non_linear_patterns == [r'(INDUCTION|BASIC)+ LEVEL 1']
+    assert matcher.classify('basic level 1') == ['level1']
+    assert matcher.classify('level 1') == []
+
+
+def test_anchors_and_gaps():
+    matcher = TitleMatcher({'a': [r'^X0\d.+END$'], 'b': [r'A.*B']})
+    assert matcher.classify('X01 THE END') == ['a']
+    assert matcher.classify('X01END') == []
+    assert matcher.classify('A\nB') == []
+    assert matcher.classify('A\nAB') == ['b']
+
+
+def test_each_title_gets_the_highest_matching_level():
+    config = {'level2_patterns': [r'LEVEL 2'], 'level1_patterns': [r'LEVEL 1'], 'level3_patterns': [r'LEVEL 3']}
+    patterns = level_patterns(config)
+    assert list(patterns) == ['level1', 'level2', 'level3']
+    titles = ['LEVEL 3 (after LEVEL 1)', 'level 1 induction', 'LEVEL 2', 'other']
+    assert classify_titles(titles, patterns) == {
+        'level1': ['level 1 induction'], 'level2': ['LEVEL 2'], 'level3': ['LEVEL 3 (after LEVEL 1)'],
+    }
@@ -0,0 +1,459 @@
+"""
+Linear-time matching engine for training title patterns.
+
+Every pattern is compiled into a small program of fixed-width blocks
+(literal characters and single-character classes) separated by ``.*`` style
+gaps. Such a program is evaluated by placing each block at its earliest
+possible position, which never backtracks, so the cost of a pattern is linear
+in the length of the title.
+
+Before any program runs, the literal runs every pattern requires are found in
+a single Aho-Corasick pass over the title, and only the patterns whose
+literals are all present are evaluated. Patterns that fall outside the
+supported subset (alternation, groups, bounded variable repeats, flags) still
+work through ``re.search`` but are reported by ``is_linear_pattern`` so new
+patterns can be checked before they are added to the configuration.
+"""
+import re
+from collections import deque
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+# Repeats such as X01[A-Z]{2} are unrolled into the block, up to this width
+MAX_FIXED_REPEAT = 64
+
+_UNICODE_FLAG = sre_constants.SRE_FLAG_UNICODE
+
+
+class _Unsupported(Exception):
+    """Raised while compiling a pattern outside the linear-time subset"""
+
+
+class _CharClass:
+    """Single-character class such as [A-Z], \\d or [^X]"""
+
+    def __init__(self, items, negate=False):
+        self.chars = set()
+        self.ranges = []
+        self.categories = []
+        self.negate = negate
+        for op, av in items:
+            if op is sre_constants.LITERAL:
+                self.chars.add(chr(av))
+            elif op is sre_constants.RANGE:
+                self.ranges.append((chr(av[0]), chr(av[1])))
+            elif op is sre_constants.CATEGORY:
+                self.categories.append(_category_test(av))
+            elif op is sre_constants.NEGATE:
+                self.negate = True
+            else:
+                raise _Unsupported(op)
+
+    def matches(self, ch):
+        hit = (
+            ch in self.chars
+            or any(lo <= ch <= hi for lo, hi in self.ranges)
+            or any(test(ch) for test in self.categories)
+        )
+        return hit != self.negate
+
+    def can_match_newline(self):
+        return self.matches('\n')
+
+
+class _AnyChar:
+    """The '.' wildcard (anything except a newline)"""
+
+    def matches(self, ch):
+        return ch != '\n'
+
+    def can_match_newline(self):
+        return False
+
+
+def _category_test(category):
+    tests = {
+        sre_constants.CATEGORY_DIGIT: str.isdecimal,
+        sre_constants.CATEGORY_NOT_DIGIT: lambda ch: not ch.isdecimal(),
+        sre_constants.CATEGORY_SPACE: str.isspace,
+        sre_constants.CATEGORY_NOT_SPACE: lambda ch: not ch.isspace(),
+        sre_constants.CATEGORY_WORD: lambda ch: ch.isalnum() or ch == '_',
+        sre_constants.CATEGORY_NOT_WORD: lambda ch: not (ch.isalnum() or ch == '_'),
+    }
+    if category not in tests:
+        raise _Unsupported(category)
+    return tests[category]
+
+
+class _Block:
+    """Fixed-width run of atoms; an atom is a plain character or a class"""
+
+    def __init__(self, atoms):
+        self.atoms = atoms
+        self.width = len(atoms)
+        self.literal_runs = _literal_runs(atoms)
+        # The longest literal run anchors the search for this block
+        if self.literal_runs:
+            self.anchor_offset, self.anchor = max(self.literal_runs, key=lambda run: len(run[1]))
+        else:
+            self.anchor_offset, self.anchor = 0, ''
+
+    def matches_at(self, text, start):
+        if start < 0 or start + self.width > len(text):
+            return False
+        for i, atom in enumerate(self.atoms):
+            ch = text[start + i]
+            if isinstance(atom, str):
+                if ch != atom:
+                    return False
+            elif not atom.matches(ch):
+                return False
+        return True
+
+    def find(self, text, start):
+        """Earliest position >= start where the block matches, or -1"""
+        last = len(text) - self.width
+        if last < start:
+            return -1
+        if not self.anchor:
+            for pos in range(start, last + 1):
+                if self.matches_at(text, pos):
+                    return pos
+            return -1
+        search_from = start + self.anchor_offset
+        while True:
+            hit = text.find(self.anchor, search_from)
+            if hit < 0:
+                return -1
+            pos = hit - self.anchor_offset
+            if pos > last:
+                return -1
+            if self.matches_at(text, pos):
+                return pos
+            search_from = hit + 1
+
+
+def _literal_runs(atoms):
+    runs = []
+    current, offset = [], 0
+    for i, atom in enumerate(atoms + [None]):
+        if isinstance(atom, str):
+            if not current:
+                offset = i
+            current.append(atom)
+        elif current:
+            runs.append((offset, ''.join(current)))
+            current = []
+    return runs
+
+
+class _Program:
+    """Compiled form of a pattern: blocks separated by gaps with a minimum width"""
+
+    def __init__(self, blocks, gaps, anchor_start, anchor_end):
+        self.blocks = blocks
+        self.gaps = gaps  # gaps[i] is the minimum width before blocks[i + 1]
+        self.anchor_start = anchor_start
+        self.anchor_end = anchor_end
+
+    def search(self, text):
+        if len(self.blocks) > 1 and '\n' in text:
+            # Gaps never span a line break, so each line is searched on its own
+            lines = text.split('\n')
+            last = len(lines) - 1
+            for i, line in enumerate(lines):
+                at_end = i == last or (i == last - 1 and lines[-1] == '')
+                if self._search_line(line, i == 0, at_end):
+                    return True
+            return False
+        return self._search_line(text, True, True)
+
+    def _search_line(self, text, at_start, at_end):
+        if (self.anchor_start and not at_start) or (self.anchor_end and not at_end):
+            return False
+        pos = 0
+        last = len(self.blocks) - 1
+        for i, block in enumerate(self.blocks):
+            if i > 0:
+                pos += self.gaps[i - 1]
+            if i == last and self.anchor_end:
+                return self._matches_end(text, block, pos, i == 0)
+            if i == 0 and self.anchor_start:
+                found = 0 if block.matches_at(text, 0) else -1
+            else:
+                found = block.find(text, pos)
+            if found < 0:
+                return False
+            pos = found + block.width
+        return True
+
+    def _matches_end(self, text, block, pos, is_first):
+        ends = [len(text)]
+        if text.endswith('\n'):
+            ends.append(len(text) - 1)
+        for end in ends:
+            start = end - block.width
+            if is_first and self.anchor_start:
+                ok = start == 0
+            else:
+                ok = start >= pos
+            if ok and block.matches_at(text, start):
+                return True
+        return False
+
+    def required_literals(self):
+        return [run for block in self.blocks for _, run in block.literal_runs]
+
+
+def _compile_program(pattern):
+    """Compile a pattern into a _Program or raise _Unsupported"""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        raise _Unsupported(pattern)
+    if parsed.state.flags & ~_UNICODE_FLAG:
+        raise _Unsupported('flags')
+
+    items = list(parsed)
+    anchor_start = anchor_end = False
+    if items and items[0] == (sre_constants.AT, sre_constants.AT_BEGINNING):
+        anchor_start = True
+        items = items[1:]
+    elif items and items[0] == (sre_constants.AT, sre_constants.AT_BEGINNING_STRING):
+        anchor_start = True
+        items = items[1:]
+    if items and items[-1][0] is sre_constants.AT and items[-1][1] is sre_constants.AT_END:
+        anchor_end = True
+        items = items[:-1]
+
+    blocks, gaps = [], []
+    atoms = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            atoms.append(chr(av))
+        elif op is sre_constants.NOT_LITERAL:
+            atoms.append(_CharClass([(sre_constants.LITERAL, av)], negate=True))
+        elif op is sre_constants.ANY:
+            atoms.append(_AnyChar())
+        elif op is sre_constants.IN:
+            atoms.append(_CharClass(av))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, high, sub = av
+            sub = list(sub)
+            if len(sub) != 1:
+                raise _Unsupported('repeat of a group')
+            if high == sre_constants.MAXREPEAT and sub[0][0] is sre_constants.ANY:
+                # '.*', '.+' and '.{n,}' become a gap between two blocks
+                blocks.append(_Block(atoms))
+                gaps.append(low)
+                atoms = []
+            elif low == high and low <= MAX_FIXED_REPEAT:
+                sub_program = _compile_program_items(sub)
+                atoms.extend(sub_program * low)
+            else:
+                raise _Unsupported('variable repeat')
+        else:
+            raise _Unsupported(op)
+    blocks.append(_Block(atoms))
+
+    if gaps and any(
+        atom == '\n' if isinstance(atom, str) else atom.can_match_newline()
+        for block in blocks for atom in block.atoms
+    ):
+        # Gaps are only exact when no block can straddle a line break
+        raise _Unsupported('newline-matching class with gaps')
+    return _Program(blocks, gaps, anchor_start, anchor_end)
+
+
+def _compile_program_items(items):
+    op, av = items[0]
+    if op is sre_constants.LITERAL:
+        return [chr(av)]
+    if op is sre_constants.NOT_LITERAL:
+        return [_CharClass([(sre_constants.LITERAL, av)], negate=True)]
+    if op is sre_constants.ANY:
+        return [_AnyChar()]
+    if op is sre_constants.IN:
+        return [_CharClass(av)]
+    raise _Unsupported(op)
+
+
+def _top_level_literals(pattern):
+    """Literal runs a backtracking pattern must contain, used for prefiltering"""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    if parsed.state.flags & ~_UNICODE_FLAG:
+        return []
+    runs, current = [], []
+    for op, av in list(parsed) + [(None, None)]:
+        if op is sre_constants.LITERAL:
+            current.append(chr(av))
+        elif current:
+            runs.append(''.join(current))
+            current = []
+    return runs
+
+
+def is_linear_pattern(pattern):
+    """Return True if the pattern is evaluated without backtracking"""
+    try:
+        _compile_program(pattern)
+    except _Unsupported:
+        return False
+    return True
+
+
+class LiteralScanner:
+    """Aho-Corasick automaton reporting which literals occur in a text"""
+
+    def __init__(self, literals):
+        self.literals = list(dict.fromkeys(literals))
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [frozenset()]
+
+        for index, literal in enumerate(self.literals):
+            state = 0
+            for ch in literal:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(frozenset())
+                    self.goto[state][ch] = nxt
+                state = nxt
+            self.output[state] = self.output[state] | {index}
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.output[nxt] = self.output[nxt] | self.output[self.fail[nxt]]
+
+    def scan(self, text):
+        """Return the set of literal indexes found in text"""
+        found = set()
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class _CompiledPattern:
+    def __init__(self, label, index, pattern):
+        self.label = label
+        self.index = index
+        self.pattern = pattern
+        try:
+            self.program = _compile_program(pattern)
+            self.literals = self.program.required_literals()
+            self.linear = True
+        except _Unsupported:
+            self.program = None
+            self.regex = re.compile(pattern)
+            self.literals = _top_level_literals(pattern)
+            self.linear = False
+
+    def search(self, text):
+        if self.program is not None:
+            return self.program.search(text)
+        return self.regex.search(text) is not None
+
+
+class TitleMatcher:
+    """Classify training titles against ordered pattern lists per label
+
+    ``pattern_sets`` maps a label (e.g. 'level1') to its list of patterns.
+    Titles are upper-cased before matching, exactly like the original
+    ``re.search`` loop, and a title matches a label when any of its patterns
+    matches.
+    """
+
+    def __init__(self, pattern_sets):
+        self.labels = list(pattern_sets)
+        self.patterns = []
+        for label in self.labels:
+            for index, pattern in enumerate(pattern_sets[label]):
+                self.patterns.append(_CompiledPattern(label, index, pattern))
+
+        literals = [lit for compiled in self.patterns for lit in compiled.literals]
+        self.scanner = LiteralScanner(literals)
+        literal_ids = {lit: i for i, lit in enumerate(self.scanner.literals)}
+        self._required = [
+            frozenset(literal_ids[lit] for lit in compiled.literals)
+            for compiled in self.patterns
+        ]
+
+    @property
+    def non_linear_patterns(self):
+        return [compiled.pattern for compiled in self.patterns if not compiled.linear]
+
+    def candidates(self, text):
+        """Patterns whose required literals all occur in text, in config order"""
+        present = self.scanner.scan(text)
+        return [
+            compiled for compiled, required in zip(self.patterns, self._required)
+            if required <= present
+        ]
+
+    def classify(self, title):
+        """Return the labels whose patterns match the title"""
+        text = str(title).upper()
+        matched = []
+        for compiled in self.candidates(text):
+            if compiled.label in matched:
+                continue
+            if compiled.search(text):
+                matched.append(compiled.label)
+        return [label for label in self.labels if label in matched]
+
+    def first_label(self, title):
+        """Return the first label (in configuration order) that matches the title, or None"""
+        text = str(title).upper()
+        # Candidates come in configuration order, so the first hit decides
+        for compiled in self.candidates(text):
+            if compiled.search(text):
+                return compiled.label
+        return None
+
+    def match_titles(self, titles):
+        """Map each label to the titles it matches, keeping input order"""
+        results = {label: [] for label in self.labels}
+        for title in titles:
+            for label in self.classify(title):
+                results[label].append(title)
+        return results
+
+
+_matcher_cache = {}
+
+
+def get_title_matcher(pattern_sets):
+    """Return a TitleMatcher for the given patterns, reusing compiled ones"""
+    key = tuple((label, tuple(patterns)) for label, patterns in pattern_sets.items())
+    matcher = _matcher_cache.get(key)
+    if matcher is None:
+        if len(_matcher_cache) >= 16:
+            _matcher_cache.clear()
+        matcher = TitleMatcher(pattern_sets)
+        _matcher_cache[key] = matcher
+    return matcher
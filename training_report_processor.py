@@ -1,9 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
 import os
 from datetime import datetime
-import re
+from levels import level_name, level_patterns
+from title_matcher import is_linear_pattern
+from dealer_split import split_report
+from report_formats import OUTPUT_FORMATS
+from report_pipeline import ReportPipeline
+from report_queue import DONE, FAILED, QUEUED, ReportQueue, report_output_path
+from results_table import ResultsTable
+from snapshot_store import SnapshotStore
 
 class TrainingReportProcessor:
     def __init__(self):
@@ -85,10 +91,20 @@ class TrainingReportProcessor:
         self.input_file_path = tk.StringVar()
         self.output_file_path = tk.StringVar()
         self.selected_job_roles = tk.StringVar(value="SAL-2-New Vehicles Sales Advisor")
-        self.df_original = None
-        self.df_processed = None
+        self.output_format = tk.StringVar(value="xlsx")
+        self.split_dealers = tk.BooleanVar(value=False)
+        
+        # Memoized load -> filter -> classify -> aggregate -> write stages
+        self.pipeline = ReportPipeline(self.config, log=self.log_message)
+        
+        # Several exports processed concurrently in worker processes
+        self.report_queue = ReportQueue(self.config)
+        self.snapshot_store = SnapshotStore(
+            os.environ.get('SNAPSHOT_DB_PATH', os.path.join('data', 'report_history.db'))
+        )
         
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def setup_ui(self):
         # Main frame
@@ -128,60 +144,188 @@ class TrainingReportProcessor:
         job_role_combo.grid(row=4, column=1, sticky=(tk.W, tk.E), padx=(10, 5), pady=5)
         job_role_combo.set("SAL-2-New Vehicles Sales Advisor")
         
+        # Output format (Excel workbook, or one file per table for BI tools)
+        ttk.Label(main_frame, text="Output Format:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        format_combo = ttk.Combobox(main_frame, textvariable=self.output_format,
+                                    values=OUTPUT_FORMATS, state="readonly", width=47)
+        format_combo.grid(row=5, column=1, sticky=(tk.W, tk.E), padx=(10, 5), pady=5)
+        format_combo.bind("<<ComboboxSelected>>", self.on_output_format_changed)
+        ttk.Checkbutton(main_frame, text="Also write one workbook per dealer (zip)",
+                        variable=self.split_dealers).grid(row=5, column=2, sticky=tk.W, padx=(5, 0), pady=5)
+        
         # Process button
         process_btn = ttk.Button(main_frame, text="Generate Training Report", 
                                 command=self.process_report, style='Accent.TButton')
-        process_btn.grid(row=5, column=0, columnspan=3, pady=20)
+        process_btn.grid(row=6, column=0, columnspan=3, pady=20)
         
         # Progress bar
         self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
-        self.progress.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        self.progress.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
         
         # Results frame
         results_frame = ttk.LabelFrame(main_frame, text="Processing Results", padding="10")
-        results_frame.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        results_frame.grid(row=8, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
         results_frame.columnconfigure(0, weight=1)
-        results_frame.rowconfigure(1, weight=1)
+        results_frame.rowconfigure(0, weight=1)
+        
+        # Log and per-user results tabs
+        self.results_notebook = ttk.Notebook(results_frame)
+        self.results_notebook.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        log_frame = ttk.Frame(self.results_notebook)
+        log_frame.columnconfigure(0, weight=1)
+        log_frame.rowconfigure(0, weight=1)
+        self.results_notebook.add(log_frame, text="Log")
         
         # Text widget for results
-        self.results_text = tk.Text(results_frame, height=15, width=80, wrap=tk.WORD)
-        scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.results_text.yview)
+        self.results_text = tk.Text(log_frame, height=15, width=80, wrap=tk.WORD)
+        scrollbar = ttk.Scrollbar(log_frame, orient=tk.VERTICAL, command=self.results_text.yview)
         self.results_text.configure(yscrollcommand=scrollbar.set)
         
         self.results_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         
+        # Per-user completion, loaded a page at a time as it is scrolled
+        self.results_table = ResultsTable(self.results_notebook, padding=5)
+        self.results_notebook.add(self.results_table, text="Results")
+        
+        # Queue of exports processed concurrently, one progress row per file
+        self.queue_frame = ttk.Frame(self.results_notebook, padding=5)
+        self.queue_frame.columnconfigure(0, weight=1)
+        self.queue_frame.rowconfigure(1, weight=1)
+        self.results_notebook.add(self.queue_frame, text="Queue")
+        queue_buttons = ttk.Frame(self.queue_frame)
+        queue_buttons.grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        ttk.Button(queue_buttons, text="Add Files...", command=self.add_files_to_queue).pack(side=tk.LEFT)
+        ttk.Button(queue_buttons, text="Add Folder...", command=self.add_folder_to_queue).pack(side=tk.LEFT, padx=5)
+        ttk.Button(queue_buttons, text="Process Queue", command=self.process_queue).pack(side=tk.LEFT)
+        ttk.Button(queue_buttons, text="Clear Finished", command=self.clear_finished).pack(side=tk.LEFT, padx=5)
+        self.queue_tree = ttk.Treeview(self.queue_frame, columns=('file', 'status', 'detail', 'output'),
+                                       show='headings', height=8)
+        for column, heading, width in (('file', "File", 200), ('status', "Status", 80),
+                                       ('detail', "Progress", 250), ('output', "Output", 250)):
+            self.queue_tree.heading(column, text=heading)
+            self.queue_tree.column(column, width=width)
+        queue_scrollbar = ttk.Scrollbar(self.queue_frame, orient=tk.VERTICAL, command=self.queue_tree.yview)
+        self.queue_tree.configure(yscrollcommand=queue_scrollbar.set)
+        self.queue_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        queue_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        
         # Status bar
         self.status_var = tk.StringVar()
         self.status_var.set("Ready to generate STELLANTIS training report (SAL-2, SAL-3, SER-12, SER-1, SER-2)")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
-        status_bar.grid(row=8, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        status_bar.grid(row=9, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
         
         # Configure main frame row weights
-        main_frame.rowconfigure(7, weight=1)
+        main_frame.rowconfigure(8, weight=1)
         
     def browse_input_file(self):
-        filename = filedialog.askopenfilename(
-            title="Select Input Excel File",
+        filenames = filedialog.askopenfilenames(
+            title="Select Input Excel File(s)",
             filetypes=[("Excel files", "*.xlsx *.xls"), ("All files", "*.*")]
         )
-        if filename:
+        if len(filenames) > 1:
+            # Several files go to the queue and are processed concurrently
+            self.queue_files(filenames)
+        elif filenames:
+            filename = filenames[0]
             self.input_file_path.set(filename)
             # Auto-generate output filename
-            base_name = os.path.splitext(filename)[0]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_name = f"{base_name}_STELLANTIS_Report_{timestamp}.xlsx"
-            self.output_file_path.set(output_name)
+            self.output_file_path.set(report_output_path(filename, self.output_format.get()))
             
     def browse_output_file(self):
+        output_format = self.output_format.get()
         filename = filedialog.asksaveasfilename(
             title="Save STELLANTIS Report As",
-            defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
+            defaultextension=f".{output_format}",
+            filetypes=[(f"{output_format.upper()} files", f"*.{output_format}"), ("All files", "*.*")]
         )
         if filename:
             self.output_file_path.set(filename)
             
+    def add_files_to_queue(self):
+        filenames = filedialog.askopenfilenames(
+            title="Add Excel Files to the Queue",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("All files", "*.*")]
+        )
+        self.queue_files(filenames)
+        
+    def add_folder_to_queue(self):
+        folder = filedialog.askdirectory(title="Add a Folder of Excel Files to the Queue")
+        if folder:
+            # Skip reports written by earlier runs
+            self.queue_files([os.path.join(folder, name) for name in sorted(os.listdir(folder))
+                              if name.lower().endswith(('.xlsx', '.xls')) and '_STELLANTIS_Report_' not in name])
+            
+    def queue_files(self, filenames):
+        """Add exports to the queue and show them as progress rows"""
+        added = 0
+        for filename in filenames:
+            task_id = self.report_queue.add(filename)
+            if task_id is not None:
+                self.queue_tree.insert('', tk.END, iid=str(task_id),
+                                       values=(os.path.basename(filename), QUEUED, '', ''))
+                added += 1
+        if added:
+            self.results_notebook.select(self.queue_frame)
+            self.status_var.set(f"{added} file(s) queued - click Process Queue to generate their reports")
+            
+    def process_queue(self):
+        """Process every queued export concurrently with the current settings"""
+        polling = self.report_queue.active
+        started = self.report_queue.start(self.selected_job_roles.get(), self.output_format.get(),
+                                          self.split_dealers.get())
+        if not started:
+            messagebox.showinfo("Queue", "No queued files to process")
+            return
+        for task_id in started:
+            self.update_queue_row(task_id)
+        self.status_var.set(f"Processing {len(started)} file(s) with {self.report_queue.workers} worker(s)...")
+        if not polling:
+            self.root.after(200, self.poll_queue)
+        
+    def poll_queue(self):
+        """Refresh the progress rows from the workers without blocking the window"""
+        for task_id in self.report_queue.poll():
+            self.update_queue_row(task_id)
+            task = self.report_queue.tasks[task_id]
+            if task['status'] == DONE:
+                snapshot_id = self.snapshot_store.save_snapshot(
+                    task['result'].pop('completion_data'),
+                    source_name=os.path.basename(task['input']),
+                    # The role the batch was started with, not the one selected now
+                    job_role_filter=task['job_role']
+                )
+                self.log_message(f"Saved {', '.join(task['result']['output_files'])} (snapshot #{snapshot_id})")
+            elif task['status'] == FAILED:
+                self.log_message(f"ERROR processing {task['input']}: {task['detail']}")
+        if self.report_queue.active:
+            self.root.after(200, self.poll_queue)
+        else:
+            failed = sum(task['status'] == FAILED for task in self.report_queue.tasks.values())
+            self.status_var.set(f"Queue finished ({failed} failed)" if failed else "Queue finished")
+            
+    def update_queue_row(self, task_id):
+        task = self.report_queue.tasks[task_id]
+        self.queue_tree.item(str(task_id), values=(
+            os.path.basename(task['input']), task['status'], task['detail'],
+            os.path.basename(task['output'] or '')
+        ))
+        
+    def clear_finished(self):
+        for task_id in self.report_queue.clear_finished():
+            self.queue_tree.delete(str(task_id))
+            
+    def on_close(self):
+        self.report_queue.shutdown()
+        self.root.destroy()
+            
+    def on_output_format_changed(self, event=None):
+        """Keep the output file extension in step with the selected format"""
+        output_path = self.output_file_path.get()
+        if output_path:
+            self.output_file_path.set(f"{os.path.splitext(output_path)[0]}.{self.output_format.get()}")
+            
     def process_report(self):
         if not self.input_file_path.get():
             messagebox.showerror("Error", "Please select an input Excel file")
@@ -196,57 +340,34 @@ class TrainingReportProcessor:
             self.progress.start()
             self.root.update()
             
-            # Load the Excel file
-            self.log_message("Loading Excel file...")
-            self.df_original = pd.read_excel(self.input_file_path.get(), header=None)
-            self.log_message(f"Loaded {len(self.df_original)} rows and {len(self.df_original.columns)} columns")
-            
-            # Remove first 8 rows and set proper headers
-            self.log_message("Removing first 8 rows and setting headers...")
-            df_clean = self.df_original.iloc[8:].reset_index(drop=True)
-            df_clean.columns = df_clean.iloc[0]
-            df_clean = df_clean.iloc[1:].reset_index(drop=True)
-            
-            self.log_message(f"After cleaning: {len(df_clean)} rows")
-            
-            # Filter to only show the 5 target job roles
-            self.log_message("Filtering to target job roles (SAL-2, SAL-3, SER-12, SER-1, SER-2)...")
-            df_clean = df_clean[df_clean['Position'].isin(self.target_job_roles)]
-            self.log_message(f"After filtering to target job roles: {len(df_clean)} rows")
-            
-            # Show breakdown by job role
-            for role in self.target_job_roles:
-                role_count = len(df_clean[df_clean['Position'] == role])
-                self.log_message(f"  {role}: {role_count} records")
-            
-            # Apply specific job role filter if selected
-            if self.selected_job_roles.get() in self.target_job_roles:
-                job_role = self.selected_job_roles.get()
-                df_clean = df_clean[df_clean['Position'] == job_role]
-                self.log_message(f"Filtered to {job_role}: {len(df_clean)} rows")
-            
-            # Identify Level 1 and Level 2 training titles
-            level1_titles = self.identify_level1_trainings(df_clean)
-            level2_titles = self.identify_level2_trainings(df_clean)
-            
-            self.log_message(f"Found {len(level1_titles)} Level 1 training titles")
-            self.log_message(f"Found {len(level2_titles)} Level 2 training titles")
-            
-            # Calculate completion percentages per individual
-            self.log_message("Calculating completion percentages...")
-            completion_data = self.calculate_completion_percentages(df_clean, level1_titles, level2_titles)
-            
-            # Create summary report
-            self.log_message("Creating STELLANTIS format report...")
-            summary_df = self.create_stellantis_report(completion_data)
-            
-            # Save to Excel with multiple sheets
-            self.log_message("Saving to Excel...")
-            self.save_to_excel(summary_df, completion_data, level1_titles, level2_titles)
+            # Stages whose inputs did not change since the last run are reused
+            result = self.pipeline.run(
+                self.input_file_path.get(), self.output_file_path.get(), self.selected_job_roles.get(),
+                output_format=self.output_format.get()
+            )
+            self.results_table.load(result['summary_df'])
+            
+            # Per-dealer workbooks from the same aggregation
+            if self.split_dealers.get():
+                zip_path = f"{os.path.splitext(self.output_file_path.get())[0]}_by_dealer.zip"
+                self.log_message("Writing one workbook per dealer...")
+                count = split_report(result['completion_data'], result['level_titles'], zip_path)
+                result['output_files'].append(zip_path)
+                self.log_message(f"Saved {count} dealer workbooks to {zip_path}")
+            
+            # Keep a dated snapshot so completion can be tracked over time
+            snapshot_id = self.snapshot_store.save_snapshot(
+                result['completion_data'],
+                source_name=os.path.basename(self.input_file_path.get()),
+                job_role_filter=self.selected_job_roles.get()
+            )
+            self.log_message(f"Saved snapshot #{snapshot_id} to {self.snapshot_store.db_path}")
             
             self.progress.stop()
             self.status_var.set("STELLANTIS training report generated successfully!")
-            messagebox.showinfo("Success", f"STELLANTIS training report generated successfully!\nOutput saved to: {self.output_file_path.get()}")
+            self.results_notebook.select(self.results_table)
+            output_files = "\n".join(result['output_files'])
+            messagebox.showinfo("Success", f"STELLANTIS training report generated successfully!\nOutput saved to: {output_files}")
             
         except Exception as e:
             self.progress.stop()
@@ -254,186 +375,6 @@ class TrainingReportProcessor:
             self.log_message(f"ERROR: {str(e)}")
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
             
-    def identify_level1_trainings(self, df):
-        """Identify Level 1 training titles with flexible pattern matching"""
-        level1_patterns = self.config['level1_patterns']
-        
-        level1_titles = set()
-        for title in df['Training Title'].unique():
-            title_str = str(title).upper()
-            for pattern in level1_patterns:
-                if re.search(pattern, title_str):
-                    level1_titles.add(title)
-                    break
-                    
-        return list(level1_titles)
-        
-    def identify_level2_trainings(self, df):
-        """Identify Level 2 training titles with flexible pattern matching"""
-        level2_patterns = self.config['level2_patterns']
-        
-        level2_titles = set()
-        for title in df['Training Title'].unique():
-            title_str = str(title).upper()
-            for pattern in level2_patterns:
-                if re.search(pattern, title_str):
-                    level2_titles.add(title)
-                    break
-                    
-        return list(level2_titles)
-        
-    def calculate_completion_percentages(self, df, level1_titles, level2_titles):
-        """Calculate completion percentages for each individual"""
-        completion_data = []
-        
-        # Group by User ID and User Full Name
-        user_groups = df.groupby(['User ID', 'User Full Name'])
-        
-        for (user_id, user_name), user_df in user_groups:
-            # Split full name into first and last name
-            name_parts = str(user_name).split(', ')
-            if len(name_parts) >= 2:
-                last_name = name_parts[0]
-                first_name = name_parts[1] if len(name_parts) > 1 else ""
-            else:
-                last_name = str(user_name)
-                first_name = ""
-            
-            user_data = {
-                'User ID': user_id,
-                'First Name': first_name,
-                'Last Name': last_name,
-                'Job Role': user_df['Position'].iloc[0] if len(user_df) > 0 else '',
-                'Dealer Name': user_df['Division'].iloc[0] if len(user_df) > 0 else '',
-                'User Brand': self.extract_brand(user_df),
-                'Total Level 1 Trainings': 0,
-                'Completed Level 1 Trainings': 0,
-                'Level 1 Completion %': 0.0,
-                'Total Level 2 Trainings': 0,
-                'Completed Level 2 Trainings': 0,
-                'Level 2 Completion %': 0.0,
-                'Overall Completion %': 0.0
-            }
-            
-            # Level 1 calculations
-            level1_df = user_df[user_df['Training Title'].isin(level1_titles)]
-            user_data['Total Level 1 Trainings'] = len(level1_df)
-            user_data['Completed Level 1 Trainings'] = len(level1_df[level1_df['Transcript Status'].isin(['Completed', 'Approved'])])
-            
-            if user_data['Total Level 1 Trainings'] > 0:
-                user_data['Level 1 Completion %'] = round(
-                    (user_data['Completed Level 1 Trainings'] / user_data['Total Level 1 Trainings']) * 100, 2
-                )
-            
-            # Level 2 calculations
-            level2_df = user_df[user_df['Training Title'].isin(level2_titles)]
-            user_data['Total Level 2 Trainings'] = len(level2_df)
-            user_data['Completed Level 2 Trainings'] = len(level2_df[level2_df['Transcript Status'].isin(['Completed', 'Approved'])])
-            
-            if user_data['Total Level 2 Trainings'] > 0:
-                user_data['Level 2 Completion %'] = round(
-                    (user_data['Completed Level 2 Trainings'] / user_data['Total Level 2 Trainings']) * 100, 2
-                )
-            
-            # Overall completion percentage
-            total_trainings = user_data['Total Level 1 Trainings'] + user_data['Total Level 2 Trainings']
-            total_completed = user_data['Completed Level 1 Trainings'] + user_data['Completed Level 2 Trainings']
-            
-            if total_trainings > 0:
-                user_data['Overall Completion %'] = round((total_completed / total_trainings) * 100, 2)
-            
-            completion_data.append(user_data)
-            
-        return completion_data
-    
-    def extract_brand(self, user_df):
-        """Extract brand information from training data"""
-        # Look for brand information in training titles or other fields
-        training_titles = user_df['Training Title'].astype(str).str.upper()
-        
-        if any('FIAT' in title for title in training_titles):
-            return 'Fiat Professional'
-        elif any('JEEP' in title for title in training_titles):
-            return 'Jeep'
-        elif any('PEUGEOT' in title for title in training_titles):
-            return 'Peugeot'
-        elif any('CITROEN' in title for title in training_titles):
-            return 'Citroen'
-        elif any('ALFA ROMEO' in title for title in training_titles):
-            return 'Alfa Romeo'
-        else:
-            return 'Other'
-        
-    def create_stellantis_report(self, completion_data):
-        """Create a STELLANTIS format report DataFrame"""
-        if not completion_data:
-            return pd.DataFrame()
-            
-        df = pd.DataFrame(completion_data)
-        
-        # Reorder columns to match STELLANTIS format
-        column_order = [
-            'User ID', 'First Name', 'Last Name', 'Job Role', 'Dealer Name', 
-            'User Brand', 'Level 1 Completion %', 'Level 2 Completion %'
-        ]
-        
-        # Filter to only include columns that exist
-        existing_columns = [col for col in column_order if col in df.columns]
-        df = df[existing_columns]
-        
-        # Sort by overall completion percentage (descending)
-        if 'Overall Completion %' in df.columns:
-            df = df.sort_values('Overall Completion %', ascending=False)
-        
-        return df
-        
-    def save_to_excel(self, summary_df, completion_data, level1_titles, level2_titles):
-        """Save results to Excel with STELLANTIS format"""
-        with pd.ExcelWriter(self.output_file_path.get(), engine='openpyxl') as writer:
-            # Main STELLANTIS report sheet
-            summary_df.to_excel(writer, sheet_name='STELLANTIS_Training_Report', index=False)
-            
-            # Detailed completion summary
-            if completion_data:
-                detailed_df = pd.DataFrame(completion_data)
-                detailed_df = detailed_df.sort_values('Overall Completion %', ascending=False)
-                detailed_df.to_excel(writer, sheet_name='Detailed_Completion_Summary', index=False)
-            
-            # Level 1 details sheet
-            if self.df_original is not None:
-                df_clean = self.df_original.iloc[8:].reset_index(drop=True)
-                df_clean.columns = df_clean.iloc[0]
-                df_clean = df_clean.iloc[1:].reset_index(drop=True)
-                
-                # Filter to only target job roles
-                df_clean = df_clean[df_clean['Position'].isin(self.target_job_roles)]
-                
-                # Apply specific job role filter if selected
-                if self.selected_job_roles.get() in self.target_job_roles:
-                    job_role = self.selected_job_roles.get()
-                    df_clean = df_clean[df_clean['Position'] == job_role]
-                
-                level1_df = df_clean[df_clean['Training Title'].isin(level1_titles)]
-                if len(level1_df) > 0:
-                    level1_df.to_excel(writer, sheet_name='Level_1_Training_Details', index=False)
-                
-                # Level 2 details sheet
-                level2_df = df_clean[df_clean['Training Title'].isin(level2_titles)]
-                if len(level2_df) > 0:
-                    level2_df.to_excel(writer, sheet_name='Level_2_Training_Details', index=False)
-                
-                # All training details sheet
-                df_clean.to_excel(writer, sheet_name='All_Training_Details', index=False)
-            
-            # Training titles reference sheet
-            titles_df = pd.DataFrame({
-                'Level 1 Training Titles': level1_titles,
-                'Level 2 Training Titles': level2_titles + [''] * max(0, len(level1_titles) - len(level2_titles))
-            })
-            titles_df.to_excel(writer, sheet_name='Training_Titles_Reference', index=False)
-            
-        self.log_message(f"STELLANTIS Excel report saved with {len(summary_df)} individuals processed")
-        
     def log_message(self, message):
         """Add message to results text widget"""
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -441,17 +382,24 @@ class TrainingReportProcessor:
         self.results_text.see(tk.END)
         self.root.update()
 
+    def add_level_pattern(self, level, new_pattern):
+        """Add a pattern to a level (1, 2, 3, ...), creating the level if it is new"""
+        name = level_name(f'level{level}')
+        if not is_linear_pattern(new_pattern):
+            self.log_message(f"Rejected {name} pattern (not linear-time): {new_pattern}")
+            return
+        patterns = self.config.setdefault(f'level{level}_patterns', [])
+        if new_pattern not in patterns:
+            patterns.append(new_pattern)
+            self.log_message(f"Added new {name} pattern: {new_pattern}")
+    
     def add_level1_pattern(self, new_pattern):
         """Add a new Level 1 pattern to the configuration"""
-        if new_pattern not in self.config['level1_patterns']:
-            self.config['level1_patterns'].append(new_pattern)
-            self.log_message(f"Added new Level 1 pattern: {new_pattern}")
+        self.add_level_pattern(1, new_pattern)
     
     def add_level2_pattern(self, new_pattern):
         """Add a new Level 2 pattern to the configuration"""
-        if new_pattern not in self.config['level2_patterns']:
-            self.config['level2_patterns'].append(new_pattern)
-            self.log_message(f"Added new Level 2 pattern: {new_pattern}")
+        self.add_level_pattern(2, new_pattern)
     
     def add_target_job_role(self, new_role):
         """Add a new target job role to the configuration"""
@@ -462,11 +410,9 @@ class TrainingReportProcessor:
     
     def get_current_patterns(self):
         """Get current patterns for review"""
-        return {
-            'level1_patterns': self.config['level1_patterns'],
-            'level2_patterns': self.config['level2_patterns'],
-            'target_job_roles': self.config['target_job_roles']
-        }
+        patterns = {f'{label}_patterns': level for label, level in level_patterns(self.config).items()}
+        patterns['target_job_roles'] = self.config['target_job_roles']
+        return patterns
 
 def main():
     app = TrainingReportProcessor()